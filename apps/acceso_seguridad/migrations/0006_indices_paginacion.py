@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acceso_seguridad', '0005_alter_aviso_estado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['-fecha', '-id'], name='bitacora_fecha_id_idx'),
+        ),
+    ]
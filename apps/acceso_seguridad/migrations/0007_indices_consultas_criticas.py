@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acceso_seguridad', '0006_indices_paginacion'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['usuario', '-fecha'], name='bitacora_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(condition=models.Q(('token_recuperacion__isnull', False)), fields=['token_recuperacion'], name='usuario_token_recup_idx'),
+        ),
+    ]
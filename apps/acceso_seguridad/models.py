@@ -64,6 +64,13 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         ordering = ['correo']
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
+        indexes = [
+            # Recuperación de contraseña; solo los usuarios con un token pendiente entran al índice
+            models.Index(
+                fields=['token_recuperacion'], name='usuario_token_recup_idx',
+                condition=models.Q(token_recuperacion__isnull=False),
+            ),
+        ]
 
     def esta_bloqueado(self):
         """Verifica si el usuario está bloqueado por intentos fallidos"""
@@ -77,13 +84,13 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         if self.intentos_fallidos >= 3:
             # Bloquear por 30 minutos
             self.bloqueado_hasta = timezone.now() + timezone.timedelta(minutes=30)
-        self.save()
+        self.save(update_fields=['intentos_fallidos', 'bloqueado_hasta'])
     
     def resetear_intentos_fallidos(self):
         """Resetea los intentos fallidos al login exitoso"""
         self.intentos_fallidos = 0
         self.bloqueado_hasta = None
-        self.save()
+        self.save(update_fields=['intentos_fallidos', 'bloqueado_hasta'])
 
 class Bitacora(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
@@ -95,6 +102,12 @@ class Bitacora(models.Model):
     class Meta:
         db_table = 'bitacora'
         ordering = ['-fecha']
+        indexes = [
+            # Paginación por keyset (BitacoraPaginacion)
+            models.Index(fields=['-fecha', '-id'], name='bitacora_fecha_id_idx'),
+            # Actividad de un usuario, de la más reciente a la más antigua
+            models.Index(fields=['usuario', '-fecha'], name='bitacora_usuario_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usuario.correo} - {self.accion} - {self.fecha}"
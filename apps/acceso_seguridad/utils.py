@@ -4,7 +4,11 @@ from firebase_admin import messaging
 from .models import Device
 
 
-def enviar_email_brevo(to_email, subject, html_content):
+def enviar_email_brevo(to_email, subject, html_content, lanzar_error=False):
+    """
+    Envía un email con la API de Brevo. Con 'lanzar_error' una respuesta distinta de 201
+    lanza RuntimeError en lugar de solo registrarse (el outbox la reintenta).
+    """
     url = "https://api.brevo.com/v3/smtp/email"
     headers = {
         "accept": "application/json",
@@ -20,12 +24,14 @@ def enviar_email_brevo(to_email, subject, html_content):
         "subject": subject,
         "htmlContent": html_content
     }
-    r = requests.post(url, headers=headers, json=data)
+    r = requests.post(url, headers=headers, json=data, timeout=15)
     if r.status_code != 201:
+        if lanzar_error:
+            raise RuntimeError(f"Brevo respondió {r.status_code}: {r.text[:500]}")
         print(f"Error al enviar email a {to_email}: {r.status_code} - {r.text}")
     return r.json()
 
-def enviar_notificacion(asunto, mensaje, urgente=False):
+def enviar_notificacion(asunto, mensaje, urgente=False, usuarios=None):
     """
     Envía notificación push a todos los dispositivos activos
     
@@ -33,12 +39,16 @@ def enviar_notificacion(asunto, mensaje, urgente=False):
         asunto (str): Título de la notificación
         mensaje (str): Cuerpo del mensaje
         urgente (bool): Si es urgente, se envía con alta prioridad
+        usuarios (list, opcional): IDs de usuario; si se indica, solo a sus dispositivos
     
     Returns:
         int: Número de notificaciones enviadas exitosamente
     """
-    # Obtener todos los tokens activos
-    tokens = list(Device.objects.filter(activo=True).values_list('token', flat=True))
+    # Obtener todos los tokens activos (o solo los de los usuarios indicados)
+    dispositivos = Device.objects.filter(activo=True)
+    if usuarios is not None:
+        dispositivos = dispositivos.filter(user_id__in=usuarios)
+    tokens = list(dispositivos.values_list('token', flat=True))
     
     if not tokens:
         print("⚠️ No hay dispositivos registrados para enviar notificaciones")
@@ -19,6 +19,8 @@ from rest_framework.decorators import api_view,permission_classes
 
 
 from .models import Usuario, Bitacora, Aviso
+from config.pagination import BitacoraPaginacion
+from config.proyecciones import ListadoProyectadoMixin, ExportacionJSONMixin
 from .serializers import (
     UsuarioReadSerializer,
     UsuarioWriteSerializer,
@@ -369,10 +371,11 @@ class ConfirmarRecuperacionView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
+class BitacoraViewSet(ListadoProyectadoMixin, ExportacionJSONMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Bitacora.objects.all().select_related("usuario").order_by("-fecha")
     serializer_class = BitacoraSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = BitacoraPaginacion
 
 
 # Función helper para registrar en bitácora
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.analisis_inteligencia.utils_trabajos import generar_archivo, purgar_trabajos_vencidos, tomar_trabajo
+
+# Segundos entre limpiezas de reportes vencidos
+INTERVALO_PURGA = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera en segundo plano los reportes pedidos con ?async=1 (TrabajoReporte) y borra los vencidos. '
+        'Se pueden correr varios workers en paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando no hay trabajos.')
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la cola y termina (útil con cron).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('--- Worker de reportes iniciado ---'))
+        ultima_purga = None
+
+        while True:
+            trabajo = tomar_trabajo()
+            if trabajo is not None:
+                generar_archivo(trabajo)
+                detalle = f'{trabajo.tamano} bytes' if trabajo.estado == trabajo.Estado.LISTO else trabajo.error
+                self.stdout.write(f'Reporte {trabajo.id}: {trabajo.estado} ({detalle})')
+                continue
+
+            # Cola vacía: momento para limpiar
+            if ultima_purga is None or time.monotonic() - ultima_purga >= INTERVALO_PURGA:
+                borrados = purgar_trabajos_vencidos()
+                if borrados:
+                    self.stdout.write(f'{borrados} reportes vencidos eliminados.')
+                ultima_purga = time.monotonic()
+
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS('--- Cola de reportes vacía ---'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:01
+
+import apps.analisis_inteligencia.models
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analisis_inteligencia', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('prompt', models.TextField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('LISTO', 'Listo'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('archivo', models.FileField(blank=True, storage=apps.analisis_inteligencia.models.storage_reportes, upload_to='%Y/%m/')),
+                ('tipo_contenido', models.CharField(blank=True, default='', max_length=100)),
+                ('tamano', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reporte',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(condition=models.Q(('estado__in', ['PENDIENTE', 'EN_PROCESO'])), fields=['fecha_creacion'], name='reporte_en_cola_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,8 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils.module_loading import import_string
 from apps.catalogo.models import Categoria 
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -42,3 +46,55 @@ class PrediccionVentas(models.Model):
 
     def __str__(self):
         return f"Predicción para {self.categoria.nombre} ({self.periodo_inicio} a {self.periodo_fin})"
+
+
+def storage_reportes():
+    """
+    Storage de los archivos de TrabajoReporte, configurable con settings.REPORTES_STORAGE
+    (mismo formato que una entrada de STORAGES: 'BACKEND' y 'OPTIONS').
+    """
+    configuracion = settings.REPORTES_STORAGE
+    return import_string(configuracion['BACKEND'])(**configuracion.get('OPTIONS', {}))
+
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte dinámico (CU-12) pedido con ?async=1: lo genera 'procesar_reportes' en segundo plano
+    y el cliente consulta su estado y descarga el archivo cuando está LISTO.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        EN_PROCESO = 'EN_PROCESO', 'En proceso'
+        LISTO = 'LISTO', 'Listo'
+        FALLIDO = 'FALLIDO', 'Fallido'
+
+    # UUID: el id viaja al cliente y no debe poder adivinarse
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    prompt = models.TextField()
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+
+    archivo = models.FileField(upload_to='%Y/%m/', storage=storage_reportes, blank=True)
+    tipo_contenido = models.CharField(max_length=100, blank=True, default='')
+    tamano = models.PositiveBigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True, db_index=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reporte'
+        indexes = [
+            # El worker solo recorre la cola: índice parcial, pequeño aunque la tabla crezca
+            models.Index(
+                fields=['fecha_creacion'], name='reporte_en_cola_idx',
+                condition=models.Q(estado__in=['PENDIENTE', 'EN_PROCESO']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Reporte {self.id} ({self.estado})"
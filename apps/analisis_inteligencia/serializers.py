@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import PrediccionVentas
+from rest_framework.reverse import reverse
+from .models import PrediccionVentas, TrabajoReporte
 
 class PrediccionVentasSerializer(serializers.ModelSerializer):
     """
@@ -19,4 +20,32 @@ class PrediccionVentasSerializer(serializers.ModelSerializer):
             'confianza',
             'categoria', # ID de la categoría
             'categoria_nombre' # Nombre de la categoría
-        ]
\ No newline at end of file
+        ]
+
+
+class TrabajoReporteSerializer(serializers.ModelSerializer):
+    """
+    Estado de un reporte asíncrono (CU-12). 'url_descarga' aparece cuando está LISTO.
+    """
+    url_descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoReporte
+        fields = [
+            'id',
+            'prompt',
+            'estado',
+            'tipo_contenido',
+            'tamano',
+            'error',
+            'fecha_creacion',
+            'fecha_inicio',
+            'fecha_fin',
+            'url_descarga',
+        ]
+        read_only_fields = fields
+
+    def get_url_descarga(self, obj):
+        if obj.estado != TrabajoReporte.Estado.LISTO:
+            return None
+        return reverse('reportes-descargar', args=[obj.id], request=self.context.get('request'))
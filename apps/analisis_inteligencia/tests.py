@@ -1,3 +1,414 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connections, router
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from openpyxl import load_workbook
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.acceso_seguridad.models import Usuario
+from apps.catalogo.models import Categoria, Producto
+from apps.venta_transacciones.models import DetalleVenta, Venta
+from config.cache_respuestas import invalidar_datos, respuesta_en_cache, version_datos
+from config.routers import ALIAS_REPLICA, lecturas_en_replica, marcar_escritura
+from .models import PrediccionVentas, TrabajoReporte
+from .utils_reports import (
+    ANCHO_MAXIMO_COLUMNA, generate_dynamic_report, generate_excel_report, generate_pdf_report, render_dynamic_report,
+)
+
+
+def consultas_de_datos(contexto):
+    """Consultas capturadas sin las de la caché compartida (DatabaseCache también usa la base)."""
+    return [q['sql'] for q in contexto.captured_queries if settings.CACHES['default']['LOCATION'] not in q['sql']]
+
+
+class RouterReplicaTests(TestCase):
+    """La analítica lee de la réplica ('replica' es un espejo de 'default' en los tests)."""
+    databases = {'default', ALIAS_REPLICA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(correo='replica@test.com', password='x', rol='ADMIN')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_solo_las_lecturas_del_bloque_van_a_la_replica(self):
+        with lecturas_en_replica():
+            self.assertEqual(Venta.objects.all().db, ALIAS_REPLICA)
+            self.assertEqual(router.db_for_write(Venta), 'default')
+        self.assertEqual(Venta.objects.all().db, 'default')
+
+    def test_vista_de_analitica_consulta_la_replica(self):
+        with CaptureQueriesContext(connections[ALIAS_REPLICA]) as consultas:
+            respuesta = self.client.get('/api/predicciones/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(any('analisis_inteligencia_prediccionventas' in q['sql'] for q in consultas.captured_queries))
+
+    def test_tras_escribir_el_usuario_lee_de_la_primaria(self):
+        marcar_escritura(self.usuario)
+        with lecturas_en_replica(self.usuario):
+            self.assertEqual(Venta.objects.all().db, 'default')
+
+    def test_la_marca_de_escritura_se_ve_desde_otro_proceso(self):
+        # Dos instancias del backend, como dos workers: la escritura pasa por una y la lectura por la otra
+        worker_a, worker_b = caches.create_connection('default'), caches.create_connection('default')
+        with mock.patch('config.routers.cache', worker_a):
+            marcar_escritura(self.usuario)
+        with mock.patch('config.routers.cache', worker_b), lecturas_en_replica(self.usuario):
+            self.assertEqual(Venta.objects.all().db, 'default')
+
+        # La marca está en la base y no en la memoria del proceso (LocMem): la ve cualquier worker
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {settings.CACHES['default']['LOCATION']} WHERE cache_key LIKE %s",
+                [f'%escritura-reciente:{self.usuario.pk}'],
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_la_cache_compartida_se_lee_de_la_primaria(self):
+        with lecturas_en_replica():
+            self.assertEqual(router.db_for_read(caches['default'].cache_model_class), 'default')
+
+
+class RespuestasEnCacheTests(TransactionTestCase):
+    """
+    /predicciones/ se calcula una vez por versión de los datos. TransactionTestCase:
+    la réplica es otra conexión y solo ve datos confirmados.
+    """
+    databases = {'default', ALIAS_REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(correo='cache@test.com', password='x', rol='ADMIN')
+        self.categoria = Categoria.objects.create(nombre='Predicha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _predecir(self, mes):
+        PrediccionVentas.objects.create(
+            categoria=self.categoria, periodo_inicio=f'2026-{mes:02d}-01', periodo_fin=f'2026-{mes:02d}-28',
+            venta_predicha=100, confianza=85,
+        )
+
+    def _consultas_al_listar(self, **parametros):
+        with CaptureQueriesContext(connections['default']) as primaria, \
+                CaptureQueriesContext(connections[ALIAS_REPLICA]) as replica:
+            respuesta = self.client.get('/api/predicciones/', parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, len(consultas_de_datos(primaria)) + len(consultas_de_datos(replica))
+
+    def test_se_calcula_una_vez_por_version(self):
+        self._predecir(1)
+        primera, consultas = self._consultas_al_listar(categoria=self.categoria.id)
+        self.assertGreater(consultas, 0)
+
+        # Mismos parámetros (vacíos ignorados): sale de la caché sin tocar la base
+        segunda, consultas = self._consultas_al_listar(categoria=self.categoria.id, page='')
+        self.assertEqual(consultas, 0)
+        self.assertEqual(segunda.json(), primera.json())
+
+        # Una nueva corrida de predicciones cambia la versión al confirmar
+        self._predecir(2)
+        invalidar_datos('predicciones')
+        tercera, consultas = self._consultas_al_listar(categoria=self.categoria.id)
+        self.assertGreater(consultas, 0)
+        self.assertNotEqual(tercera.json(), primera.json())
+
+    def test_la_version_cambia_para_todos_los_workers(self):
+        # Dos instancias del backend, como dos workers: la venta se confirma en A y B lee la versión
+        worker_a, worker_b = caches.create_connection('default'), caches.create_connection('default')
+        with mock.patch('config.cache_respuestas.cache', worker_b):
+            anterior = version_datos('ventas')
+        with mock.patch('config.cache_respuestas.cache', worker_a):
+            invalidar_datos('ventas')
+        with mock.patch('config.cache_respuestas.cache', worker_b):
+            self.assertNotEqual(version_datos('ventas'), anterior)
+
+        # Vive en la base, no en la memoria de un proceso
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {settings.CACHES['default']['LOCATION']} WHERE cache_key LIKE %s",
+                ['%version-datos:ventas'],
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_una_sola_peticion_calcula_entre_workers(self):
+        calculos = []
+
+        class Vista:
+            @respuesta_en_cache('ventas')
+            def listar(self, request):
+                calculos.append(threading.get_ident())
+                time.sleep(0.3)
+                return Response({'total': 42})
+
+        # Cada hilo usa su propia instancia de la caché y su propia conexión, como un worker aparte
+        hilos = 4
+        barrera = threading.Barrier(hilos)
+        respuestas = []
+
+        def trabajador():
+            try:
+                request = Request(APIRequestFactory().get('/api/prueba-cache/', {'mes': '3'}))
+                barrera.wait()
+                respuestas.append(Vista().listar(request).data)
+            finally:
+                connections.close_all()
+
+        trabajadores = [threading.Thread(target=trabajador) for _ in range(hilos)]
+        for hilo in trabajadores:
+            hilo.start()
+        for hilo in trabajadores:
+            hilo.join()
+
+        self.assertEqual(len(calculos), 1)
+        self.assertEqual(respuestas, [{'total': 42}] * hilos)
+
+
+class ReporteExcelTests(TestCase):
+    """El Excel write-only se abre con openpyxl y trae cabecera, KPIs y filas con hora de La Paz."""
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = Usuario.objects.create_user(correo='excel@test.com', password='x', rol='CLIENTE')
+        categoria = Categoria.objects.create(nombre='Lácteos')
+        leche = Producto.objects.create(codigo_producto='XLS-1', nombre='Leche', precio_venta=7, stock_actual=10, categoria=categoria)
+        yogur = Producto.objects.create(codigo_producto='XLS-2', nombre='Yogur', precio_venta='4.50', stock_actual=10, categoria=categoria)
+        # 02:30 UTC del 11 son las 22:30 del 10 en La Paz
+        cls.venta = Venta.objects.create(
+            cliente=usuario.cliente, total='23.00', fecha_venta=datetime(2026, 3, 11, 2, 30, tzinfo=dt_timezone.utc),
+        )
+        DetalleVenta.objects.create(venta=cls.venta, producto=leche, cantidad=2, precio_unitario=7, subtotal=14)
+        DetalleVenta.objects.create(venta=cls.venta, producto=yogur, cantidad=2, precio_unitario='4.50', subtotal=9)
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(self.settings(REPORTES_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def _hoja(self, prompt):
+        respuesta = generate_dynamic_report(prompt)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('reporte_smart_sales.xlsx', respuesta['Content-Disposition'])
+        hoja = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content)))['Reporte']
+        filas = []
+        for fila in hoja.iter_rows(values_only=True):
+            # El título combinado A1:E1 da cinco columnas a todas las filas
+            while fila and fila[-1] is None:
+                fila = fila[:-1]
+            if fila:
+                filas.append(fila)
+        return hoja, filas
+
+    def test_excel_general(self):
+        hoja, filas = self._hoja('reporte general en excel')
+
+        self.assertEqual(filas[0][0], '📊 REPORTE GENERAL DE VENTAS')
+        self.assertIn('A1:E1', [str(rango) for rango in hoja.merged_cells.ranges])
+        self.assertEqual([fila[:2] for fila in filas[2:5]], [('Total Ventas', 1), ('Cantidad Total', 4), ('Monto Total (Bs.)', 23.0)])
+        self.assertEqual(filas[5], ('ID Venta', 'Fecha', 'Cliente', 'Método', 'Total (Bs)'))
+        self.assertEqual(filas[6:], [(self.venta.id, datetime(2026, 3, 10, 22, 30), 'excel@test.com', 'Móvil', 23.0)])
+        # El ancho se mide con el primer bloque de filas
+        self.assertGreaterEqual(hoja.column_dimensions['C'].width, len('excel@test.com'))
+
+    def test_excel_agrupado_por_producto(self):
+        _, filas = self._hoja('ventas agrupado por producto en excel')
+
+        self.assertEqual(filas[0][0], '📊 REPORTE DE VENTAS POR PRODUCTO')
+        self.assertEqual(filas[5], ('Producto', 'Cantidad Total Vendida', 'Monto Total (Bs)'))
+        self.assertCountEqual(filas[6:], [('Leche', 2, 14.0), ('Yogur', 2, 9.0)])
+
+    def test_ancho_de_columna_con_tope(self):
+        largo = Producto.objects.create(
+            codigo_producto='XLS-3', nombre='Queso ' * 20, precio_venta=1, stock_actual=10, categoria=Categoria.objects.get(nombre='Lácteos'),
+        )
+        DetalleVenta.objects.create(venta=self.venta, producto=largo, cantidad=1, precio_unitario=1, subtotal=1)
+
+        hoja, _ = self._hoja('ventas agrupado por producto en excel')
+
+        self.assertEqual(hoja.column_dimensions['A'].width, ANCHO_MAXIMO_COLUMNA + 2)
+        self.assertEqual(hoja.column_dimensions['C'].width, len('Monto Total (Bs)') + 2)
+
+    def test_error_al_escribir_se_propaga_con_traceback(self):
+        # Antes se devolvía un JsonResponse 500 desde el generador y se perdía el traceback
+        error = ValueError('valor no representable en Excel')
+        with mock.patch('apps.analisis_inteligencia.utils_reports._valor_excel', side_effect=error), \
+                self.assertLogs('apps.analisis_inteligencia.utils_reports', 'ERROR') as registros, \
+                self.assertRaisesMessage(ValueError, 'valor no representable en Excel'):
+            generate_dynamic_report('reporte general en excel')
+        self.assertIsNotNone(registros.records[0].exc_info)
+
+
+class ReportesDinamicosTests(TestCase):
+    """CSV y NDJSON fila a fila, caché en disco de los archivos y consultas de estadísticas y filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(correo='flujo@test.com', password='x', rol='CLIENTE')
+        categoria = Categoria.objects.create(nombre='Lácteos')
+        cls.leche = Producto.objects.create(codigo_producto='FLU-1', nombre='Leche', precio_venta=7, stock_actual=10, categoria=categoria)
+        for cantidad in (1, 3):
+            venta = Venta.objects.create(cliente=cls.usuario.cliente, total=7 * cantidad)
+            DetalleVenta.objects.create(venta=venta, producto=cls.leche, cantidad=cantidad, precio_unitario=7, subtotal=7 * cantidad)
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(self.settings(REPORTES_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def _contenido(self, prompt):
+        respuesta = generate_dynamic_report(prompt)
+        self.assertTrue(respuesta.streaming)
+        return respuesta, b''.join(respuesta.streaming_content)
+
+    def test_csv_general_sin_tope_de_filas(self):
+        respuesta, contenido = self._contenido('reporte general en csv')
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        filas = list(csv.reader(io.StringIO(contenido.decode('utf-8-sig'))))
+        self.assertEqual(filas[0], ['ID Venta', 'Fecha', 'Cliente', 'Método', 'Total (Bs)'])
+        self.assertEqual([fila[2:] for fila in filas[1:]], [['flujo@test.com', 'Móvil', '21.00'], ['flujo@test.com', 'Móvil', '7.00']])
+
+    def test_ndjson_agrupado_y_comprimido(self):
+        respuesta, contenido = self._contenido('ventas agrupado por categoría en ndjson comprimido')
+        self.assertIn('reporte_smart_sales.ndjson.gz', respuesta['Content-Disposition'])
+        lineas = gzip.decompress(contenido).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(linea) for linea in lineas], [
+            {'categoria': 'Lácteos', 'cantidad_total': 4, 'monto_total': '28.00'},
+        ])
+
+    def test_reporte_repetido_sale_del_disco_con_etag(self):
+        primera, contenido = self._contenido('ventas agrupado por producto en csv')
+        self.assertNotIn('ETag', primera)
+
+        # Otro texto, misma interpretación: sin consultas a los datos y con el ETag guardado
+        with CaptureQueriesContext(connections['default']) as consultas:
+            segunda, repetido = self._contenido('CSV agrupado por producto, por favor')
+        self.assertEqual(consultas_de_datos(consultas), [])
+        self.assertEqual(repetido, contenido)
+        self.assertTrue(segunda['ETag'])
+
+        # Una venta nueva cambia la versión de los datos: se vuelve a generar
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidar_datos('ventas')
+        tercera, _ = self._contenido('ventas agrupado por producto en csv')
+        self.assertNotIn('ETag', tercera)
+
+    def test_excel_trae_etag_desde_la_primera_respuesta(self):
+        primera, contenido = self._contenido('reporte general en excel')
+        self.assertTrue(primera['ETag'])
+
+        segunda, repetido = self._contenido('excel general')
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(repetido, contenido)
+
+    def test_venta_en_otro_worker_regenera_el_reporte(self):
+        # El reporte se sirve en el worker B; la venta entra por el worker A
+        worker_a, worker_b = caches.create_connection('default'), caches.create_connection('default')
+        with mock.patch('config.cache_respuestas.cache', worker_b):
+            _, antes = self._contenido('reporte general en csv')
+
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        with mock.patch('config.cache_respuestas.cache', worker_a), self.captureOnCommitCallbacks(execute=True):
+            respuesta = client.post('/api/ventas/', {
+                'cliente': self.usuario.cliente.id, 'detalles': [{'producto_id': self.leche.id, 'cantidad': 2}],
+            }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+
+        with mock.patch('config.cache_respuestas.cache', worker_b), \
+                CaptureQueriesContext(connections['default']) as consultas:
+            despues, contenido = self._contenido('reporte general en csv')
+        self.assertTrue(consultas_de_datos(consultas))
+        self.assertNotIn('ETag', despues)
+        filas = list(csv.reader(io.StringIO(contenido.decode('utf-8-sig'))))
+        self.assertEqual(len(filas), len(list(csv.reader(io.StringIO(antes.decode('utf-8-sig'))))) + 1)
+        self.assertIn('14.00', [fila[4] for fila in filas[1:]])
+
+    def test_estadisticas_y_filas_por_formato(self):
+        """
+        Agrupados: las filas son las estadísticas, una consulta. General: el aggregate de las
+        estadísticas y la lectura de las filas (PDF: las primeras 100, Excel: un cursor).
+        """
+        esperadas = {
+            'general': (2, 4, 28.0, 2),
+            'producto': (1, 4, 28.0, 1),
+            'cliente': (2, 4, 28.0, 1),
+            'categoria': (1, 4, 28.0, 1),
+        }
+        for output_format, generador in (('pdf', generate_pdf_report), ('excel', generate_excel_report)):
+            for group_by, (total_ventas, cantidad_total, monto_total, consultas_esperadas) in esperadas.items():
+                with self.subTest(output_format=output_format, group_by=group_by), \
+                        mock.patch(f'apps.analisis_inteligencia.utils_reports.{generador.__name__}', wraps=generador) as generar, \
+                        CaptureQueriesContext(connections['default']) as consultas:
+                    render_dynamic_report(None, None, output_format, group_by)
+                    self.assertEqual(len(consultas_de_datos(consultas)), consultas_esperadas, consultas_de_datos(consultas))
+                    stats = generar.call_args.args[3]
+                    self.assertEqual(stats, {'total_ventas': total_ventas, 'cantidad_total': cantidad_total, 'monto_total': monto_total})
+
+class TrabajosReporteTests(TransactionTestCase):
+    """?async=1 responde 202 al instante; 'procesar_reportes' genera el archivo (leyendo de la réplica)."""
+    databases = {'default', ALIAS_REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(self.settings(REPORTES_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        campo = TrabajoReporte._meta.get_field('archivo')
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(setattr, campo, 'storage', campo.storage)
+        campo.storage = FileSystemStorage(location=directorio.name)
+
+        self.usuario = Usuario.objects.create_user(correo='async@test.com', password='x', rol='ADMIN')
+        categoria = Categoria.objects.create(nombre='Async')
+        producto = Producto.objects.create(codigo_producto='ASY-1', nombre='Pan', precio_venta=2, stock_actual=10, categoria=categoria)
+        comprador = Usuario.objects.create_user(correo='comprador@test.com', password='x', rol='CLIENTE')
+        venta = Venta.objects.create(cliente=comprador.cliente, total=4)
+        DetalleVenta.objects.create(venta=venta, producto=producto, cantidad=2, precio_unitario=2, subtotal=4)
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_encolar_procesar_y_descargar(self):
+        respuesta = self.client.post('/api/reportes/generar_reporte/?async=1', {'prompt': 'reporte general en csv'}, format='json')
+        self.assertEqual(respuesta.status_code, 202)
+        url = f"/api/reportes/{respuesta.json()['id']}/"
+        self.assertTrue(respuesta['Location'].endswith(url))
+        self.assertEqual(self.client.get(url + 'descargar/').status_code, 409)
+
+        call_command('procesar_reportes', '--una-vez', stdout=io.StringIO())
+
+        estado = self.client.get(url).json()
+        self.assertEqual(estado['estado'], 'LISTO')
+        descarga = self.client.get(estado['url_descarga'])
+        contenido = b''.join(descarga.streaming_content)
+        self.assertEqual(int(descarga['Content-Length']), len(contenido))
+        self.assertIn('reporte_smart_sales.csv', descarga['Content-Disposition'])
+        self.assertIn('comprador@test.com', contenido.decode('utf-8-sig'))
+
+        # Solo su dueño lo ve
+        otro = APIClient()
+        otro.force_authenticate(Usuario.objects.create_user(correo='otro@test.com', password='x', rol='ADMIN'))
+        self.assertEqual(otro.get(url).status_code, 404)
+
+    def test_sin_datos_queda_fallido(self):
+        respuesta = self.client.post(
+            '/api/reportes/generar_reporte/?async=1', {'prompt': 'csv del 01/01/2000 al 31/01/2000'}, format='json'
+        )
+        call_command('procesar_reportes', '--una-vez', stdout=io.StringIO())
+        estado = self.client.get(f"/api/reportes/{respuesta.json()['id']}/").json()
+        self.assertEqual((estado['estado'], estado['url_descarga']), ('FALLIDO', None))
+        self.assertIn('No se encontraron datos', estado['error'])
@@ -11,6 +11,8 @@ from sklearn.metrics import r2_score
 from apps.venta_transacciones.models import Venta, DetalleVenta
 from apps.catalogo.models import Categoria
 from .models import PrediccionVentas
+from config.routers import lecturas_en_replica
+from config.cache_respuestas import invalidar_datos
 
 # --- 1. OBTENER DATOS HISTÓRICOS ---
 def get_historical_data_by_category(categoria):
@@ -21,10 +23,11 @@ def get_historical_data_by_category(categoria):
     # Filtramos los detalles de venta por productos de la categoría deseada
     detalles = DetalleVenta.objects.filter(producto__categoria=categoria)
     
-    # Creamos un DataFrame de Pandas con los datos
-    df = pd.DataFrame.from_records(
-        detalles.values('fecha_creacion', 'subtotal')
-    )
+    # Creamos un DataFrame de Pandas con los datos (lectura pesada: va a la réplica)
+    with lecturas_en_replica():
+        df = pd.DataFrame.from_records(
+            detalles.values('fecha_creacion', 'subtotal')
+        )
 
     if df.empty:
         return pd.DataFrame(columns=['total_ventas'])
@@ -160,4 +163,6 @@ def save_predictions_to_db(categoria_id, df_predictions):
     
     # Guardamos todo en la BD
     PrediccionVentas.objects.bulk_create(nuevas_predicciones)
+    # Las respuestas en caché de /predicciones/ dejan de valer
+    invalidar_datos('predicciones')
     print(f"Predicciones guardadas en la BD para: {categoria.nombre}")
\ No newline at end of file
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.http import quote_etag
+
+from config.cache_respuestas import version_datos
+
+# Un archivo más grande que esta fracción del tope no se guarda: vaciaría la caché entera
+FRACCION_MAXIMA_POR_ARCHIVO = 4
+
+# Temporales de escrituras interrumpidas (proceso muerto) que se borran al recortar
+EDAD_MAXIMA_TEMPORAL = 60 * 60
+
+
+def nombre_de_archivo(respuesta):
+    encontrado = re.search(r'filename="([^"]+)"', respuesta.get('Content-Disposition', ''))
+    return encontrado.group(1) if encontrado else 'reporte_smart_sales'
+
+
+def _directorio():
+    directorio = settings.REPORTES_CACHE_DIR
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def _tope_por_archivo():
+    return settings.REPORTES_CACHE_MAX_BYTES // FRACCION_MAXIMA_POR_ARCHIVO
+
+
+def _ruta_indice(clave):
+    return os.path.join(_directorio(), f'{clave}.json')
+
+
+# --- 1. CLAVE CANÓNICA ---
+def clave_reporte(date_from, date_to, group_by, output_format, comprimir):
+    """
+    Clave del reporte interpretado, no del texto del prompt: 'ventas de este mes en excel' y
+    'excel del 01/10/2026 al 18/10/2026' comparten archivo. Lleva la versión de las ventas, que
+    vive en la caché compartida (en la base): una venta confirmada en cualquier worker deja
+    de usar los archivos anteriores en todos los procesos, 'procesar_reportes' incluido.
+    """
+    partes = [
+        date_from.isoformat() if date_from else None,
+        date_to.isoformat() if date_to else None,
+        group_by, output_format, comprimir, version_datos('ventas'),
+    ]
+    return hashlib.sha256(json.dumps(partes).encode('utf-8')).hexdigest()
+
+
+# --- 2. LECTURA ---
+def respuesta_guardada(clave):
+    """
+    FileResponse desde el disco con el ETag guardado, o None si no está o venció.
+    Leerla la marca como usada (LRU por fecha de modificación).
+    """
+    try:
+        with open(_ruta_indice(clave), encoding='utf-8') as archivo_indice:
+            indice = json.load(archivo_indice)
+        if time.time() - indice['creado'] > settings.REPORTES_CACHE_TTL:
+            return None
+        contenido = open(os.path.join(_directorio(), indice['archivo']), 'rb')
+    except (OSError, ValueError, KeyError):
+        return None
+    os.utime(contenido.fileno())
+
+    respuesta = FileResponse(
+        contenido, as_attachment=True, filename=indice['nombre'], content_type=indice['tipo_contenido'],
+    )
+    respuesta['ETag'] = indice['etag']
+    return respuesta
+
+
+# --- 3. ESCRITURA ---
+def _publicar(clave, respuesta, ruta_temporal, huella):
+    """
+    El contenido queda en '<clave>-<huella>.bin' y el índice '<clave>.json' apunta a él.
+    os.replace es atómico: quien lee ve el índice anterior o el nuevo, nunca uno a medias.
+    """
+    anterior = _archivo_del_indice(clave)
+    etag = huella.hexdigest()
+    archivo = f'{clave}-{etag[:16]}.bin'
+    os.replace(ruta_temporal, os.path.join(_directorio(), archivo))
+
+    indice = {
+        'archivo': archivo,
+        'etag': quote_etag(etag),
+        'nombre': nombre_de_archivo(respuesta),
+        'tipo_contenido': respuesta['Content-Type'],
+        'creado': time.time(),
+    }
+    with tempfile.NamedTemporaryFile('w', dir=_directorio(), suffix='.tmp', delete=False, encoding='utf-8') as temporal:
+        json.dump(indice, temporal)
+    os.replace(temporal.name, _ruta_indice(clave))
+    # Otra generación de la misma clave (p. ej. dos peticiones a la vez): se borra la que quedó sin índice
+    if anterior and anterior != archivo:
+        _borrar(os.path.join(_directorio(), anterior))
+    _recortar()
+    return indice['etag']
+
+
+def _copiar_al_enviar(clave, respuesta, trozos):
+    """Entrega los trozos de la respuesta y los copia a la caché; solo se publica si se enviaron todos."""
+    tope = _tope_por_archivo()
+    temporal = tempfile.NamedTemporaryFile(dir=_directorio(), suffix='.tmp', delete=False)
+    huella = hashlib.sha256()
+    tamano = 0
+    completo = False
+    try:
+        for trozo in trozos:
+            if temporal is not None:
+                tamano += len(trozo)
+                if tamano > tope:
+                    temporal.close()
+                    os.remove(temporal.name)
+                    temporal = None
+                else:
+                    temporal.write(trozo)
+                    huella.update(trozo)
+            yield trozo
+        completo = True
+    finally:
+        # También al cortarse la descarga: el generador se cierra y el temporal se descarta
+        if temporal is not None:
+            temporal.close()
+            if completo:
+                _publicar(clave, respuesta, temporal.name, huella)
+            else:
+                os.remove(temporal.name)
+
+
+def _copiar_archivo(clave, respuesta):
+    """Copia a la caché el archivo ya escrito de un FileResponse y lo rebobina para enviarlo."""
+    origen = respuesta.file_to_stream
+    tope = _tope_por_archivo()
+    huella = hashlib.sha256()
+    tamano = 0
+    with tempfile.NamedTemporaryFile(dir=_directorio(), suffix='.tmp', delete=False) as temporal:
+        for trozo in iter(lambda: origen.read(respuesta.block_size), b''):
+            tamano += len(trozo)
+            if tamano > tope:
+                break
+            temporal.write(trozo)
+            huella.update(trozo)
+    origen.seek(0)
+    if tamano > tope:
+        os.remove(temporal.name)
+    else:
+        respuesta['ETag'] = _publicar(clave, respuesta, temporal.name, huella)
+    return respuesta
+
+
+def guardar_al_enviar(clave, respuesta):
+    """
+    Guarda en disco los bytes de una respuesta 200 del generador de reportes.
+    PDF (en memoria) y Excel (temporal ya escrito) se guardan antes de enviarse y salen con
+    ETag desde la primera vez. CSV y NDJSON se generan mientras se envían: se copian al
+    pasar y el ETag recién existe al terminar, así que lo llevan las siguientes peticiones.
+    """
+    if respuesta.status_code != 200:
+        return respuesta
+    if isinstance(respuesta, FileResponse) and respuesta.file_to_stream is not None:
+        return _copiar_archivo(clave, respuesta)
+    if respuesta.streaming:
+        respuesta.streaming_content = _copiar_al_enviar(clave, respuesta, respuesta.streaming_content)
+    elif len(respuesta.content) <= _tope_por_archivo():
+        with tempfile.NamedTemporaryFile(dir=_directorio(), suffix='.tmp', delete=False) as temporal:
+            temporal.write(respuesta.content)
+        respuesta['ETag'] = _publicar(clave, respuesta, temporal.name, hashlib.sha256(respuesta.content))
+    return respuesta
+
+
+# --- 4. LRU CON TOPE DE TAMAÑO ---
+def _recortar():
+    """Borra los archivos usados hace más tiempo hasta que la caché entra en REPORTES_CACHE_MAX_BYTES."""
+    ahora = time.time()
+    archivos = []
+    for entrada in os.scandir(_directorio()):
+        try:
+            estado = entrada.stat()
+        except FileNotFoundError:
+            continue
+        if entrada.name.endswith('.bin'):
+            archivos.append((estado.st_mtime, estado.st_size, entrada))
+        elif entrada.name.endswith('.tmp') and ahora - estado.st_mtime > EDAD_MAXIMA_TEMPORAL:
+            _borrar(entrada.path)
+
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, entrada in sorted(archivos, key=lambda archivo: archivo[0]):
+        if total <= settings.REPORTES_CACHE_MAX_BYTES:
+            break
+        _borrar(entrada.path)
+        total -= tamano
+        _borrar_indice_de(entrada.name)
+
+
+def _archivo_del_indice(clave):
+    try:
+        with open(_ruta_indice(clave), encoding='utf-8') as archivo_indice:
+            return json.load(archivo_indice).get('archivo')
+    except (OSError, ValueError):
+        return None
+
+
+def _borrar_indice_de(archivo):
+    """Borra el índice de la clave si todavía apunta a ese archivo (un índice huérfano es una falla de caché)."""
+    clave = archivo.split('-', 1)[0]
+    if _archivo_del_indice(clave) == archivo:
+        _borrar(_ruta_indice(clave))
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
@@ -1,11 +1,16 @@
 import re
 import logging
+import tempfile
+import zlib
+import csv
 from datetime import datetime, timedelta
+from itertools import chain, islice
 from django.utils import timezone
-from django.db.models import Sum, Count, Q, F, ExpressionWrapper, DecimalField
+from django.db.models import Sum, Count, Q, F, ExpressionWrapper, DecimalField, CharField, Func, Value, OuterRef, Subquery
 from django.db.models.functions import TruncMonth
-from django.http import HttpResponse
-from io import BytesIO
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from io import BytesIO, StringIO
 
 from decimal import Decimal
 from datetime import datetime, date
@@ -13,6 +18,8 @@ from datetime import datetime, date
 # Importar modelos
 from apps.venta_transacciones.models import Venta, DetalleVenta
 from apps.catalogo.models import Producto, Categoria, Cliente
+from config.fechas import ZONA_NEGOCIO, rango_de_fechas
+from .utils_cache_reportes import clave_reporte, guardar_al_enviar, respuesta_guardada
 
 # Importar librerías de reportes
 try:
@@ -31,6 +38,7 @@ except ImportError:
 
 try:
     from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
     from openpyxl.utils import get_column_letter
     from openpyxl.chart import BarChart, PieChart, Reference
@@ -38,6 +46,28 @@ try:
 except ImportError:
     OPENPYXL_AVAILABLE = False
 
+# Filas que se leen por vez del cursor del servidor (Excel, CSV, NDJSON)
+FILAS_POR_BLOQUE = 2000
+
+# Ancho máximo (en caracteres) de una columna del Excel
+ANCHO_MAXIMO_COLUMNA = 50
+
+# Columnas del reporte general (values_list), en el orden de 'headers'
+COLUMNAS_VENTA = ('id', 'fecha_venta', 'cliente__usuario__correo', 'metodo_entrada', 'total')
+
+# Claves de cada fila agrupada (diccionarios de values()), en el orden de 'headers'
+COLUMNAS_AGRUPADAS = {
+    'producto': ('producto__nombre', 'cantidad_total', 'monto_total'),
+    'cliente': ('venta__cliente__usuario__correo', 'cantidad_ventas', 'monto_total'),
+    'categoria': ('producto__categoria__nombre', 'cantidad_total', 'monto_total'),
+}
+
+# Formatos que se envían fila a fila: formato -> (content_type, extensión)
+FORMATOS_EN_FLUJO = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
 # ===================================================================
 # 1. EL "INTÉRPRETE" DE PROMPTS (CU-12)
 # ===================================================================
@@ -47,7 +77,7 @@ except ImportError:
 
 def parse_date_range_from_prompt(text):
     text = text.lower()
-    today = timezone.now().date()
+    today = timezone.localdate()  # fecha de La Paz, no la de UTC
     match = re.search(r'del\s+(\d{2}/\d{2}/\d{4})\s+al\s+(\d{2}/\d{2}/\d{4})', text)
     if match:
         try:
@@ -84,10 +114,18 @@ def parse_date_range_from_prompt(text):
 
 def parse_format_from_prompt(text):
     text = text.lower()
+    if re.search(r'ndjson|jsonl|json\s+lines', text):
+        return 'ndjson'
+    if re.search(r'\bcsv\b', text):
+        return 'csv'
     if re.search(r'excel|xlsx', text):
         return 'excel'
     return 'pdf'
 
+def parse_compression_from_prompt(text):
+    # Solo aplica a los formatos en flujo (csv, ndjson)
+    return bool(re.search(r'gzip|\.gz\b|comprimid', text.lower()))
+
 def parse_grouping_from_prompt(text):
     text = text.lower()
     if re.search(r'(agrupado|agrupar)\s+por\s+producto', text):
@@ -102,15 +140,25 @@ def generate_dynamic_report(prompt):
     # 1. Interpretar el Prompt
     date_from, date_to = parse_date_range_from_prompt(prompt)
     output_format = parse_format_from_prompt(prompt)
-    group_by = parse_grouping_from_prompt(prompt)
-    
+    group_by = parse_grouping_from_prompt(prompt) or 'general'
+    comprimir = output_format in FORMATOS_EN_FLUJO and parse_compression_from_prompt(prompt)
+
+    # Mismo reporte interpretado y mismas ventas: se sirve el archivo ya generado
+    clave = clave_reporte(date_from, date_to, group_by, output_format, comprimir)
+    guardada = respuesta_guardada(clave)
+    if guardada is not None:
+        return guardada
+    return guardar_al_enviar(clave, render_dynamic_report(date_from, date_to, output_format, group_by, comprimir))
+
+
+def render_dynamic_report(date_from, date_to, output_format, group_by, comprimir=False):
     # 2. Construir la Consulta Base
     query = DetalleVenta.objects.select_related('venta', 'producto', 'venta__cliente__usuario', 'producto__categoria')
     
     if date_from and date_to:
-        query = query.filter(venta__fecha_venta__date__range=[date_from, date_to])
+        query = query.filter(**rango_de_fechas('venta__fecha_venta', date_from, date_to))
 
-    # 3. Aplicar Agrupación y Calcular Estadísticas
+    # 3. Aplicar Agrupación
     
     if group_by == 'producto':
         data = query.values('producto__nombre') \
@@ -120,12 +168,6 @@ def generate_dynamic_report(prompt):
                     ).order_by('-monto_total')
         headers = ["Producto", "Cantidad Total Vendida", "Monto Total (Bs)"]
         title = "Reporte de Ventas por Producto"
-        # stats provisional, se convertirán a tipos básicos luego
-        stats = {
-            'total_ventas': data.count(),
-            'cantidad_total': data.aggregate(Sum('cantidad_total'))['cantidad_total__sum'] or 0,
-            'monto_total': data.aggregate(Sum('monto_total'))['monto_total__sum'] or 0,
-        }
         
     elif group_by == 'cliente':
         data = query.values('venta__cliente__usuario__correo') \
@@ -136,11 +178,6 @@ def generate_dynamic_report(prompt):
                     ).order_by('-monto_total')
         headers = ["Cliente (Correo)", "Cantidad de Ventas", "Monto Total (Bs)"]
         title = "Reporte de Ventas por Cliente"
-        stats = {
-            'total_ventas': data.aggregate(Sum('cantidad_ventas'))['cantidad_ventas__sum'] or 0,
-            'cantidad_total': data.aggregate(Sum('cantidad_total'))['cantidad_total__sum'] or 0,
-            'monto_total': data.aggregate(Sum('monto_total'))['monto_total__sum'] or 0,
-        }
 
     elif group_by == 'categoria':
         data = query.values('producto__categoria__nombre') \
@@ -150,25 +187,21 @@ def generate_dynamic_report(prompt):
                     ).order_by('-monto_total')
         headers = ["Categoría", "Cantidad Total Vendida", "Monto Total (Bs)"]
         title = "Reporte de Ventas por Categoría"
-        stats = {
-            'total_ventas': data.count(),
-            'cantidad_total': data.aggregate(Sum('cantidad_total'))['cantidad_total__sum'] or 0,
-            'monto_total': data.aggregate(Sum('monto_total'))['monto_total__sum'] or 0,
-        }
     
     else:
         # Reporte simple (lista de ventas)
-        group_by = 'general'
         data = Venta.objects.select_related('cliente__usuario').order_by('-fecha_venta')
         if date_from and date_to:
-            data = data.filter(fecha_venta__date__range=[date_from, date_to])
+            data = data.filter(**rango_de_fechas('fecha_venta', date_from, date_to))
         headers = ["ID Venta", "Fecha", "Cliente", "Método", "Total (Bs)"]
         title = "Reporte General de Ventas"
-        stats = {
-            'total_ventas': data.count(),
-            'monto_total': data.aggregate(Sum('total'))['total__sum'] or 0,
-            'cantidad_total': DetalleVenta.objects.filter(venta__in=data).aggregate(Sum('cantidad'))['cantidad__sum'] or 0,
-        }
+
+    # 4. Formatos en flujo: las filas van del cursor a la respuesta, sin estadísticas ni tope
+    if output_format in FORMATOS_EN_FLUJO:
+        return generate_stream_report(data, headers, group_by, output_format, comprimir)
+
+    # 5. Traer los datos y calcular las Estadísticas: una sola consulta por reporte
+    data, stats = _fetch_data_and_stats(data, group_by)
 
     # --- Normalizar stats a tipos básicos para evitar Decimals/None en excel ---
     try:
@@ -192,41 +225,20 @@ def generate_dynamic_report(prompt):
     except Exception:
         stats['monto_total'] = 0.0
 
-    # 4. Validar si hay datos
-    # Para agrupaciones (values/annotate) materializamos en lista para comprobar vacío de forma segura
-    if group_by == 'general':
-        if not data.exists():
-            raise Venta.DoesNotExist("No se encontraron datos para el reporte solicitado.")
-        # dejamos `data` como queryset para el PDF (no lo materializamos aquí)
-    else:
-        # materializar los resultados ya que son ValuesQuerySet (diccionarios)
-        data_list = list(data)
-        if not data_list:
-            raise Venta.DoesNotExist("No se encontraron datos para el reporte solicitado.")
-        # reasignamos `data` a la lista para uso en Excel (y evitar evaluación perezosa)
-        data = data_list
-
-    # 5. Crear la respuesta HTTP
+    # 6. Crear la respuesta HTTP
     if output_format == 'excel':
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename="reporte_smart_sales.xlsx"'},
-        )
-
-        # Llamada protegida al generador de Excel: imprimimos traceback y propagamos la excepción
+        # Llamada protegida al generador de Excel: registramos el traceback y propagamos la excepción
         try:
-            # materializar también el queryset 'general' si es que es el caso, para estabilidad
             if group_by == 'general':
-                data_for_excel = list(data)  # venta objects list
+                # Solo las columnas del reporte, leídas por bloques (sin instanciar cada Venta)
+                data_for_excel = data.values_list(*COLUMNAS_VENTA).iterator(chunk_size=FILAS_POR_BLOQUE)
             else:
                 data_for_excel = data  # ya es lista
 
-            return generate_excel_report(data_for_excel, title, headers, stats, group_by, response)
+            return generate_excel_report(data_for_excel, title, headers, stats, group_by)
 
-        except Exception as e:
-            # Registramos/mostramos el traceback aquí para que aparezca en la consola de Django
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('Fallo al generar el reporte Excel (agrupado por %s)', group_by)
             # Re-lanzamos la excepción para que tu ViewSet la capture y muestre el error también
             raise
 
@@ -238,6 +250,39 @@ def generate_dynamic_report(prompt):
         return generate_pdf_report(data, title, headers, stats, group_by, response)
 
 
+def _fetch_data_and_stats(data, group_by):
+    """
+    Devuelve (data, stats). Agrupados: una sola consulta, se traen las filas y los totales
+    salen de sumarlas. General: los tres totales en un solo aggregate (la cantidad vendida con
+    una subconsulta por venta) y las filas en una segunda consulta que hace después el
+    generador (PDF: las primeras 100, Excel: todas con un cursor).
+    """
+    if group_by == 'general':
+        cantidad_por_venta = DetalleVenta.objects.filter(venta=OuterRef('pk')).order_by() \
+                                                 .values('venta').annotate(suma=Sum('cantidad')).values('suma')
+        stats = data.aggregate(
+            total_ventas=Count('id'),
+            monto_total=Sum('total'),
+            cantidad_total=Sum(Subquery(cantidad_por_venta)),
+        )
+        if not stats['total_ventas']:
+            raise Venta.DoesNotExist("No se encontraron datos para el reporte solicitado.")
+        # dejamos `data` como queryset para el PDF (no lo materializamos aquí)
+        return data, stats
+
+    # materializar los resultados ya que son ValuesQuerySet (diccionarios)
+    data = list(data)
+    if not data:
+        raise Venta.DoesNotExist("No se encontraron datos para el reporte solicitado.")
+    stats = {
+        # Por cliente, las ventas de cada fila son distintas (cada venta tiene un solo cliente)
+        'total_ventas': sum(item['cantidad_ventas'] for item in data) if group_by == 'cliente' else len(data),
+        'cantidad_total': sum(item['cantidad_total'] for item in data),
+        'monto_total': sum(item['monto_total'] for item in data),
+    }
+    return data, stats
+
+
 # ===================================================================
 # 2. GENERADORES DE ARCHIVOS
 # ===================================================================
@@ -359,144 +404,212 @@ def generate_pdf_report(data, title, headers, stats, group_by, response):
     return response
 
 
-def generate_excel_report(data, title, headers, stats, group_by, response):
+def _valor_excel(v):
+    if v is None:
+        return ''
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, datetime):
+        # Excel no guarda zona horaria: se escribe la hora de La Paz
+        return timezone.localtime(v).replace(tzinfo=None) if timezone.is_aware(v) else v
+    if isinstance(v, (date, int, float)):
+        return v
+    return str(v)
+
+
+def _texto_visible(v):
+    return v.strftime('%d/%m/%Y %H:%M') if isinstance(v, datetime) else str(v)
+
+
+def _celda(ws, valor, **estilos):
+    celda = WriteOnlyCell(ws, value=valor)
+    for atributo, estilo in estilos.items():
+        setattr(celda, atributo, estilo)
+    return celda
+
+
+def generate_excel_report(data, title, headers, stats, group_by):
     """
-    Genera un reporte Excel robusto con manejo completo de errores y logging.
+    Genera el reporte Excel en modo write-only: las filas se escriben a medida que llegan
+    de 'data' (lista o iterador) y openpyxl las vuelca a un archivo temporal, así la memoria
+    no crece con la cantidad de filas. El archivo se envía por bloques con FileResponse.
+    Un error (openpyxl, disco) se propaga con su traceback; lo registra quien llama.
     """
-    import traceback
-    import logging
-    from io import BytesIO
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from datetime import datetime
-
-    logger = logging.getLogger(__name__)
+    if not OPENPYXL_AVAILABLE:
+        raise ImportError("openpyxl no está instalado.")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte")
+
+    # Estilos
+    border = Border(
+        left=Side(style='thin', color='DDDDDD'),
+        right=Side(style='thin', color='DDDDDD'),
+        top=Side(style='thin', color='DDDDDD'),
+        bottom=Side(style='thin', color='DDDDDD')
+    )
+    header_font = Font(bold=True, color="FFFFFF", size=11)
+    header_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
+    center_align = Alignment(horizontal='center', vertical='center')
+
+    claves = COLUMNAS_AGRUPADAS.get(group_by)
+    filas = (tuple(item.get(clave) for clave in claves) for item in data) if claves else iter(data)
+    filas = (tuple(_valor_excel(v) for v in fila) for fila in filas)
+
+    kpis = [
+        ('Total Ventas', stats.get('total_ventas', 0)),
+        ('Cantidad Total', stats.get('cantidad_total', 0)),
+        ('Monto Total (Bs.)', stats.get('monto_total', 0)),
+    ]
 
+    # === Ajuste de ancho ===
+    # En write-only los anchos se escriben antes que la primera fila: se miden el encabezado,
+    # los KPIs y solo las primeras FILAS_POR_BLOQUE filas (las demás no se miden). Un valor
+    # más largo más abajo queda recortado en pantalla; el tope evita columnas desmedidas.
+    primer_bloque = list(islice(filas, FILAS_POR_BLOQUE))
+    anchos = [len(str(header)) for header in headers]
+    for fila in chain(kpis, primer_bloque):
+        for i, valor in enumerate(fila[:len(anchos)]):
+            anchos[i] = max(anchos[i], len(_texto_visible(valor)))
+    for i, ancho in enumerate(anchos, 1):
+        ws.column_dimensions[get_column_letter(i)].width = min(ancho, ANCHO_MAXIMO_COLUMNA) + 2
+
+    # === Cabecera ===
+    ws.row_dimensions[1].height = 35
+    ws.merged_cells.add('A1:E1')
+    ws.merged_cells.add('A2:E2')
+    ws.append([_celda(
+        ws, f'📊 {title.upper()}', font=Font(bold=True, size=20, color="FFFFFF"),
+        fill=PatternFill(start_color="4338CA", end_color="4338CA", fill_type="solid"), alignment=center_align,
+    )])
+    ws.append([_celda(ws, f'Generado el {datetime.now().strftime("%d/%m/%Y %H:%M")}', alignment=center_align)])
+    ws.append([])
+
+    # === KPIs ===
+    for etiqueta, valor in kpis:
+        ws.append([
+            _celda(ws, etiqueta, font=Font(bold=True), alignment=center_align),
+            _celda(ws, valor, alignment=center_align),
+        ])
+    ws.append([])
+
+    # === Encabezado tabla ===
+    ws.append([
+        _celda(ws, header, font=header_font, fill=header_fill, alignment=center_align, border=border)
+        for header in headers
+    ])
+
+    # === Contenido ===
+    for fila in chain(primer_bloque, filas):
+        ws.append(fila)
+
+    # === Guardar ===
+    archivo = tempfile.TemporaryFile()
     try:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Reporte"
-
-        # Estilos
-        border = Border(
-            left=Side(style='thin', color='DDDDDD'),
-            right=Side(style='thin', color='DDDDDD'),
-            top=Side(style='thin', color='DDDDDD'),
-            bottom=Side(style='thin', color='DDDDDD')
+        wb.save(archivo)
+    except BaseException:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    # FileResponse lee y envía el archivo por bloques, y lo cierra (y borra) al terminar
+    return FileResponse(
+        archivo, as_attachment=True, filename='reporte_smart_sales.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+# --- CSV / NDJSON en flujo ---
+
+# Claves de cada objeto NDJSON, en el orden de 'headers'
+CLAVES_NDJSON = {
+    'general': ('id', 'fecha', 'cliente', 'metodo', 'total'),
+    'producto': ('producto', 'cantidad_total', 'monto_total'),
+    'cliente': ('cliente', 'cantidad_ventas', 'monto_total'),
+    'categoria': ('categoria', 'cantidad_total', 'monto_total'),
+}
+
+# Caracteres que se juntan antes de enviar (o comprimir) un trozo de la respuesta
+CARACTERES_POR_TROZO = 64 * 1024
+
+
+def _filas_en_flujo(data, group_by):
+    """Tuplas en el orden de 'headers', leídas por bloques con un cursor del servidor."""
+    # La base se fija ahora: las filas se leen cuando la vista ya retornó (fuera de 'en_replica')
+    data = data.using(data.db)
+    if group_by == 'general':
+        # La fecha llega como texto en hora de La Paz: convertirla en Python por fila duplica el tiempo
+        fecha_local = Func(
+            Func(Value(str(ZONA_NEGOCIO)), F('fecha_venta'), function='timezone'),
+            Value('YYYY-MM-DD HH24:MI:SS'), function='to_char', output_field=CharField(),
         )
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
-        center_align = Alignment(horizontal='center', vertical='center')
-
-        # === Cabecera ===
-        ws['A1'] = f'📊 {title.upper()}'
-        ws['A1'].font = Font(bold=True, size=20, color="FFFFFF")
-        ws['A1'].fill = PatternFill(start_color="4338CA", end_color="4338CA", fill_type="solid")
-        ws['A1'].alignment = center_align
-        ws.merge_cells('A1:E1')
-        ws.row_dimensions[1].height = 35
-
-        ws['A2'] = f'Generado el {datetime.now().strftime("%d/%m/%Y %H:%M")}'
-        ws.merge_cells('A2:E2')
-        ws['A2'].alignment = center_align
-
-        # === KPIs ===
-        ws['A4'] = 'Total Ventas'
-        ws['B4'] = stats.get('total_ventas', 0)
-        ws['A5'] = 'Cantidad Total'
-        ws['B5'] = stats.get('cantidad_total', 0)
-        ws['A6'] = 'Monto Total (Bs.)'
-        ws['B6'] = stats.get('monto_total', 0)
-        for r in range(4, 7):
-            ws[f'A{r}'].font = Font(bold=True)
-            ws[f'A{r}'].alignment = center_align
-            ws[f'B{r}'].alignment = center_align
-
-        # === Encabezado tabla ===
-        start_row = 8
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=start_row, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            cell.border = border
-
-        # === Contenido ===
-        from decimal import Decimal
-        from datetime import datetime, date
-
-        def safe_val(v):
-            if v is None:
-                return ''
-            if isinstance(v, Decimal):
-                return float(v)
-            if isinstance(v, (datetime, date)):
-                return v.replace(tzinfo=None) if hasattr(v, 'tzinfo') else v
-            return str(v)
-
-        row = start_row + 1
-        for item in data:
-            try:
-                if group_by == 'general':
-                    ws.cell(row=row, column=1, value=safe_val(getattr(item, 'id', None)))
-                    ws.cell(row=row, column=2, value=safe_val(getattr(item, 'fecha_venta', None)))
-                    cliente = getattr(item.cliente.usuario, 'correo', 'N/A') if getattr(item, 'cliente', None) else 'N/A'
-                    ws.cell(row=row, column=3, value=safe_val(cliente))
-                    ws.cell(row=row, column=4, value=safe_val(getattr(item, 'metodo_entrada', 'N/A')))
-                    ws.cell(row=row, column=5, value=safe_val(getattr(item, 'total', 0)))
-                elif group_by == 'producto':
-                    ws.cell(row=row, column=1, value=safe_val(item.get('producto__nombre')))
-                    ws.cell(row=row, column=2, value=safe_val(item.get('cantidad_total')))
-                    ws.cell(row=row, column=3, value=safe_val(item.get('monto_total')))
-                elif group_by == 'cliente':
-                    ws.cell(row=row, column=1, value=safe_val(item.get('venta__cliente__usuario__correo')))
-                    ws.cell(row=row, column=2, value=safe_val(item.get('cantidad_ventas')))
-                    ws.cell(row=row, column=3, value=safe_val(item.get('monto_total')))
-                elif group_by == 'categoria':
-                    ws.cell(row=row, column=1, value=safe_val(item.get('producto__categoria__nombre')))
-                    ws.cell(row=row, column=2, value=safe_val(item.get('cantidad_total')))
-                    ws.cell(row=row, column=3, value=safe_val(item.get('monto_total')))
-                row += 1
-            except Exception as row_err:
-                logger.warning(f"Fila con error {row}: {row_err}")
-                traceback.print_exc()
-                row += 1
-                continue
-
-        # === Ajuste de ancho ===
-        for i, column_cells in enumerate(ws.columns, 1):
-            # Filtra celdas fusionadas y valores None
-            valid_cells = [cell for cell in column_cells if cell.value is not None and not isinstance(cell, type(ws['A1']))]
-            if not valid_cells:
-                continue
-            max_length = max(len(str(cell.value)) for cell in valid_cells)
-            col_letter = get_column_letter(i)
-            ws.column_dimensions[col_letter].width = max_length + 2
-
-        # === Guardar ===
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        try:
-            response.write(buffer.getvalue())
-        except Exception as e_write:
-            # En caso de error de escritura
-            with open("excel_error.log", "a", encoding="utf-8") as f:
-                f.write(f"[{datetime.now()}] Error writing Excel: {e_write}\n")
-            traceback.print_exc()
-            raise
-
-        buffer.close()
-        return response
-
-    except Exception as e:
-        # Capturamos cualquier error global (openpyxl, I/O, etc.)
-        traceback.print_exc()
-        from django.http import JsonResponse
-        return JsonResponse({
-            "error": "Fallo al generar Excel",
-            "detalle": str(e),
-            "tipo": type(e).__name__
-        }, status=500)
\ No newline at end of file
+        columnas = ['fecha_local' if columna == 'fecha_venta' else columna for columna in COLUMNAS_VENTA]
+        return data.annotate(fecha_local=fecha_local).values_list(*columnas).iterator(chunk_size=FILAS_POR_BLOQUE)
+    claves = COLUMNAS_AGRUPADAS[group_by]
+    return (tuple(item[clave] for clave in claves) for item in data.iterator(chunk_size=FILAS_POR_BLOQUE))
+
+
+def _trozos_csv(filas, headers):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM: Excel abre el archivo como UTF-8 (tildes y ñ)
+    writer.writerow(headers)
+    for fila in filas:
+        writer.writerow(fila)
+        if buffer.tell() >= CARACTERES_POR_TROZO:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _trozos_ndjson(filas, claves):
+    # DjangoJSONEncoder: los Decimal van como texto, igual que en la API
+    codificador = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    lineas, caracteres = [], 0
+    for fila in filas:
+        linea = codificador.encode(dict(zip(claves, fila)))
+        lineas.append(linea)
+        caracteres += len(linea) + 1
+        if caracteres >= CARACTERES_POR_TROZO:
+            yield '\n'.join(lineas) + '\n'
+            lineas, caracteres = [], 0
+    if lineas:
+        yield '\n'.join(lineas) + '\n'
+
+
+def _comprimir_gzip(trozos):
+    compresor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # 16+: cabecera y cola gzip
+    for trozo in trozos:
+        comprimido = compresor.compress(trozo)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def generate_stream_report(data, headers, group_by, output_format, comprimir=False):
+    """
+    Envía el reporte como CSV o NDJSON a medida que se leen las filas: no hay tope de filas
+    y la memoria no crece con el tamaño del reporte. Con 'comprimir' el archivo va en gzip.
+    """
+    content_type, extension = FORMATOS_EN_FLUJO[output_format]
+    # La primera fila se lee ya: un reporte vacío se informa sin otra consulta (exists)
+    filas = _filas_en_flujo(data, group_by)
+    primera = next(filas, None)
+    if primera is None:
+        raise Venta.DoesNotExist("No se encontraron datos para el reporte solicitado.")
+    filas = chain([primera], filas)
+    if output_format == 'csv':
+        trozos = _trozos_csv(filas, headers)
+    else:
+        trozos = _trozos_ndjson(filas, CLAVES_NDJSON[group_by])
+    trozos = (trozo.encode('utf-8') for trozo in trozos)
+
+    filename = f'reporte_smart_sales.{extension}'
+    if comprimir:
+        trozos = _comprimir_gzip(trozos)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    return StreamingHttpResponse(
+        trozos, content_type=content_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
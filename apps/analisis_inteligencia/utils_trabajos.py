@@ -0,0 +1,110 @@
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.venta_transacciones.models import Venta
+from config.routers import lecturas_en_replica
+from .models import TrabajoReporte
+from .utils_cache_reportes import nombre_de_archivo
+from .utils_reports import generate_dynamic_report
+
+logger = logging.getLogger(__name__)
+
+# Un trabajo EN_PROCESO más viejo que esto se da por abandonado (el worker murió) y se retoma
+TIEMPO_MAXIMO_PROCESO = timedelta(minutes=30)
+
+# Veces que se retoma un trabajo abandonado antes de marcarlo FALLIDO
+MAXIMO_INTENTOS = 3
+
+CAMPOS_RESULTADO = ['estado', 'archivo', 'tipo_contenido', 'tamano', 'error', 'fecha_fin']
+
+
+def encolar_reporte(usuario, prompt):
+    return TrabajoReporte.objects.create(usuario=usuario, prompt=prompt)
+
+
+# --- 1. COLA ---
+def tomar_trabajo():
+    """
+    Marca EN_PROCESO el trabajo más antiguo de la cola y lo devuelve (None si no hay).
+    SELECT ... FOR UPDATE SKIP LOCKED: varios workers pueden correr a la vez sin tomar el mismo.
+    El bloqueo dura solo hasta marcarlo; el reporte se genera fuera de la transacción.
+    """
+    ahora = timezone.now()
+    abandonados = Q(estado=TrabajoReporte.Estado.EN_PROCESO, fecha_inicio__lt=ahora - TIEMPO_MAXIMO_PROCESO)
+    with transaction.atomic():
+        TrabajoReporte.objects.filter(abandonados, intentos__gte=MAXIMO_INTENTOS).update(
+            estado=TrabajoReporte.Estado.FALLIDO, error='El reporte se interrumpió demasiadas veces.', fecha_fin=ahora,
+        )
+        trabajo = (
+            TrabajoReporte.objects.select_for_update(skip_locked=True)
+            .filter(Q(estado=TrabajoReporte.Estado.PENDIENTE) | abandonados)
+            .order_by('fecha_creacion')
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = TrabajoReporte.Estado.EN_PROCESO
+        trabajo.fecha_inicio = ahora
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'fecha_inicio', 'intentos'])
+    return trabajo
+
+
+# --- 2. GENERACIÓN ---
+def generar_archivo(trabajo):
+    """
+    Genera el reporte del trabajo (leyendo de la réplica) y guarda el archivo en el storage
+    de reportes. Deja el trabajo LISTO o FALLIDO con su mensaje de error.
+    """
+    trabajo.error = ''
+    try:
+        with lecturas_en_replica():
+            respuesta = generate_dynamic_report(trabajo.prompt)
+            try:
+                if respuesta.status_code != 200:
+                    raise ValueError(respuesta.content.decode('utf-8', 'replace'))
+                # PDF y Excel llegan enteros o desde su archivo temporal; CSV y NDJSON, fila a fila
+                trozos = respuesta.streaming_content if respuesta.streaming else [respuesta.content]
+                with tempfile.TemporaryFile() as temporal:
+                    tamano = 0
+                    for trozo in trozos:
+                        temporal.write(trozo)
+                        tamano += len(trozo)
+                    temporal.seek(0)
+                    trabajo.archivo.save(f'{trabajo.id}/{nombre_de_archivo(respuesta)}', File(temporal), save=False)
+                trabajo.tipo_contenido = respuesta['Content-Type']
+                trabajo.tamano = tamano
+            finally:
+                respuesta.close()
+    except Venta.DoesNotExist as e:
+        trabajo.error = str(e)
+    except Exception as e:
+        logger.exception('Fallo al generar el reporte %s', trabajo.id)
+        trabajo.error = f'Error al procesar el reporte: {e}'[:2000]
+
+    trabajo.estado = TrabajoReporte.Estado.FALLIDO if trabajo.error else TrabajoReporte.Estado.LISTO
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=CAMPOS_RESULTADO)
+    return trabajo
+
+
+# --- 3. LIMPIEZA ---
+def purgar_trabajos_vencidos(dias=None):
+    """Borra los trabajos terminados hace más de 'dias' (REPORTES_DIAS_CONSERVAR) y sus archivos."""
+    dias = settings.REPORTES_DIAS_CONSERVAR if dias is None else dias
+    vencidos = TrabajoReporte.objects.filter(
+        estado__in=[TrabajoReporte.Estado.LISTO, TrabajoReporte.Estado.FALLIDO],
+        fecha_creacion__lt=timezone.now() - timedelta(days=dias),
+    )
+    for trabajo in vencidos.only('id', 'archivo').iterator():
+        if trabajo.archivo:
+            trabajo.archivo.delete(save=False)
+    borrados, _ = vencidos.delete()
+    return borrados
@@ -1,17 +1,25 @@
+import os
 import traceback
+from django.core.exceptions import ValidationError
+from django.http import FileResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import PrediccionVentas
-from .serializers import PrediccionVentasSerializer
+from rest_framework.reverse import reverse
+from .models import PrediccionVentas, TrabajoReporte
+from .serializers import PrediccionVentasSerializer, TrabajoReporteSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .utils_reports import generate_dynamic_report
+from .utils_trabajos import encolar_reporte
 from django.http import HttpResponse    
 from apps.venta_transacciones.models import Venta
+from config.routers import LecturaEnReplicaMixin, en_replica
+from config.cache_respuestas import respuesta_en_cache
 
 
-class PrediccionVentasViewSet(viewsets.ReadOnlyModelViewSet):
+class PrediccionVentasViewSet(LecturaEnReplicaMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint que permite ver las predicciones de ventas (CU-16).
     """
@@ -22,6 +30,11 @@ class PrediccionVentasViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['categoria']
 
+    # Igual para todos hasta que generar_predicciones guarde otra corrida
+    @respuesta_en_cache('predicciones')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class ReportesViewSet(viewsets.ViewSet):
     """
@@ -30,13 +43,22 @@ class ReportesViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated] # O IsAdminRole
 
     @action(detail=False, methods=['post'], url_path='generar_reporte')
+    @en_replica
     def generar_reporte(self, request):
         prompt = request.data.get('prompt', '')
         if not prompt:
             return Response({'error': 'El prompt de texto es requerido.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # ?async=1: se encola y lo genera 'procesar_reportes'; el cliente consulta GET /reportes/{id}/
+        if request.query_params.get('async') in ('1', 'true'):
+            trabajo = encolar_reporte(request.user, prompt)
+            datos = TrabajoReporteSerializer(trabajo, context={'request': request}).data
+            return Response(datos, status=status.HTTP_202_ACCEPTED, headers={
+                'Location': reverse('reportes-detail', args=[trabajo.id], request=request),
+            })
+
         try:
-            return generate_dynamic_report(prompt)
+            respuesta = generate_dynamic_report(prompt)
 
         # Capturamos el error específico que lanzamos si no hay datos
         except Venta.DoesNotExist as e:
@@ -45,4 +67,44 @@ class ReportesViewSet(viewsets.ViewSet):
         except Exception as e:
             print("❌ ERROR EN REPORTE DINÁMICO:")
             traceback.print_exc()   # 👈 esto imprimirá la causa real
-            return Response({'error': f'Error al procesar el reporte: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({'error': f'Error al procesar el reporte: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # ETag de la caché de reportes: si el cliente ya tiene el archivo, no se reenvía.
+        # PDF y Excel lo traen desde la primera respuesta; CSV y NDJSON salen mientras se
+        # generan y recién lo traen cuando se sirven desde el disco (a partir de la segunda)
+        etag = respuesta.get('ETag')
+        if etag and etag in parse_etags(request.headers.get('If-None-Match', '')):
+            respuesta.close()
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return respuesta
+
+    def _trabajo_del_usuario(self, request, pk):
+        try:
+            return TrabajoReporte.objects.filter(pk=pk, usuario=request.user).first()
+        except ValidationError:  # pk que no es un UUID
+            return None
+
+    def retrieve(self, request, pk=None):
+        """Estado de un reporte pedido con ?async=1."""
+        trabajo = self._trabajo_del_usuario(request, pk)
+        if trabajo is None:
+            return Response({'error': 'Reporte no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TrabajoReporteSerializer(trabajo, context={'request': request}).data)
+
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        trabajo = self._trabajo_del_usuario(request, pk)
+        if trabajo is None:
+            return Response({'error': 'Reporte no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        if trabajo.estado != TrabajoReporte.Estado.LISTO:
+            return Response(
+                {'error': f'El reporte no está listo (estado: {trabajo.estado}).'}, status=status.HTTP_409_CONFLICT
+            )
+
+        # El archivo se envía por bloques desde el storage, con su tamaño conocido
+        response = FileResponse(
+            trabajo.archivo.open('rb'), as_attachment=True,
+            filename=os.path.basename(trabajo.archivo.name), content_type=trabajo.tipo_contenido,
+        )
+        response['Content-Length'] = trabajo.tamano
+        return response
@@ -0,0 +1,32 @@
+from django.db.models import Case, When, Value, IntegerField
+from rest_framework import filters
+from .utils_busqueda import buscar_clientes, LIMITE_BUSQUEDA
+
+
+class BusquedaClienteFilter(filters.SearchFilter):
+    """
+    ?search= resuelto sobre el documento de búsqueda del cliente (sin acentos ni mayúsculas),
+    con trigramas en PostgreSQL o con el índice de n-gramas en memoria.
+
+    La vista define:
+    - busqueda_campo_cliente: ruta del queryset al Cliente ('cliente' en Usuario o Venta).
+    - busqueda_limite: máximo de clientes encontrados (por defecto LIMITE_BUSQUEDA).
+    Si la vista no pagina por cursor, los resultados quedan ordenados por relevancia.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, '')
+        ids = buscar_clientes(texto, getattr(view, 'busqueda_limite', LIMITE_BUSQUEDA))
+        if ids is None:
+            return queryset
+
+        if not ids:
+            return queryset.none()
+
+        campo = view.busqueda_campo_cliente
+        relevancia = Case(
+            *[When(**{campo: cliente_id}, then=Value(posicion)) for posicion, cliente_id in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        # El orden original de la vista queda como desempate
+        return queryset.filter(**{f'{campo}__in': ids}).order_by(relevancia, *queryset.query.order_by)
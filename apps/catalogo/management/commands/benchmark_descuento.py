@@ -0,0 +1,92 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.catalogo.models import Categoria, Producto, MovimientoStock
+from apps.catalogo.utils import descontar_stock, StockInsuficiente
+
+CODIGO_BENCHMARK = 'BENCH-DESCUENTO'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara compras por segundo sobre un único producto entre el descuento condicional '
+        '(descontar_stock) y el patrón anterior SELECT FOR UPDATE. Crea un producto temporal '
+        'y lo elimina al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--compras', type=int, default=25, help='Compras por hilo.')
+        parser.add_argument(
+            '--resto-checkout', type=float, default=0.002,
+            help='Segundos del resto del checkout (insertar la venta, sus detalles, serializar...).'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El benchmark requiere PostgreSQL.')
+
+        hilos = options['hilos']
+        compras = options['compras']
+        resto_checkout = options['resto_checkout']
+        categoria, _ = Categoria.objects.get_or_create(nombre='Benchmark')
+        producto = Producto.objects.create(
+            codigo_producto=CODIGO_BENCHMARK, nombre='Producto de benchmark', categoria=categoria,
+        )
+
+        def comprar_condicional():
+            try:
+                with transaction.atomic():
+                    time.sleep(resto_checkout)
+                    descontar_stock({producto.pk: 1}, referencia='benchmark')
+                return True
+            except StockInsuficiente:
+                return False
+
+        def comprar_con_bloqueo():
+            # Patrón anterior: SELECT ... FOR UPDATE + lectura/modificación/escritura en Python
+            with transaction.atomic():
+                bloqueado = Producto.objects.select_for_update().get(pk=producto.pk)
+                if bloqueado.stock_actual < 1:
+                    return False
+                bloqueado.stock_actual -= 1
+                bloqueado.save(update_fields=['stock_actual'])
+                time.sleep(resto_checkout)
+            return True
+
+        self.stdout.write(f'{hilos} hilos x {compras} compras, {resto_checkout * 1000:.1f} ms de checkout')
+        self.stdout.write(f'{"estrategia":>20} | {"compras/s":>10} | {"vendidas":>8}')
+        try:
+            for nombre, comprar in (('condicional', comprar_condicional), ('select_for_update', comprar_con_bloqueo)):
+                # Stock menor que el total de intentos: también se mide el camino de stock agotado
+                Producto.objects.filter(pk=producto.pk).update(stock_actual=hilos * compras * 3 // 4)
+                vendidas, segundos = self._ejecutar(comprar, hilos, compras)
+                self.stdout.write(f'{nombre:>20} | {hilos * compras / segundos:>10.0f} | {vendidas:>8}')
+        finally:
+            MovimientoStock.objects.filter(producto=producto).delete()
+            producto.delete()
+
+    def _ejecutar(self, comprar, hilos, compras):
+        vendidas = []
+        barrera = threading.Barrier(hilos)
+
+        def trabajador():
+            exitos = 0
+            try:
+                barrera.wait()
+                for _ in range(compras):
+                    exitos += comprar()
+            finally:
+                vendidas.append(exitos)
+                connection.close()
+
+        trabajadores = [threading.Thread(target=trabajador) for _ in range(hilos)]
+        inicio = time.perf_counter()
+        for trabajador_hilo in trabajadores:
+            trabajador_hilo.start()
+        for trabajador_hilo in trabajadores:
+            trabajador_hilo.join()
+        return sum(vendidas), time.perf_counter() - inicio
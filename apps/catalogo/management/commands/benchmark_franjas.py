@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.catalogo.models import Categoria, Producto, MovimientoStock
+from apps.catalogo.utils import descontar_stock, activar_modo_hot, StockInsuficiente
+
+CODIGO_BENCHMARK = 'BENCH-FRANJAS'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide compras por segundo sobre un único producto con distinta cantidad de franjas '
+        '(0 = modo normal). Crea un producto temporal y lo elimina al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--franjas', default='0,1,2,4,8,16', help='Lista de cantidades de franjas a probar.')
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--compras', type=int, default=50, help='Compras por hilo.')
+        parser.add_argument(
+            '--resto-checkout', type=float, default=0.002,
+            help='Segundos que el checkout mantiene la transacción abierta después del descuento.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El benchmark requiere PostgreSQL (SKIP LOCKED).')
+
+        hilos = options['hilos']
+        compras = options['compras']
+        stock_inicial = hilos * compras
+        categoria, _ = Categoria.objects.get_or_create(nombre='Benchmark')
+        producto = Producto.objects.create(
+            codigo_producto=CODIGO_BENCHMARK, nombre='Producto de benchmark', categoria=categoria,
+        )
+
+        self.stdout.write(f'{hilos} hilos x {compras} compras, {options["resto_checkout"] * 1000:.1f} ms de checkout')
+        self.stdout.write(f'{"franjas":>8} | {"compras/s":>10} | {"vendidas":>8}')
+        try:
+            for franjas in [int(valor) for valor in options['franjas'].split(',')]:
+                Producto.objects.filter(pk=producto.pk).update(stock_actual=stock_inicial, stock_fraccionado=False)
+                producto.franjas.all().delete()
+                if franjas:
+                    activar_modo_hot(producto.pk, franjas)
+
+                vendidas, segundos = self._ejecutar(producto.pk, franjas > 0, hilos, compras, options['resto_checkout'])
+                self.stdout.write(f'{franjas:>8} | {vendidas / segundos:>10.0f} | {vendidas:>8}')
+        finally:
+            MovimientoStock.objects.filter(producto=producto).delete()
+            producto.delete()
+
+    def _ejecutar(self, producto_id, hot, hilos, compras, resto_checkout):
+        vendidas = []
+        fraccionados = {producto_id} if hot else set()
+        barrera = threading.Barrier(hilos)
+
+        def comprar():
+            try:
+                with transaction.atomic():
+                    descontar_stock({producto_id: 1}, referencia='benchmark', fraccionados=fraccionados)
+                    time.sleep(resto_checkout)
+                return True
+            except StockInsuficiente:
+                return False
+
+        def trabajador():
+            exitos = 0
+            try:
+                barrera.wait()
+                for _ in range(compras):
+                    exitos += comprar()
+            finally:
+                vendidas.append(exitos)
+                connection.close()
+
+        trabajadores = [threading.Thread(target=trabajador) for _ in range(hilos)]
+        inicio = time.perf_counter()
+        for trabajador_hilo in trabajadores:
+            trabajador_hilo.start()
+        for trabajador_hilo in trabajadores:
+            trabajador_hilo.join()
+        return sum(vendidas), time.perf_counter() - inicio
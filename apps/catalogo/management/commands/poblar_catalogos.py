@@ -7,7 +7,8 @@ import unicodedata
 import re
 
 from apps.acceso_seguridad.models import Usuario
-from apps.catalogo.models import Categoria, Producto, Cliente
+from apps.catalogo.models import Categoria, Producto, Cliente, MovimientoStock
+from apps.catalogo.utils_busqueda import documento_cliente, invalidar_indice_clientes
 
 # --- CONFIGURACIÓN DE LA SIMULACIÓN ---
 CLIENTES_A_CREAR = 100
@@ -87,7 +88,10 @@ class Command(BaseCommand):
             Usuario.objects.bulk_create(usuarios_creados)
             for i, cliente in enumerate(clientes_creados):
                 cliente.usuario_id = usuarios_creados[i].id
+                # bulk_create no emite pre_save: el documento de búsqueda se arma aquí
+                cliente.documento_busqueda = documento_cliente(usuarios_creados[i], cliente.ciudad)
             Cliente.objects.bulk_create(clientes_creados)
+            invalidar_indice_clientes()
             self.stdout.write(self.style.SUCCESS(f'Se crearon {clientes_a_crear_ahora} clientes.'))
         # --- FIN DEL CAMBIO ---
 
@@ -132,6 +136,11 @@ class Command(BaseCommand):
             productos_creados.append(producto)
             
         Producto.objects.bulk_create(productos_creados)
+        # El stock inicial entra al libro de movimientos como ajuste
+        MovimientoStock.objects.bulk_create([
+            MovimientoStock(producto=p, tipo=MovimientoStock.TipoMovimiento.AJUSTE, cantidad=p.stock_actual, referencia='saldo-inicial')
+            for p in productos_creados
+        ])
         # --- FIN DEL CAMBIO ---
 
         self.stdout.write(self.style.SUCCESS(f'--- Poblamiento completado: {PRODUCTOS_A_CREAR} productos creados ---'))
\ No newline at end of file
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.catalogo.models import Producto
+from apps.catalogo.utils import rebalancear_franjas
+
+
+class Command(BaseCommand):
+    help = (
+        'Reparte en partes iguales el stock de las franjas de los productos en modo hot '
+        'y actualiza su stock_actual. Con --intervalo se queda corriendo en segundo plano.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=0, help='Segundos entre pasadas (0 = una sola pasada).')
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        while True:
+            productos = list(Producto.objects.filter(stock_fraccionado=True).values_list('id', flat=True))
+            for producto_id in productos:
+                # Una transacción corta por producto: las franjas quedan bloqueadas solo un instante
+                rebalancear_franjas(producto_id)
+            self.stdout.write(f'{len(productos)} productos en modo hot rebalanceados.')
+
+            if not intervalo:
+                break
+            time.sleep(intervalo)
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from apps.catalogo.models import Producto, MovimientoStock
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye Producto.stock_actual a partir del libro MovimientoStock. '
+        'Procesa los productos por rangos de ID con un único UPDATE por lote.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano-lote', type=int, default=5000, help='Cantidad de IDs de producto por lote.')
+        parser.add_argument('--solo-verificar', action='store_true', help='Solo informa los productos descuadrados, sin corregirlos.')
+
+    def handle(self, *args, **options):
+        tamano_lote = options['tamano_lote']
+        solo_verificar = options['solo_verificar']
+
+        rango = Producto.objects.aggregate(minimo=Min('id'), maximo=Max('id'))
+        if rango['minimo'] is None:
+            self.stdout.write(self.style.WARNING('No hay productos.'))
+            return
+
+        producto = connection.ops.quote_name(Producto._meta.db_table)
+        movimiento = connection.ops.quote_name(MovimientoStock._meta.db_table)
+
+        # Saldo del libro por producto (los productos sin movimientos quedan en 0)
+        saldos = f"""
+            SELECT p2.id, COALESCE(SUM(m.cantidad), 0) AS saldo
+            FROM {producto} p2
+            LEFT JOIN {movimiento} m ON m.producto_id = p2.id
+            WHERE p2.id BETWEEN %s AND %s
+            GROUP BY p2.id
+        """
+        sql_verificar = f"""
+            SELECT p.id, p.stock_actual, s.saldo FROM {producto} p
+            JOIN ({saldos}) s ON s.id = p.id
+            WHERE p.stock_actual <> s.saldo AND NOT p.stock_fraccionado
+            ORDER BY p.id
+        """
+        sql_reconstruir = f"""
+            UPDATE {producto} SET stock_actual = s.saldo
+            FROM ({saldos}) s
+            WHERE {producto}.id = s.id AND {producto}.stock_actual <> s.saldo
+              AND NOT {producto}.stock_fraccionado
+        """
+
+        self.stdout.write(self.style.WARNING('--- RECONSTRUYENDO STOCK DESDE EL LIBRO DE MOVIMIENTOS ---'))
+        total = 0
+        for inicio in range(rango['minimo'], rango['maximo'] + 1, tamano_lote):
+            fin = inicio + tamano_lote - 1
+            with transaction.atomic(), connection.cursor() as cursor:
+                if solo_verificar:
+                    cursor.execute(sql_verificar, [inicio, fin])
+                    descuadrados = cursor.fetchall()
+                    for producto_id, stock_actual, saldo in descuadrados:
+                        self.stdout.write(f'  Producto {producto_id}: stock_actual={stock_actual}, libro={saldo}')
+                    total += len(descuadrados)
+                else:
+                    cursor.execute(sql_reconstruir, [inicio, fin])
+                    total += cursor.rowcount
+
+        en_modo_hot = Producto.objects.filter(stock_fraccionado=True).count()
+        if en_modo_hot:
+            # Su stock vive en FranjaStock: hay que desactivar el modo hot antes de reconstruirlos
+            self.stdout.write(self.style.NOTICE(f'{en_modo_hot} productos en modo hot omitidos.'))
+
+        if solo_verificar:
+            self.stdout.write(self.style.SUCCESS(f'--- {total} productos descuadrados ---'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'--- {total} productos corregidos ---'))
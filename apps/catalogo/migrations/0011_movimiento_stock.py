@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0010_alter_cliente_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('VENTA', 'Venta'), ('DEVOLUCION', 'Devolución'), ('AJUSTE', 'Ajuste')], max_length=20)),
+                ('cantidad', models.IntegerField()),
+                ('referencia', models.CharField(blank=True, default='', max_length=50)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='catalogo.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movstock_producto_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.utils import timezone
+
+TAMANO_LOTE = 2000
+
+
+def registrar_stock_inicial(apps, schema_editor):
+    """Un movimiento AJUSTE por producto con su stock actual, para que el libro cuadre desde el inicio."""
+    Producto = apps.get_model('catalogo', 'Producto')
+    MovimientoStock = apps.get_model('catalogo', 'MovimientoStock')
+    ahora = timezone.now()
+
+    lote = []
+    for producto_id, stock in Producto.objects.filter(stock_actual__gt=0).values_list('id', 'stock_actual').iterator():
+        lote.append(MovimientoStock(
+            producto_id=producto_id, tipo='AJUSTE', cantidad=stock,
+            referencia='saldo-inicial', fecha=ahora,
+        ))
+        if len(lote) >= TAMANO_LOTE:
+            MovimientoStock.objects.bulk_create(lote)
+            lote = []
+    MovimientoStock.objects.bulk_create(lote)
+
+
+def eliminar_stock_inicial(apps, schema_editor):
+    MovimientoStock = apps.get_model('catalogo', 'MovimientoStock')
+    MovimientoStock.objects.filter(referencia='saldo-inicial').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0011_movimiento_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(registrar_stock_inicial, eliminar_stock_inicial),
+    ]
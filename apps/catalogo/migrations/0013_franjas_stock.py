@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0012_movimiento_stock_inicial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='stock_fraccionado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='FranjaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='franjas', to='catalogo.producto')),
+            ],
+            options={
+                'verbose_name': 'Franja de Stock',
+                'verbose_name_plural': 'Franjas de Stock',
+                'ordering': ['producto', 'indice'],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'indice'), name='unica_franja_por_producto')],
+            },
+        ),
+    ]
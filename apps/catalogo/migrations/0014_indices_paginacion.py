@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0013_franjas_stock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventarioproducto',
+            index=models.Index(fields=['-fecha_ingreso', '-id'], name='ingreso_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:23
+
+import unicodedata
+
+from django.db import migrations, models
+
+TAMANO_LOTE = 2000
+
+
+def _normalizar(texto):
+    # Copia de utils_busqueda.normalizar_texto (las migraciones no dependen del código de la app)
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ' '.join(''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold().split())
+
+
+def llenar_documentos(apps, schema_editor):
+    Cliente = apps.get_model('catalogo', 'Cliente')
+    lote = []
+    for cliente in Cliente.objects.select_related('usuario').iterator(chunk_size=TAMANO_LOTE):
+        usuario = cliente.usuario
+        cliente.documento_busqueda = _normalizar(' '.join(
+            parte for parte in (usuario.nombre, usuario.apellido, usuario.correo, cliente.ciudad) if parte
+        ))
+        lote.append(cliente)
+        if len(lote) >= TAMANO_LOTE:
+            Cliente.objects.bulk_update(lote, ['documento_busqueda'])
+            lote = []
+    Cliente.objects.bulk_update(lote, ['documento_busqueda'])
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    """
+    Índice GIN de trigramas para LIKE '%...%' sobre el documento. Solo si el servidor
+    trae pg_trgm; si no, la búsqueda usa el índice de n-gramas en memoria.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cliente_documento_trgm_idx '
+        'ON catalogo_cliente USING gin (documento_busqueda gin_trgm_ops)'
+    )
+
+
+def eliminar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS cliente_documento_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0014_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='documento_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(llenar_documentos, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trigramas, eliminar_indice_trigramas),
+    ]
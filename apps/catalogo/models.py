@@ -9,6 +9,8 @@ class Cliente(models.Model):
     usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, related_name='cliente')
     ciudad = models.CharField(max_length=120, blank=True, null=True)
     codigo_postal = models.CharField(max_length=20, blank=True, null=True)
+    # Nombre, apellido, correo y ciudad normalizados (ver utils_busqueda); lo mantienen los signals
+    documento_busqueda = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         ordering = ['id']
@@ -67,6 +69,9 @@ class Producto(models.Model):
     )
     
     stock_actual = models.PositiveIntegerField(default=0)
+    # Modo "hot": el stock se reparte en filas FranjaStock y 'stock_actual' pasa a ser
+    # un reflejo que actualiza el rebalanceo (ver catalogo/utils.py)
+    stock_fraccionado = models.BooleanField(default=False)
     ano_garantia = models.PositiveIntegerField(default=0) # Mantenemos tu campo
     
     # CORRECCIÓN: El script SQL usa RESTRICT para evitar borrar categorías con productos 
@@ -84,6 +89,25 @@ class Producto(models.Model):
     def __str__(self):
         return f"{self.nombre} - {self.codigo_producto}"
 
+# --- Modelo FranjaStock (productos en modo hot) ---
+# Durante una promoción el stock de un producto se divide en N franjas para que
+# los checkouts concurrentes no se serialicen sobre una única fila de Producto.
+class FranjaStock(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='franjas')
+    indice = models.PositiveSmallIntegerField()
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['producto', 'indice']
+        verbose_name = 'Franja de Stock'
+        verbose_name_plural = 'Franjas de Stock'
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'indice'], name='unica_franja_por_producto'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}#{self.indice}: {self.cantidad}"
+
 # --- Modelo Inventario (CU-09) ---
 # CORRECCIÓN: Modelo alineado al script SQL (usa 'codigo' en lugar de 'nombre')
 class Inventario(models.Model):
@@ -118,7 +142,39 @@ class InventarioProducto(models.Model):
         verbose_name = 'Entrada de Inventario'
         verbose_name_plural = 'Entradas de Inventario'
         ordering = ['-fecha_ingreso']
+        indexes = [
+            # Paginación por keyset (IngresoInventarioPaginacion)
+            models.Index(fields=['-fecha_ingreso', '-id'], name='ingreso_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"Ingreso: {self.producto.nombre} (+{self.cantidad}) en {self.inventario.codigo} el {self.fecha_ingreso.strftime('%Y-%m-%d')}"
 
+
+# --- Modelo MovimientoStock (libro de movimientos) ---
+# Registro de solo inserción: cada cambio de stock deja una fila con su cantidad con signo.
+# 'Producto.stock_actual' es la proyección materializada de la suma de estos movimientos.
+class MovimientoStock(models.Model):
+
+    class TipoMovimiento(models.TextChoices):
+        INGRESO = 'INGRESO', 'Ingreso'
+        VENTA = 'VENTA', 'Venta'
+        DEVOLUCION = 'DEVOLUCION', 'Devolución'
+        AJUSTE = 'AJUSTE', 'Ajuste'
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TipoMovimiento.choices)
+    cantidad = models.IntegerField()  # Positiva para entradas, negativa para salidas
+    referencia = models.CharField(max_length=50, blank=True, default='')  # Ej: 'venta:15', 'ingreso:8'
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Movimiento de Stock'
+        verbose_name_plural = 'Movimientos de Stock'
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='movstock_producto_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo}: {self.producto_id} ({self.cantidad:+d})"
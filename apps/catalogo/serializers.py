@@ -1,6 +1,8 @@
+from django.db import models
 from rest_framework import serializers
 from .models import *
 from apps.acceso_seguridad.models import Usuario
+from .utils import stock_en_franjas, anotar_stock_franjas
 
 # --- (INICIO) SERIALIZADORES DE CLIENTE ---
 
@@ -120,6 +122,19 @@ class CategoriaSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["fecha_creacion"]
         
+class ListaConStockFranjasSerializer(serializers.ListSerializer):
+    """
+    Lista (many=True) de productos, o de filas con un producto en 'campo_producto' del hijo.
+    Antes de serializar calcula en una sola consulta el stock de los productos en modo hot
+    que no traen la anotación 'stock_franjas' (carrito, ingresos de inventario...).
+    """
+    def to_representation(self, data):
+        filas = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        campo_producto = getattr(self.child, 'campo_producto', None)
+        anotar_stock_franjas([getattr(fila, campo_producto) if campo_producto else fila for fila in filas])
+        return super().to_representation(filas)
+
+
 class ProductoSerializer(serializers.ModelSerializer):
     """
     Serializador para el modelo Producto (CU-08).
@@ -134,9 +149,32 @@ class ProductoSerializer(serializers.ModelSerializer):
             "id", "codigo_producto", "nombre", "descripcion", "precio_venta",
             "precio_compra", "imagen_url", "estado", "stock_actual", 
             "ano_garantia",
-            "categoria", "categoria_nombre", "marca", "fecha_creacion"
+            "categoria", "categoria_nombre", "marca", "fecha_creacion", "stock_fraccionado"
         ]
-        read_only_fields = ["fecha_creacion", "categoria_nombre"]
+        read_only_fields = ["fecha_creacion", "categoria_nombre", "stock_fraccionado"]
+        list_serializer_class = ListaConStockFranjasSerializer
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # En modo hot el stock publicado es la suma de las franjas
+        # (ProductoViewSet la anota como 'stock_franjas' y ListaConStockFranjasSerializer la completa
+        # para toda la lista; solo un producto suelto consulta aquí sus franjas)
+        if instance.stock_fraccionado:
+            stock_franjas = getattr(instance, 'stock_franjas', None)
+            if stock_franjas is None:
+                stock_franjas = stock_en_franjas([instance.pk])[instance.pk]
+            data['stock_actual'] = stock_franjas
+        return data
+
+    # Listado por proyección (config/proyecciones.py): misma regla sobre el dict de la fila
+    columnas_proyeccion = ('stock_franjas',)
+
+    def ajustar_proyeccion(self, fila, data):
+        if fila['stock_fraccionado']:
+            stock_franjas = fila['stock_franjas']
+            if stock_franjas is None:
+                stock_franjas = stock_en_franjas([fila['id']])[fila['id']]
+            data['stock_actual'] = stock_franjas
 
 class InventarioProductoSerializer(serializers.ModelSerializer):
     """
@@ -151,6 +189,9 @@ class InventarioProductoSerializer(serializers.ModelSerializer):
     
     inventario_codigo = serializers.CharField(source='inventario.codigo', read_only=True)
 
+    # Para ListaConStockFranjasSerializer
+    campo_producto = 'producto'
+
     class Meta:
         model = InventarioProducto
         fields = [
@@ -159,6 +200,7 @@ class InventarioProductoSerializer(serializers.ModelSerializer):
             "fecha_ingreso"
         ]
         read_only_fields = ["fecha_ingreso", "producto", "inventario_codigo"]
+        list_serializer_class = ListaConStockFranjasSerializer
 
 class InventarioSerializer(serializers.ModelSerializer):
     """
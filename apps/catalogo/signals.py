@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from apps.acceso_seguridad.models import Usuario
 from .models import Cliente
+from .utils_busqueda import documento_cliente, invalidar_indice_clientes
 
 
 @receiver(post_save, sender=Usuario)
@@ -19,3 +20,35 @@ def crear_perfil_cliente(sender, instance, created, **kwargs):
         if not hasattr(instance, 'cliente'):
             Cliente.objects.create(usuario=instance)
             print(f"✓ Perfil de Cliente creado automáticamente para: {instance.correo}")
+
+
+@receiver(pre_save, sender=Cliente)
+def actualizar_documento_cliente(sender, instance, **kwargs):
+    """Recalcula el documento de búsqueda del cliente antes de guardarlo."""
+    instance.documento_busqueda = documento_cliente(instance.usuario, instance.ciudad)
+    invalidar_indice_clientes()
+
+
+# Campos de Usuario que forman parte del documento de búsqueda del cliente
+CAMPOS_USUARIO_BUSQUEDA = {'nombre', 'apellido', 'correo'}
+
+
+@receiver(post_save, sender=Usuario)
+def actualizar_documento_usuario(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Si cambian el nombre, apellido o correo de un cliente, su documento de búsqueda también.
+    Un usuario nuevo ya lo tiene (lo arma el pre_save de su Cliente), y un guardado con
+    update_fields que no los incluye (p. ej. last_login al iniciar sesión) no consulta nada.
+    """
+    if created or (update_fields is not None and not CAMPOS_USUARIO_BUSQUEDA & set(update_fields)):
+        return
+    for cliente_id, ciudad, documento in Cliente.objects.filter(usuario=instance).values_list('id', 'ciudad', 'documento_busqueda'):
+        nuevo = documento_cliente(instance, ciudad)
+        if nuevo != documento:
+            Cliente.objects.filter(pk=cliente_id).update(documento_busqueda=nuevo)
+            invalidar_indice_clientes()
+
+
+@receiver(post_delete, sender=Cliente)
+def quitar_cliente_del_indice(sender, instance, **kwargs):
+    invalidar_indice_clientes()
@@ -1,3 +1,251 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time
+import unittest
 
-# Create your tests here.
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.acceso_seguridad.models import Usuario
+from apps.venta_transacciones.models import Carrito, DetalleCarrito
+from apps.venta_transacciones.utils import registrar_ventas_lote
+from .models import Categoria, Producto, MovimientoStock, Cliente
+from .serializers import ProductoSerializer
+from .utils_busqueda import buscar_clientes, normalizar_texto
+from .utils import descontar_stock, StockInsuficiente, activar_modo_hot, rebalancear_franjas
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Requiere PostgreSQL local')
+class DescuentoStockConcurrenteTests(TransactionTestCase):
+    """Varios hilos compran el mismo producto a la vez (venta relámpago)."""
+    HILOS = 16
+    INTENTOS_POR_HILO = 25
+    STOCK_INICIAL = 300  # menor que HILOS * INTENTOS_POR_HILO: debe agotarse sin sobreventa
+    RESTO_DEL_CHECKOUT = 0.002  # insertar la venta, sus detalles, serializar...
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Promoción')
+        self.producto = Producto.objects.create(
+            codigo_producto='FLASH-1', nombre='Freidora de Aire 5L', precio_venta=100,
+            categoria=categoria, stock_actual=self.STOCK_INICIAL,
+        )
+
+    def _ejecutar_en_hilos(self, comprar):
+        vendidos = []
+        barrera = threading.Barrier(self.HILOS)
+
+        def trabajador():
+            exitos = 0
+            try:
+                barrera.wait()
+                for _ in range(self.INTENTOS_POR_HILO):
+                    if comprar():
+                        exitos += 1
+            finally:
+                vendidos.append(exitos)
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return sum(vendidos)
+
+    def _comprar_condicional(self):
+        try:
+            with transaction.atomic():
+                time.sleep(self.RESTO_DEL_CHECKOUT)
+                descontar_stock({self.producto.id: 1})
+            return True
+        except StockInsuficiente:
+            return False
+
+    def test_sin_sobreventa(self):
+        # La comparación de velocidad con SELECT FOR UPDATE está en 'manage.py benchmark_descuento'
+        vendidos = self._ejecutar_en_hilos(self._comprar_condicional)
+
+        self.producto.refresh_from_db()
+        self.assertEqual(vendidos, self.STOCK_INICIAL)
+        self.assertEqual(self.producto.stock_actual, 0)
+
+    def test_pedido_con_un_producto_sin_stock_no_descuenta_nada(self):
+        otro = Producto.objects.create(
+            codigo_producto='FLASH-2', nombre='Hervidor de Agua 1.7L', precio_venta=50,
+            categoria=self.producto.categoria, stock_actual=1,
+        )
+        with self.assertRaises(StockInsuficiente):
+            descontar_stock({self.producto.id: 5, otro.id: 2})
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, self.STOCK_INICIAL)
+
+    def test_modo_hot_sin_sobreventa(self):
+        activar_modo_hot(self.producto.id, franjas=4)
+
+        vendidos = self._ejecutar_en_hilos(self._comprar_condicional)
+
+        self.assertEqual(vendidos, self.STOCK_INICIAL)
+        self.assertFalse(self.producto.franjas.filter(cantidad__gt=0).exists())
+        self.assertEqual(rebalancear_franjas(self.producto.id), 0)
+        with self.assertRaises(StockInsuficiente):
+            descontar_stock({self.producto.id: 1})
+
+
+class LibroMovimientosTests(TestCase):
+    """Cada escritor de stock deja su movimiento: el saldo del libro es el stock_actual."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(correo='libro-admin@test.com', password='x', rol='ADMIN')
+        cls.comprador = Usuario.objects.create_user(correo='libro@test.com', password='x', rol='CLIENTE')
+        cls.categoria = Categoria.objects.create(nombre='Libro')
+
+    def _saldos(self):
+        return dict(MovimientoStock.objects.values_list('producto_id').annotate(saldo=Sum('cantidad')))
+
+    def _stock(self):
+        return dict(Producto.objects.values_list('id', 'stock_actual'))
+
+    def test_reconstruir_stock_reproduce_el_stock_actual(self):
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        ids = []
+        for codigo, stock in (('LIB-1', 20), ('LIB-2', 5)):
+            respuesta = admin.post('/api/productos/', {
+                'codigo_producto': codigo, 'nombre': codigo, 'precio_venta': '10.00',
+                'categoria': self.categoria.id, 'stock_actual': stock,
+            }, format='json')
+            self.assertEqual(respuesta.status_code, 201, respuesta.content)
+            ids.append(respuesta.data['id'])
+        agua, jugo = ids
+
+        respuesta = admin.patch(f'/api/productos/{agua}/', {'stock_actual': 15}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+
+        comprador = APIClient()
+        comprador.force_authenticate(self.comprador)
+        carrito = Carrito.objects.create(cliente=self.comprador.cliente)
+        DetalleCarrito.objects.bulk_create([
+            DetalleCarrito(carrito=carrito, producto_id=agua, cantidad=2, precio_unitario=10, subtotal=20),
+            DetalleCarrito(carrito=carrito, producto_id=jugo, cantidad=1, precio_unitario=10, subtotal=10),
+        ])
+        respuesta = comprador.post('/api/carritos/crear_venta_desde_carrito/', {}, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+
+        resultados = registrar_ventas_lote([(1, {'detalles': [{'producto_id': agua, 'cantidad': 3}]})])
+        self.assertEqual(resultados[0]['estado'], 'creada')
+
+        self.assertEqual(self._stock(), {agua: 10, jugo: 4})
+        self.assertEqual(self._saldos(), self._stock())
+        self.assertEqual(
+            set(MovimientoStock.objects.values_list('tipo', flat=True)),
+            {MovimientoStock.TipoMovimiento.AJUSTE, MovimientoStock.TipoMovimiento.VENTA},
+        )
+
+        # Con el stock descuadrado, reconstruir_stock lo vuelve a sacar del libro
+        Producto.objects.update(stock_actual=999)
+        call_command('reconstruir_stock', stdout=io.StringIO())
+        self.assertEqual(self._stock(), {agua: 10, jugo: 4})
+
+
+class ListadoProyectadoProductoTests(TestCase):
+    """El listado proyectado de productos produce el mismo JSON que ProductoSerializer."""
+
+    def test_mismo_json_que_el_serializador(self):
+        categoria = Categoria.objects.create(nombre='Proyección')
+        Producto.objects.bulk_create([
+            Producto(codigo_producto='PROY-1', nombre='Agua', precio_venta='5.50', stock_actual=4, categoria=categoria),
+            Producto(codigo_producto='PROY-2', nombre='Jugo', precio_venta=8, precio_compra='6.25',
+                     marca='Valle', ano_garantia=1, categoria=categoria),
+            Producto(codigo_producto='PROY-3', nombre='Freidora', precio_venta=300, stock_actual=9, categoria=categoria),
+        ])
+        # En modo hot el stock publicado sale de las franjas (ajustar_proyeccion)
+        activar_modo_hot(Producto.objects.get(codigo_producto='PROY-3').id, franjas=2)
+
+        client = APIClient()
+        client.force_authenticate(Usuario.objects.create_user(correo='proy@test.com', password='x', rol='CLIENTE'))
+        proyectado = client.get('/api/productos/').json()
+
+        esperado = json.loads(JSONRenderer().render(ProductoSerializer(Producto.objects.order_by('id'), many=True).data))
+
+        self.assertEqual(len(proyectado), 3)
+        self.assertEqual(json.dumps(proyectado), json.dumps(esperado))
+        self.assertEqual(proyectado[2]['stock_actual'], 9)
+
+
+class BusquedaClientesTests(TestCase):
+    """?search= de clientes: sin acentos ni mayúsculas, por subcadena y ordenado por relevancia."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(correo='busqueda-admin@test.com', password='x', rol='ADMIN')
+        cls.jose, cls.maria, cls.josefina = [
+            Usuario.objects.create_user(correo=correo, password='x', rol='CLIENTE', nombre=nombre, apellido=apellido)
+            for correo, nombre, apellido in (
+                ('jose.p@test.com', 'José', 'PÉREZ'),
+                ('maria@test.com', 'María', 'González'),
+                ('jpereira@test.com', 'Josefina', 'Pereira'),
+            )
+        ]
+        for usuario, ciudad in ((cls.jose, 'La Paz'), (cls.maria, 'Cochabamba'), (cls.josefina, 'Santa Cruz')):
+            usuario.cliente.ciudad = ciudad
+            usuario.cliente.save()
+
+    def setUp(self):
+        # La versión del índice en memoria vive en la caché
+        cache.clear()
+
+    def test_normaliza_acentos_y_mayusculas(self):
+        self.assertEqual(normalizar_texto('  José   PÉREZ '), 'jose perez')
+        self.assertEqual(buscar_clientes('JOSÉ pérez'), [self.jose.cliente.id])
+        self.assertEqual(buscar_clientes('maria GONZALEZ'), [self.maria.cliente.id])
+        self.assertIsNone(buscar_clientes('   '))
+
+    def test_subcadenas_y_relevancia(self):
+        self.assertEqual(buscar_clientes('erez'), [self.jose.cliente.id])
+        self.assertCountEqual(buscar_clientes('pere'), [self.jose.cliente.id, self.josefina.cliente.id])
+        # 'jose' es palabra completa para José y solo el inicio de Josefina
+        self.assertEqual(buscar_clientes('jose'), [self.jose.cliente.id, self.josefina.cliente.id])
+        # Todos los términos deben aparecer, también los de menos de tres letras
+        self.assertEqual(buscar_clientes('la paz'), [self.jose.cliente.id])
+        self.assertEqual(buscar_clientes('cochabamba josé'), [])
+        self.assertEqual(buscar_clientes('xyz'), [])
+
+    def test_filtro_en_listado_de_clientes(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        respuesta = client.get('/api/clientes/', {'search': 'JOSE'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([fila['id'] for fila in respuesta.json()], [self.jose.id, self.josefina.id])
+        self.assertEqual(client.get('/api/clientes/', {'search': 'nadie'}).json(), [])
+
+    def test_documento_sigue_al_usuario(self):
+        self.maria.nombre = 'Mariela'
+        self.maria.save(update_fields=['nombre'])
+        self.assertEqual(buscar_clientes('mariela'), [self.maria.cliente.id])
+
+        # Guardar otros campos (el login resetea los intentos) no consulta el cliente
+        with self.assertNumQueries(1):
+            self.maria.resetear_intentos_fallidos()
+
+    # El comando fija la contraseña de cada cliente: con el hasher por defecto tarda casi un minuto
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_poblar_catalogos_arma_el_documento(self):
+        Categoria.objects.create(nombre='Electro')
+        with mock.patch('apps.catalogo.management.commands.poblar_catalogos.tqdm', side_effect=lambda iterable: iterable):
+            call_command('poblar_catalogos', stdout=io.StringIO())
+
+        self.assertFalse(Cliente.objects.filter(documento_busqueda='').exists())
+        sembrado = Cliente.objects.select_related('usuario').latest('id')
+        self.assertEqual(buscar_clientes(sembrado.usuario.correo), [sembrado.id])
@@ -0,0 +1,320 @@
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from .models import Producto, MovimientoStock, FranjaStock
+
+# Columnas de Producto que necesita el checkout (precio, stock, modo hot y categoría para el resumen diario)
+CAMPOS_PRODUCTO_VENTA = ('id', 'nombre', 'precio_venta', 'imagen_url', 'stock_actual', 'stock_fraccionado', 'categoria')
+
+# Franjas en las que se reparte el stock de un producto al activar el modo hot
+FRANJAS_POR_DEFECTO = 8
+
+
+class StockInsuficiente(Exception):
+    """
+    Se lanza cuando uno o más productos no tienen stock para la cantidad pedida.
+    'faltantes' es una lista de tuplas (producto, cantidad_pedida).
+    """
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        producto, pedido = faltantes[0]
+        super().__init__(
+            f"Stock insuficiente para '{producto.nombre}'. Disponible: {producto.stock_actual}, Pedido: {pedido}"
+        )
+
+
+class _DescuentoIncompleto(Exception):
+    pass
+
+
+# --- 1. DESCUENTO CONDICIONAL (sin read-modify-write en Python) ---
+def descontar_stock(cantidades, referencia='', tipo=MovimientoStock.TipoMovimiento.VENTA, fraccionados=None):
+    """
+    Descuenta stock para {producto_id: cantidad} con UPDATEs condicionales
+    (stock_actual >= cantidad). La falta de stock se detecta por las filas
+    afectadas, sin bloquear filas mientras corre código Python.
+    Los productos en modo hot se descuentan de sus franjas (ver 'descontar_franjas').
+    Cada descuento queda registrado en MovimientoStock con cantidad negativa.
+
+    'fraccionados' es el conjunto de IDs en modo hot si el llamador ya lo conoce
+    (por ejemplo al leer CAMPOS_PRODUCTO_VENTA). Si no se indica, el primer intento
+    asume que ninguno lo está: un producto hot no pasa el UPDATE y se corrige en el reintento.
+    Si falta stock no descuenta nada y lanza StockInsuficiente;
+    si algún producto no existe lanza Producto.DoesNotExist.
+    """
+    if not cantidades:
+        return
+
+    fraccionados = fraccionados or set()
+    for intento in range(2):
+        if intento:
+            # En el reintento releemos el modo: pudo activarse o desactivarse entre medio
+            fraccionados = set(
+                Producto.objects.filter(pk__in=cantidades.keys(), stock_fraccionado=True).values_list('id', flat=True)
+            )
+        normales = {pid: cantidad for pid, cantidad in cantidades.items() if pid not in fraccionados}
+        en_franjas = {pid: cantidad for pid, cantidad in cantidades.items() if pid in fraccionados}
+
+        try:
+            with transaction.atomic():
+                # El libro va primero: no bloquea Producto, y así las filas descontadas
+                # quedan bloqueadas solo desde el UPDATE hasta el COMMIT
+                registrar_movimientos({pid: -cantidad for pid, cantidad in cantidades.items()}, tipo, referencia)
+
+                if connection.vendor == 'postgresql':
+                    descontados = _descontar_stock_postgres(normales)
+                else:
+                    descontados = _descontar_stock_orm(normales)
+
+                if descontados != len(normales):
+                    # Revertimos lo ya descontado (y los movimientos) saliendo del savepoint con excepción
+                    raise _DescuentoIncompleto
+
+                for producto_id, cantidad in sorted(en_franjas.items()):
+                    if not descontar_franjas(producto_id, cantidad):
+                        raise _DescuentoIncompleto
+            return
+        except _DescuentoIncompleto:
+            _verificar_faltantes(cantidades)
+
+    # Si tras releer el stock alcanzaba (otra transacción repuso entre medio) ya reintentamos una vez
+    _verificar_faltantes(cantidades, forzar=True)
+
+
+def _descontar_stock_postgres(cantidades):
+    """
+    Un único UPDATE ... FROM (VALUES ...) para todo el pedido. El CTE 'bloqueo'
+    toma las filas ordenadas por PK para que dos pedidos concurrentes con los
+    mismos productos no puedan entrar en deadlock. Devuelve las filas descontadas.
+    """
+    if not cantidades:
+        return 0
+
+    tabla = connection.ops.quote_name(Producto._meta.db_table)
+    items = sorted(cantidades.items())
+    valores = ', '.join(['(%s::bigint, %s::integer)'] * len(items))
+    parametros = [valor for item in items for valor in item]
+
+    sql = f"""
+        WITH pedido(id, cantidad) AS (VALUES {valores}),
+        bloqueo AS (
+            SELECT p.id FROM {tabla} p JOIN pedido ON pedido.id = p.id
+            ORDER BY p.id FOR UPDATE OF p
+        )
+        UPDATE {tabla} AS p
+        SET stock_actual = p.stock_actual - pedido.cantidad
+        FROM pedido
+        WHERE p.id = pedido.id
+          AND p.id IN (SELECT id FROM bloqueo)
+          AND p.stock_actual >= pedido.cantidad
+          AND NOT p.stock_fraccionado
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return cursor.rowcount
+
+
+def _descontar_stock_orm(cantidades):
+    """Variante portable: un UPDATE condicional por producto, en orden de PK."""
+    descontados = 0
+    for producto_id, cantidad in sorted(cantidades.items()):
+        afectadas = Producto.objects.filter(pk=producto_id, stock_actual__gte=cantidad, stock_fraccionado=False) \
+                                    .update(stock_actual=F('stock_actual') - cantidad)
+        if not afectadas:
+            break
+        descontados += afectadas
+    return descontados
+
+
+def _verificar_faltantes(cantidades, forzar=False):
+    """
+    Consulta el stock actual (solo en el camino de error) y lanza la excepción
+    adecuada. Si ningún producto es insuficiente vuelve sin error, salvo con 'forzar'.
+    """
+    productos = Producto.objects.filter(pk__in=cantidades.keys()).only(*CAMPOS_PRODUCTO_VENTA).in_bulk()
+    if len(productos) != len(cantidades):
+        raise Producto.DoesNotExist("Uno de los productos no existe.")
+
+    # En modo hot el stock disponible es la suma de las franjas
+    en_franjas = stock_en_franjas([pid for pid, producto in productos.items() if producto.stock_fraccionado])
+    for producto_id, total in en_franjas.items():
+        productos[producto_id].stock_actual = total
+
+    faltantes = [
+        (productos[producto_id], cantidad)
+        for producto_id, cantidad in sorted(cantidades.items())
+        if productos[producto_id].stock_actual < cantidad
+    ]
+    if forzar and not faltantes:
+        faltantes = [(productos[producto_id], cantidad) for producto_id, cantidad in sorted(cantidades.items())]
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+
+
+# --- 2. INGRESO Y AJUSTE DE STOCK ---
+def incrementar_stock(cantidades, referencia='', tipo=MovimientoStock.TipoMovimiento.INGRESO):
+    """Suma stock para {producto_id: cantidad} (ingresos y devoluciones)."""
+    ajustar_stock(cantidades, referencia, tipo)
+
+
+def ajustar_stock(cantidades, referencia='', tipo=MovimientoStock.TipoMovimiento.AJUSTE):
+    """
+    Aplica {producto_id: cantidad_con_signo} con UPDATEs atómicos
+    (stock_actual = stock_actual + n) y registra los movimientos.
+    Sin verificación de disponibilidad: para las ventas usar 'descontar_stock'.
+    """
+    cantidades = {pid: cantidad for pid, cantidad in cantidades.items() if cantidad}
+    fraccionados = set(
+        Producto.objects.filter(pk__in=cantidades.keys(), stock_fraccionado=True).values_list('id', flat=True)
+    ) if cantidades else set()
+
+    for producto_id, cantidad in sorted(cantidades.items()):
+        if producto_id not in fraccionados:
+            Producto.objects.filter(pk=producto_id).update(stock_actual=F('stock_actual') + cantidad)
+        elif cantidad > 0:
+            # El ingreso va a la franja con menos stock; el rebalanceo lo reparte después
+            franja = FranjaStock.objects.filter(producto_id=producto_id).order_by('cantidad').values('pk')[:1]
+            FranjaStock.objects.filter(pk__in=franja).update(cantidad=F('cantidad') + cantidad)
+        elif not _descontar_franjas_bloqueando(producto_id, -cantidad):
+            _verificar_faltantes({producto_id: -cantidad}, forzar=True)
+    registrar_movimientos(cantidades, tipo, referencia)
+
+
+# --- 3. LIBRO DE MOVIMIENTOS ---
+def registrar_movimientos(cantidades, tipo, referencia=''):
+    """Inserta en un solo INSERT los movimientos {producto_id: cantidad_con_signo}."""
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(producto_id=producto_id, tipo=tipo, cantidad=cantidad, referencia=referencia)
+        for producto_id, cantidad in sorted(cantidades.items())
+        if cantidad
+    ])
+
+
+# --- 4. FRANJAS DE STOCK (modo hot) ---
+def descontar_franjas(producto_id, cantidad):
+    """
+    Descuenta 'cantidad' de alguna franja del producto que tenga stock:
+    1. una franja libre (SKIP LOCKED), sin esperar a nadie;
+    2. si todas están ocupadas, espera por una sola franja al azar;
+    3. si ninguna franja alcanza por sí sola, bloquea todas y reparte el descuento.
+    Devuelve False si la suma de franjas no alcanza.
+    """
+    if connection.vendor == 'postgresql':
+        tabla = connection.ops.quote_name(FranjaStock._meta.db_table)
+        for bloqueo in ('FOR UPDATE SKIP LOCKED', 'FOR UPDATE'):
+            sql = f"""
+                UPDATE {tabla} SET cantidad = cantidad - %s
+                WHERE cantidad >= %s AND id = (
+                    SELECT id FROM {tabla}
+                    WHERE producto_id = %s AND cantidad >= %s
+                    ORDER BY random() LIMIT 1
+                    {bloqueo}
+                )
+            """
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [cantidad, cantidad, producto_id, cantidad])
+                if cursor.rowcount:
+                    return True
+
+    return _descontar_franjas_bloqueando(producto_id, cantidad)
+
+
+def _descontar_franjas_bloqueando(producto_id, cantidad):
+    """Camino lento: bloquea todas las franjas del producto y descuenta de las más llenas."""
+    franjas = list(FranjaStock.objects.select_for_update().filter(producto_id=producto_id).order_by('indice'))
+    if sum(franja.cantidad for franja in franjas) < cantidad:
+        return False
+
+    restante = cantidad
+    for franja in sorted(franjas, key=lambda f: -f.cantidad):
+        tomado = min(franja.cantidad, restante)
+        franja.cantidad -= tomado
+        restante -= tomado
+        if not restante:
+            break
+    FranjaStock.objects.bulk_update(franjas, ['cantidad'])
+    return True
+
+
+def stock_en_franjas(producto_ids, bloquear=False):
+    """Devuelve {producto_id: suma_de_franjas}. Con 'bloquear' toma las franjas con FOR UPDATE."""
+    if not producto_ids:
+        return {}
+    if bloquear:
+        totales = {producto_id: 0 for producto_id in producto_ids}
+        franjas = FranjaStock.objects.select_for_update().filter(producto_id__in=producto_ids) \
+                                     .order_by('producto_id', 'indice').values_list('producto_id', 'cantidad')
+        for producto_id, cantidad in franjas:
+            totales[producto_id] += cantidad
+        return totales
+
+    totales = dict(
+        FranjaStock.objects.filter(producto_id__in=producto_ids)
+        .values('producto').annotate(total=Sum('cantidad')).values_list('producto', 'total')
+    )
+    return {producto_id: totales.get(producto_id, 0) for producto_id in producto_ids}
+
+
+def anotar_stock_franjas(productos):
+    """
+    Asigna 'stock_franjas' a los productos en modo hot que no lo traen anotado,
+    con una sola consulta para todos (evita un stock_en_franjas por fila al serializar).
+    """
+    pendientes = [p for p in productos if p.stock_fraccionado and getattr(p, 'stock_franjas', None) is None]
+    totales = stock_en_franjas([p.pk for p in pendientes])
+    for producto in pendientes:
+        producto.stock_franjas = totales[producto.pk]
+
+
+def _repartir(total, partes):
+    return [total // partes + (1 if i < total % partes else 0) for i in range(partes)]
+
+
+@transaction.atomic
+def activar_modo_hot(producto_id, franjas=FRANJAS_POR_DEFECTO):
+    """Reparte el stock del producto en 'franjas' filas (o cambia la cantidad de franjas si ya estaba activo)."""
+    producto = Producto.objects.select_for_update().get(pk=producto_id)
+    if producto.stock_fraccionado:
+        total = stock_en_franjas([producto.id], bloquear=True)[producto.id]
+    else:
+        total = producto.stock_actual
+
+    FranjaStock.objects.filter(producto=producto).delete()
+    FranjaStock.objects.bulk_create([
+        FranjaStock(producto=producto, indice=indice, cantidad=cantidad)
+        for indice, cantidad in enumerate(_repartir(total, franjas))
+    ])
+    producto.stock_actual = total
+    producto.stock_fraccionado = True
+    producto.save(update_fields=['stock_actual', 'stock_fraccionado'])
+    return producto
+
+
+@transaction.atomic
+def desactivar_modo_hot(producto_id):
+    """Vuelve a concentrar el stock en Producto.stock_actual y elimina las franjas."""
+    producto = Producto.objects.select_for_update().get(pk=producto_id)
+    if producto.stock_fraccionado:
+        producto.stock_actual = stock_en_franjas([producto.id], bloquear=True)[producto.id]
+        producto.stock_fraccionado = False
+        producto.save(update_fields=['stock_actual', 'stock_fraccionado'])
+        FranjaStock.objects.filter(producto=producto).delete()
+    return producto
+
+
+@transaction.atomic
+def rebalancear_franjas(producto_id):
+    """
+    Reparte otra vez el stock en partes iguales entre las franjas (las que se vaciaron
+    vuelven a tener stock) y actualiza el reflejo Producto.stock_actual.
+    Devuelve el stock total del producto.
+    """
+    franjas = list(FranjaStock.objects.select_for_update().filter(producto_id=producto_id).order_by('indice'))
+    if not franjas:
+        return 0
+    total = sum(franja.cantidad for franja in franjas)
+    for franja, cantidad in zip(franjas, _repartir(total, len(franjas))):
+        franja.cantidad = cantidad
+    FranjaStock.objects.bulk_update(franjas, ['cantidad'])
+    Producto.objects.filter(pk=producto_id).update(stock_actual=total)
+    return total
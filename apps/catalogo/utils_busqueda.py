@@ -0,0 +1,157 @@
+import heapq
+import threading
+import unicodedata
+import uuid
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import F, FloatField, Func, Value
+
+from .models import Cliente
+
+# Máximo de clientes que devuelve una búsqueda (?search=)
+LIMITE_BUSQUEDA = 50
+
+CLAVE_VERSION_INDICE = 'busqueda-clientes:version'
+
+
+# --- 1. DOCUMENTO DE BÚSQUEDA ---
+def normalizar_texto(texto):
+    """Minúsculas, sin acentos y con un solo espacio entre palabras: 'José  PÉREZ' -> 'jose perez'."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.casefold().split())
+
+
+def documento_cliente(usuario, ciudad):
+    """Texto con el que se busca a un cliente: nombre, apellido, correo y ciudad normalizados."""
+    return normalizar_texto(' '.join(
+        parte for parte in (usuario.nombre, usuario.apellido, usuario.correo, ciudad) if parte
+    ))
+
+
+def invalidar_indice_clientes():
+    """
+    Obliga a reconstruir el índice en memoria de cada proceso. Se invalida ya (para esta
+    transacción) y otra vez tras el commit, por si otro proceso lo reconstruyó en el medio.
+    """
+    cache.set(CLAVE_VERSION_INDICE, uuid.uuid4().hex, None)
+    transaction.on_commit(lambda: cache.set(CLAVE_VERSION_INDICE, uuid.uuid4().hex, None))
+
+
+# --- 2. BÚSQUEDA CON pg_trgm (PostgreSQL) ---
+@lru_cache(maxsize=None)
+def _trigramas_en_bd(alias):
+    """True si la base tiene pg_trgm instalado (la migración crea entonces el índice GIN)."""
+    conexion = connections[alias]
+    if conexion.vendor != 'postgresql':
+        return False
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def _buscar_en_bd(terminos, limite):
+    queryset = Cliente.objects.all()
+    for termino in terminos:
+        # LIKE '%termino%' sobre el documento ya normalizado: lo resuelve el índice GIN de trigramas
+        queryset = queryset.filter(documento_busqueda__contains=termino)
+    # word_similarity: cuánto se parece la consulta a la palabra más parecida del documento
+    similitud = Func(Value(' '.join(terminos)), F('documento_busqueda'), function='word_similarity', output_field=FloatField())
+    return list(queryset.annotate(relevancia=similitud).order_by('-relevancia', 'id').values_list('id', flat=True)[:limite])
+
+
+# --- 3. ÍNDICE DE N-GRAMAS EN MEMORIA (otras bases o sin pg_trgm) ---
+def _trigramas(palabra):
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+def _relevancia(terminos, documento):
+    """Primero los que tienen los términos como palabra completa, luego como inicio de palabra."""
+    palabras = documento.split()
+    completas = sum(termino in palabras for termino in terminos)
+    prefijos = sum(any(palabra.startswith(termino) for palabra in palabras) for termino in terminos)
+    return completas, prefijos, -len(documento)
+
+
+class _IndiceNgramas:
+    """
+    Índice invertido trigrama -> ids de cliente, reconstruido cuando cambia la versión en caché
+    (cualquier alta/edición de cliente). Una búsqueda intersecta las listas de sus trigramas y
+    verifica la subcadena solo sobre esos candidatos.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.documentos = {}
+        self.trigramas = {}
+        self.palabras = {}
+        self.bloqueo = threading.Lock()
+
+    def _actualizar(self):
+        version = cache.get(CLAVE_VERSION_INDICE)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(CLAVE_VERSION_INDICE, version, None):
+                version = cache.get(CLAVE_VERSION_INDICE) or version
+        if version == self.version:
+            return
+        with self.bloqueo:
+            if version == self.version:
+                return
+            documentos = dict(Cliente.objects.values_list('id', 'documento_busqueda'))
+            trigramas = {}
+            palabras = {}
+            for cliente_id, documento in documentos.items():
+                for palabra in set(documento.split()):
+                    palabras.setdefault(palabra, set()).add(cliente_id)
+                    for trigrama in _trigramas(palabra):
+                        trigramas.setdefault(trigrama, set()).add(cliente_id)
+            self.documentos, self.trigramas, self.palabras, self.version = documentos, trigramas, palabras, version
+
+    def buscar(self, terminos, limite):
+        self._actualizar()
+        documentos, trigramas = self.documentos, self.trigramas
+
+        # Camino rápido: si los que tienen todos los términos como palabra completa ya llenan
+        # el límite, son los más relevantes y no hace falta puntuar al resto
+        exactos = set.intersection(*[self.palabras.get(termino, set()) for termino in terminos])
+        if len(exactos) >= limite:
+            return heapq.nlargest(limite, exactos, key=lambda cliente_id: (-len(documentos[cliente_id]), -cliente_id))
+
+        candidatos = None
+        for termino in sorted(terminos, key=len, reverse=True):
+            ids = None
+            for trigrama in _trigramas(termino):
+                ids = set(trigramas.get(trigrama, ())) if ids is None else ids & trigramas.get(trigrama, set())
+                if not ids:
+                    return []
+            if ids is None:
+                # Término de 1 o 2 letras: no tiene trigramas propios
+                ids = candidatos if candidatos is not None else documentos.keys()
+            ids = {cliente_id for cliente_id in ids if termino in documentos[cliente_id]}
+            candidatos = ids if candidatos is None else candidatos & ids
+            if not candidatos:
+                return []
+
+        return heapq.nlargest(
+            limite, candidatos,
+            key=lambda cliente_id: (*_relevancia(terminos, documentos[cliente_id]), -cliente_id),
+        )
+
+
+_indice = _IndiceNgramas()
+
+
+def buscar_clientes(texto, limite=LIMITE_BUSQUEDA):
+    """
+    Ids de los clientes cuyo documento contiene todos los términos de 'texto',
+    del más al menos parecido, como máximo 'limite'. None si no hay nada que buscar.
+    """
+    terminos = normalizar_texto(texto).split()
+    if not terminos:
+        return None
+    if _trigramas_en_bd(connection.alias):
+        return _buscar_en_bd(terminos, limite)
+    return _indice.buscar(terminos, limite)
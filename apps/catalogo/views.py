@@ -2,9 +2,17 @@ from rest_framework import viewsets, permissions, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.db import transaction  # <--- IMPORTACIÓN AÑADIDA
+from django.db.models import Case, When, Subquery, OuterRef, Sum
 from apps.acceso_seguridad.models import Usuario
 from apps.acceso_seguridad.permissions import IsAdminRole, IsAdminOrReadOnly
+from config.pagination import IngresoInventarioPaginacion
+from config.proyecciones import ListadoProyectadoMixin, ExportacionJSONMixin
 from .models import *
+from .filters import BusquedaClienteFilter
+from .utils import (
+    incrementar_stock, registrar_movimientos, ajustar_stock, stock_en_franjas,
+    activar_modo_hot, desactivar_modo_hot, FRANJAS_POR_DEFECTO
+)
 from .serializers import (
     ClienteReadSerializer, 
     ClienteWriteSerializer, 
@@ -18,8 +26,9 @@ from .serializers import (
 class ClienteViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminRole]
     queryset = Usuario.objects.filter(rol='CLIENTE', cliente__isnull=False).select_related('cliente').order_by('nombre')
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['nombre', 'apellido', 'correo', 'cliente__ciudad']
+    # ?search= por nombre, apellido, correo o ciudad (documento de búsqueda del cliente)
+    filter_backends = [BusquedaClienteFilter]
+    busqueda_campo_cliente = 'cliente'
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -81,13 +90,68 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     search_fields = ['nombre']
 
 # --- Producto (CU-08) ---
-class ProductoViewSet(viewsets.ModelViewSet):
-    queryset = Producto.objects.select_related('categoria').all().order_by('id') # Optimizado con select_related
+class ProductoViewSet(ListadoProyectadoMixin, ExportacionJSONMixin, viewsets.ModelViewSet):
+    queryset = Producto.objects.select_related('categoria').annotate(
+        # Solo los productos en modo hot calculan la suma de sus franjas
+        stock_franjas=Case(When(stock_fraccionado=True, then=Subquery(
+            FranjaStock.objects.filter(producto=OuterRef('pk')).values('producto')
+                               .annotate(total=Sum('cantidad')).values('total')
+        )))
+    ).all().order_by('id') # Optimizado con select_related
     serializer_class = ProductoSerializer
     permission_classes = [IsAdminOrReadOnly]  # ✅ CLIENTES pueden ver, ADMIN pueden editar
     filter_backends = [filters.SearchFilter]
     search_fields = ['nombre', 'codigo_producto', 'categoria__nombre', 'marca'] # Añadido 'marca'
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        producto = serializer.save()
+        # El stock con el que se da de alta el producto entra al libro como ajuste
+        registrar_movimientos({producto.id: producto.stock_actual}, MovimientoStock.TipoMovimiento.AJUSTE, 'alta-producto')
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        nuevo_stock = serializer.validated_data.pop('stock_actual', None)
+        # Bloqueamos la fila y partimos del stock vigente para no pisar una venta concurrente
+        stock_anterior, fraccionado = Producto.objects.select_for_update() \
+                                              .values_list('stock_actual', 'stock_fraccionado') \
+                                              .get(pk=serializer.instance.pk)
+        serializer.instance.stock_actual = stock_anterior
+        if fraccionado:
+            stock_anterior = stock_en_franjas([serializer.instance.pk], bloquear=True)[serializer.instance.pk]
+        producto = serializer.save()
+        # Una corrección manual de stock se registra como ajuste por la diferencia
+        if nuevo_stock is not None:
+            ajustar_stock({producto.id: nuevo_stock - stock_anterior}, referencia='edicion-producto')
+            producto.stock_actual = nuevo_stock
+            producto.stock_franjas = nuevo_stock
+
+    @action(detail=True, methods=['post'], url_path='modo-hot', permission_classes=[IsAdminRole])
+    def modo_hot(self, request, pk=None):
+        """
+        Activa o desactiva el modo hot (stock repartido en franjas) para promociones.
+        Body: {"activo": true, "franjas": 8}
+        """
+        producto = self.get_object()
+        activo = request.data.get('activo', True)
+        if isinstance(activo, str):
+            activo = activo.lower() in ('1', 'true', 'si', 'sí')
+
+        try:
+            franjas = int(request.data.get('franjas', FRANJAS_POR_DEFECTO))
+        except (TypeError, ValueError):
+            return Response({"detail": "'franjas' debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= franjas <= 64:
+            return Response({"detail": "'franjas' debe estar entre 1 y 64."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if activo:
+            activar_modo_hot(producto.id, franjas)
+        else:
+            desactivar_modo_hot(producto.id)
+
+        serializer = self.get_serializer(self.get_queryset().get(pk=producto.pk))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 # --- Inventario (CU-09) ---
 class InventarioViewSet(viewsets.ModelViewSet):
     """
@@ -105,9 +169,10 @@ class InventarioProductoViewSet(viewsets.ModelViewSet):
     ViewSet para 'Registrar Ingresos' de productos al inventario (CU-09).
     Maneja la lógica de actualizar el stock_actual del producto.
     """
-    queryset = InventarioProducto.objects.select_related('producto', 'inventario').all().order_by('-fecha_ingreso')
+    queryset = InventarioProducto.objects.select_related('producto__categoria', 'inventario').all().order_by('-fecha_ingreso')
     serializer_class = InventarioProductoSerializer
     permission_classes = [IsAdminRole]
+    pagination_class = IngresoInventarioPaginacion
     
     # Solo permitimos listar, ver detalle y CREAR. No permitimos modificar/borrar.
     http_method_names = ['get', 'post', 'head', 'options']
@@ -131,10 +196,8 @@ class InventarioProductoViewSet(viewsets.ModelViewSet):
                 self.perform_create(serializer)
                 
                 # 3. Actualizamos el stock_actual del Producto
-                # (Usamos 'select_for_update' para bloquear la fila y evitar 'race conditions')
-                producto_a_actualizar = Producto.objects.select_for_update().get(pk=producto.id)
-                producto_a_actualizar.stock_actual += cantidad_ingresada
-                producto_a_actualizar.save()
+                # (UPDATE atómico stock_actual = stock_actual + n, sin leer y bloquear la fila antes)
+                incrementar_stock({producto.id: cantidad_ingresada}, referencia=f'ingreso:{serializer.instance.id}')
 
             headers = self.get_success_headers(serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
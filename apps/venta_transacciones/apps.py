@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class VentaTransaccionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.venta_transacciones'
+
+    def ready(self):
+        """
+        Registra los signals (invalidación del historial de compras en caché).
+        """
+        import apps.venta_transacciones.signals
@@ -1,10 +1,12 @@
 
 from django_filters import rest_framework as filters
+from config.fechas import rango_de_fechas
 from .models import Venta
 
 class VentaFilter(filters.FilterSet):
-    fecha_min = filters.DateFilter(field_name="fecha_venta__date", lookup_expr='gte')
-    fecha_max = filters.DateFilter(field_name="fecha_venta__date", lookup_expr='lte')
+    # Rangos semiabiertos en hora de La Paz sobre fecha_venta (sin '__date', que impide usar el índice)
+    fecha_min = filters.DateFilter(method='filtrar_fecha_min')
+    fecha_max = filters.DateFilter(method='filtrar_fecha_max')
 
     class Meta:
         model = Venta
@@ -12,4 +14,10 @@ class VentaFilter(filters.FilterSet):
             'cliente',
             'metodo_entrada',
             'tipo_venta',
-        ]
\ No newline at end of file
+        ]
+
+    def filtrar_fecha_min(self, queryset, name, value):
+        return queryset.filter(**rango_de_fechas('fecha_venta', desde=value))
+
+    def filtrar_fecha_max(self, queryset, name, value):
+        return queryset.filter(**rango_de_fechas('fecha_venta', hasta=value))
@@ -0,0 +1,118 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from apps.acceso_seguridad.models import Usuario, Bitacora
+from apps.acceso_seguridad.serializers import BitacoraSerializer
+from apps.acceso_seguridad.views import BitacoraViewSet
+from apps.catalogo.models import Categoria, Producto
+from apps.catalogo.serializers import ProductoSerializer
+from apps.catalogo.views import ProductoViewSet
+from apps.venta_transacciones.models import Venta, DetalleVenta
+from apps.venta_transacciones.serializers import VentaReadSerializer, DetalleVentaSerializer
+from config.proyecciones import Proyeccion
+
+DETALLES_POR_VENTA = 3
+
+
+def _casos():
+    """(nombre, serializador, queryset del listado) de cada listado proyectado."""
+    return {
+        'venta': (VentaReadSerializer, Venta.objects.order_by('-fecha_venta', '-id').prefetch_related(
+            Prefetch('detalles', queryset=DetalleVenta.objects.select_related('producto'))
+        )),
+        'detalle': (DetalleVentaSerializer, DetalleVenta.objects.select_related('producto').order_by('id')),
+        'producto': (ProductoSerializer, ProductoViewSet.queryset),
+        'bitacora': (BitacoraSerializer, BitacoraViewSet.queryset),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el tiempo de serializar listados con el ModelSerializer y con la proyección '
+        'sobre .values() (config/proyecciones.py), y verifica que el JSON sea idéntico. '
+        'Si faltan filas crea datos temporales dentro de una transacción que se revierte.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', default='100,1000,10000', help='Cantidades de filas a serializar.')
+        parser.add_argument('--casos', default='venta,detalle,producto,bitacora')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Se informa el mejor tiempo.')
+
+    def handle(self, *args, **options):
+        filas = [int(valor) for valor in options['filas'].split(',')]
+        casos = _casos()
+        pedidos = options['casos'].split(',')
+        desconocidos = set(pedidos) - set(casos)
+        if desconocidos:
+            raise CommandError(f'Casos desconocidos: {", ".join(sorted(desconocidos))}')
+
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            self._completar_datos(max(filas))
+
+            self.stdout.write(f'{"caso":>9} | {"filas":>6} | {"DRF (ms)":>9} | {"proyección (ms)":>15} | {"x":>5} | idéntico')
+            for nombre in pedidos:
+                serializador, queryset = casos[nombre]
+                for cantidad in filas:
+                    json_drf, ms_drf = self._medir(options['repeticiones'], lambda: renderer.render(
+                        serializador(list(queryset[:cantidad]), many=True).data
+                    ))
+                    json_proyeccion, ms_proyeccion = self._medir(options['repeticiones'], lambda: renderer.render(
+                        self._proyectar(serializador, queryset, cantidad)
+                    ))
+                    self.stdout.write(
+                        f'{nombre:>9} | {cantidad:>6} | {ms_drf:>9.1f} | {ms_proyeccion:>15.1f} | '
+                        f'{ms_drf / ms_proyeccion:>5.1f} | {"sí" if json_drf == json_proyeccion else "NO"}'
+                    )
+            # Los datos temporales no quedan en la base
+            transaction.set_rollback(True)
+
+    def _proyectar(self, serializador, queryset, cantidad):
+        proyeccion = Proyeccion(serializador())
+        return proyeccion.serializar(proyeccion.preparar(queryset)[:cantidad])
+
+    def _medir(self, repeticiones, funcion):
+        mejor = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            transcurrido = (time.perf_counter() - inicio) * 1000
+            mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+        return resultado, mejor
+
+    def _completar_datos(self, cantidad):
+        categoria, _ = Categoria.objects.get_or_create(nombre='Benchmark')
+        faltan = cantidad - Producto.objects.count()
+        if faltan > 0:
+            Producto.objects.bulk_create([
+                Producto(codigo_producto=f'BENCH-PROY-{i}', nombre=f'Producto {i}', categoria=categoria,
+                         precio_venta=Decimal('10.50'), stock_actual=100, marca='Benchmark')
+                for i in range(faltan)
+            ], batch_size=1000)
+
+        productos = list(Producto.objects.values_list('id', flat=True)[:DETALLES_POR_VENTA])
+        faltan = cantidad - Venta.objects.count()
+        if faltan > 0:
+            ventas = Venta.objects.bulk_create(
+                [Venta(total=Decimal('31.50')) for _ in range(faltan)], batch_size=1000
+            )
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(venta=venta, producto_id=producto_id, cantidad=1,
+                             precio_unitario=Decimal('10.50'), subtotal=Decimal('10.50'))
+                for venta in ventas for producto_id in productos
+            ], batch_size=1000)
+
+        faltan = cantidad - Bitacora.objects.count()
+        if faltan > 0:
+            usuario = Usuario.objects.order_by('id').first()
+            if usuario is None:
+                raise CommandError('Se necesita al menos un usuario para generar la bitácora.')
+            Bitacora.objects.bulk_create([
+                Bitacora(usuario=usuario, accion='BENCHMARK', descripcion=f'Registro {i}', ip='127.0.0.1')
+                for i in range(faltan)
+            ], batch_size=1000)
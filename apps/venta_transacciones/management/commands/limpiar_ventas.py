@@ -2,7 +2,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 
 # Importamos todos los modelos que vamos a limpiar
-from apps.venta_transacciones.models import Venta, DetalleVenta, Pago, Carrito, DetalleCarrito
+from apps.venta_transacciones.models import Venta, DetalleVenta, Pago, Carrito, DetalleCarrito, VentaDiaria
 from apps.analisis_inteligencia.models import PrediccionVentas
 from apps.catalogo.models import InventarioProducto
 
@@ -21,6 +21,9 @@ class Command(BaseCommand):
         self.stdout.write(self.style.NOTICE('Borrando Pagos...'))
         Pago.objects.all().delete()
         
+        self.stdout.write(self.style.NOTICE('Borrando Resumen Diario de Ventas...'))
+        VentaDiaria.objects.all().delete()
+
         self.stdout.write(self.style.NOTICE('Borrando Detalles de Ventas...'))
         DetalleVenta.objects.all().delete()
         
@@ -0,0 +1,72 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.venta_transacciones.models import Venta, DetalleVenta
+from config.fechas import inicio_del_mes
+
+# (modelo, columna de partición): cada mes calendario de La Paz es una partición
+TABLAS_PARTICIONADAS = (
+    (Venta, 'fecha_venta'),
+    (DetalleVenta, 'fecha_creacion'),
+)
+
+
+def _sumar_meses(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Particionado mensual (RANGE) de Venta y DetalleVenta: crea por adelantado las particiones '
+        'de los próximos meses en las tablas que ya están particionadas. La conversión de las tablas '
+        'no se hace aquí: cambia la clave primaria y las FK que las referencian, así que debe ir en '
+        'una migración revisada para que el estado de migraciones de Django la refleje.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=3, help='Meses futuros con partición ya creada.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El particionado declarativo requiere PostgreSQL.')
+
+        hasta = _sumar_meses(timezone.localdate(), options['meses'] + 1)
+        with transaction.atomic():
+            for modelo, _ in TABLAS_PARTICIONADAS:
+                tabla = modelo._meta.db_table
+                if not self._esta_particionada(tabla):
+                    self.stdout.write(self.style.WARNING(
+                        f'{tabla}: no está particionada (la conversión requiere una migración); no se crean particiones.'
+                    ))
+                    continue
+
+                creadas = self._crear_particiones(tabla, timezone.localdate(), hasta)
+                self.stdout.write(self.style.SUCCESS(f'{tabla}: {creadas} partición(es) nueva(s) hasta {hasta:%Y-%m}.'))
+
+    # --- Particiones ---
+    def _esta_particionada(self, tabla):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [tabla])
+            return cursor.fetchone() is not None
+
+    def _crear_particiones(self, tabla, desde, hasta):
+        """Una partición por mes en [desde, hasta); las existentes se dejan como están."""
+        creadas = 0
+        mes = desde.replace(day=1)
+        with connection.cursor() as cursor:
+            while mes < hasta:
+                siguiente = _sumar_meses(mes, 1)
+                nombre = f'{tabla}_p{mes:%Y_%m}'
+                cursor.execute('SELECT to_regclass(%s)', [nombre])
+                if cursor.fetchone()[0] is None:
+                    cursor.execute(
+                        f'CREATE TABLE {connection.ops.quote_name(nombre)} PARTITION OF {connection.ops.quote_name(tabla)} '
+                        f"FOR VALUES FROM ('{inicio_del_mes(mes).isoformat()}') TO ('{inicio_del_mes(siguiente).isoformat()}')"
+                    )
+                    creadas += 1
+                mes = siguiente
+        return creadas
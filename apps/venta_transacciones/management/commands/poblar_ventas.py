@@ -1,4 +1,5 @@
 import random
+from itertools import groupby
 from datetime import timedelta, datetime # <-- Importamos datetime
 from django.core.management.base import BaseCommand
 from django.utils import timezone
@@ -7,6 +8,7 @@ from tqdm import tqdm
 
 from apps.catalogo.models import Producto, Cliente
 from apps.venta_transacciones.models import Venta, DetalleVenta
+from apps.venta_transacciones.utils_resumen import acumular_en_resumen
 
 # --- CONFIGURACIÓN DE LA SIMULACIÓN ---
 TOTAL_VENTAS_A_CREAR = 1500
@@ -80,6 +82,9 @@ class Command(BaseCommand):
             detalle.venta_id = detalle.venta.id
             
         DetalleVenta.objects.bulk_create(detalles_creados)
+        acumular_en_resumen(
+            (venta, list(detalles)) for venta, detalles in groupby(detalles_creados, key=lambda detalle: detalle.venta)
+        )
 
         self.stdout.write(self.style.SUCCESS(f'--- Simulación completada: {TOTAL_VENTAS_A_CREAR} ventas creadas ---'))
 
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.venta_transacciones.utils_outbox import procesar_lote
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa los efectos secundarios de ventas y pagos (comprobantes, notificaciones, carrito) '
+        'encolados en EventoOutbox. Se pueden correr varios workers en paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano-lote', type=int, default=100)
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando no hay eventos.')
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la cola y termina (útil con cron).')
+
+    def handle(self, *args, **options):
+        tamano_lote = options['tamano_lote']
+        self.stdout.write(self.style.NOTICE('--- Worker de outbox iniciado ---'))
+
+        while True:
+            procesados = procesar_lote(tamano_lote)
+            if procesados:
+                self.stdout.write(f'{procesados} eventos procesados.')
+            # Lote completo: probablemente quedan más, seguimos sin esperar
+            if procesados == tamano_lote:
+                continue
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS('--- Cola de outbox vacía ---'))
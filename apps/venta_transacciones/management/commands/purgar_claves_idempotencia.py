@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.venta_transacciones.models import ClaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves de idempotencia vencidas (pensado para ejecutarse periódicamente con cron).'
+
+    def handle(self, *args, **options):
+        borradas, _ = ClaveIdempotencia.objects.filter(expira__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'{borradas} claves de idempotencia vencidas eliminadas.'))
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.venta_transacciones.models import Venta
+from apps.venta_transacciones.utils_resumen import recalcular_resumen
+from config.fechas import dia_de_negocio
+
+
+class Command(BaseCommand):
+    help = (
+        'Construye (o reconstruye) el resumen VentaDiaria desde las ventas, por bloques de días. '
+        'Cada bloque es una transacción; los checkouts de esos días esperan a que termine.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día (AAAA-MM-DD). Por defecto, el de la primera venta.')
+        parser.add_argument('--hasta', help='Último día (AAAA-MM-DD). Por defecto, hoy.')
+        parser.add_argument('--dias', type=int, default=31, help='Días por bloque.')
+
+    def handle(self, *args, **options):
+        hasta = self._fecha(options['hasta']) or timezone.localdate()
+        desde = self._fecha(options['desde'])
+        if desde is None:
+            primera = Venta.objects.aggregate(primera=Min('fecha_venta'))['primera']
+            if primera is None:
+                self.stdout.write('No hay ventas.')
+                return
+            desde = dia_de_negocio(primera)
+        if options['dias'] < 1:
+            raise CommandError('--dias debe ser mayor a 0.')
+
+        total = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=options['dias'] - 1), hasta)
+            filas = recalcular_resumen(inicio, fin)
+            total += filas
+            self.stdout.write(f'   {inicio} a {fin}: {filas} filas')
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Resumen recalculado del {desde} al {hasta}: {total} filas.'))
+
+    def _fecha(self, texto):
+        if not texto:
+            return None
+        fecha = parse_date(texto)
+        if fecha is None:
+            raise CommandError(f"'{texto}' no es una fecha AAAA-MM-DD.")
+        return fecha
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.venta_transacciones.utils_planes import consultas_criticas, seq_scans_grandes, UMBRAL_FILAS_SEQ_SCAN
+
+
+class Command(BaseCommand):
+    help = (
+        'Asesor de índices: ejecuta EXPLAIN sobre las consultas críticas y avisa si alguna recorre '
+        'secuencialmente una tabla grande; además lista las tablas con más lecturas secuenciales '
+        'según pg_stat_user_tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--umbral', type=int, default=UMBRAL_FILAS_SEQ_SCAN,
+                            help='Filas a partir de las cuales un Seq Scan se reporta.')
+        parser.add_argument('--top', type=int, default=10, help='Tablas a listar por lecturas secuenciales.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El asesor de índices requiere PostgreSQL.')
+
+        problemas = 0
+        self.stdout.write('1. Consultas críticas')
+        for nombre, queryset in consultas_criticas().items():
+            tablas = seq_scans_grandes(queryset, options['umbral'])
+            if tablas:
+                problemas += 1
+                detalle = ', '.join(f'{tabla} ({filas} filas)' for tabla, filas in tablas)
+                self.stdout.write(self.style.WARNING(f'   {nombre}: Seq Scan sobre {detalle}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'   {nombre}: usa índices'))
+
+        self.stdout.write('2. Tablas con más lecturas secuenciales')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT relname, seq_scan, seq_tup_read, COALESCE(idx_scan, 0), n_live_tup
+                FROM pg_stat_user_tables
+                WHERE n_live_tup > %s AND seq_scan > 0
+                ORDER BY seq_tup_read DESC
+                LIMIT %s
+                """,
+                [options['umbral'], options['top']],
+            )
+            filas = cursor.fetchall()
+        if not filas:
+            self.stdout.write('   Ninguna tabla grande con lecturas secuenciales.')
+        for tabla, seq_scan, seq_tup_read, idx_scan, vivas in filas:
+            self.stdout.write(
+                f'   {tabla}: {seq_scan} seq scans ({seq_tup_read} filas leídas), '
+                f'{idx_scan} index scans, {vivas} filas'
+            )
+
+        if problemas:
+            raise CommandError(f'{problemas} consulta(s) crítica(s) sin índice.')
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:52
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venta_transacciones', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255)),
+                ('endpoint', models.CharField(max_length=100)),
+                ('codigo_estado', models.PositiveSmallIntegerField(null=True)),
+                ('respuesta', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clave de Idempotencia',
+                'verbose_name_plural': 'Claves de Idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'endpoint', 'clave'), name='unica_clave_idempotencia')],
+            },
+        ),
+    ]
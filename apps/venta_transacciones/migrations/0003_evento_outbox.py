@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:03
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venta_transacciones', '0002_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('VENTA_CREADA', 'Venta creada'), ('PAGO_CONFIRMADO', 'Pago confirmado')], max_length=30)),
+                ('datos', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESADO', 'Procesado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_procesado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Outbox',
+                'verbose_name_plural': 'Eventos de Outbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['disponible_desde', 'id'], name='outbox_pendientes_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0014_indices_paginacion'),
+        ('venta_transacciones', '0003_evento_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='pago_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['-fecha_venta', '-id'], name='venta_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0014_indices_paginacion'),
+        ('venta_transacciones', '0004_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carrito',
+            index=models.Index(fields=['cliente', 'estado'], name='carrito_cliente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detalleventa',
+            index=models.Index(fields=['producto', 'fecha_creacion'], name='detalle_producto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(condition=models.Q(('stripe_payment_intent_id__isnull', False)), fields=['stripe_payment_intent_id'], name='pago_intent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['cliente', '-fecha_venta', '-id'], name='venta_cliente_fecha_idx'),
+        ),
+    ]
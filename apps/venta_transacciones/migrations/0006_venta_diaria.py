@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0015_documento_busqueda_cliente'),
+        ('venta_transacciones', '0005_indices_consultas_criticas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('metodo_entrada', models.CharField(max_length=50)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ventas', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalogo.categoria')),
+                ('cliente', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalogo.cliente')),
+                ('producto', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalogo.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'ordering': ['dia'],
+                'indexes': [models.Index(fields=['categoria', 'dia'], name='venta_diaria_categoria_idx'), models.Index(fields=['producto', 'dia'], name='venta_diaria_producto_idx'), models.Index(fields=['cliente', 'dia'], name='venta_diaria_cliente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'producto', 'categoria', 'cliente', 'metodo_entrada'), name='venta_diaria_clave_uniq', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venta_transacciones', '0006_venta_diaria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claveidempotencia',
+            name='huella_solicitud',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venta_transacciones', '0007_clave_idempotencia_huella'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventooutbox',
+            name='manejadores_completados',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
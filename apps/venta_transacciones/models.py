@@ -1,5 +1,7 @@
 from django.db import models
-from apps.catalogo.models import Producto, Cliente
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from apps.catalogo.models import Producto, Cliente, Categoria
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -30,6 +32,12 @@ class Venta(models.Model):
         ordering = ['-fecha_venta']
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
+        indexes = [
+            # Paginación por keyset (VentaPaginacion)
+            models.Index(fields=['-fecha_venta', '-id'], name='venta_fecha_id_idx'),
+            # Historial del cliente (mis_compras), también paginado por (fecha, id)
+            models.Index(fields=['cliente', '-fecha_venta', '-id'], name='venta_cliente_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Venta {self.id} - {self.cliente.usuario.correo} - Total: {self.total}"
@@ -57,6 +65,10 @@ class DetalleVenta(models.Model):
         ordering = ['id']
         verbose_name = 'Detalle de Venta'
         verbose_name_plural = 'Detalles de Ventas'
+        indexes = [
+            # Extracción de series por producto para el entrenamiento de predicciones
+            models.Index(fields=['producto', 'fecha_creacion'], name='detalle_producto_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Venta {self.venta.id} - Producto {self.producto.nombre}"
@@ -78,6 +90,10 @@ class Carrito(models.Model):
         ordering = ['-fecha_actualizacion']
         verbose_name = 'Carrito'
         verbose_name_plural = 'Carritos'
+        indexes = [
+            # Carrito activo del cliente (get_or_create en cada "agregar al carrito")
+            models.Index(fields=['cliente', 'estado'], name='carrito_cliente_estado_idx'),
+        ]
 
     def __str__(self):
         return f"Carrito {self.id} de {self.cliente.usuario.correo} ({self.estado})"
@@ -140,6 +156,126 @@ class Pago(models.Model):
         ordering = ['-fecha_creacion']
         verbose_name = 'Pago'
         verbose_name_plural = 'Pagos'
+        indexes = [
+            # Paginación por keyset (PagoPaginacion)
+            models.Index(fields=['-fecha_creacion', '-id'], name='pago_fecha_id_idx'),
+            # Webhook / confirmar_pago buscan el pago por el PaymentIntent de Stripe
+            models.Index(
+                fields=['stripe_payment_intent_id'], name='pago_intent_idx',
+                condition=models.Q(stripe_payment_intent_id__isnull=False),
+            ),
+        ]
     
     def __str__(self):
         return f'Pago #{self.id} (Venta #{self.venta.id}) - Bs{self.monto} ({self.estado})'
+
+
+class ClaveIdempotencia(models.Model):
+    """
+    Primera respuesta de un POST enviado con 'Idempotency-Key'.
+    La restricción única serializa los reintentos concurrentes de la misma clave.
+    """
+    clave = models.CharField(max_length=255)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    endpoint = models.CharField(max_length=100)
+    # SHA-256 del cuerpo de la solicitud: la misma clave con otro cuerpo no repite la respuesta
+    huella_solicitud = models.CharField(max_length=64, blank=True, default='')
+
+    codigo_estado = models.PositiveSmallIntegerField(null=True)
+    respuesta = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Clave de Idempotencia'
+        verbose_name_plural = 'Claves de Idempotencia'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'endpoint', 'clave'], name='unica_clave_idempotencia'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} - {self.clave}"
+
+
+class EventoOutbox(models.Model):
+    """
+    Efecto secundario pendiente de una venta o pago (comprobante, notificación, limpieza del carrito).
+    Se inserta en la misma transacción que la venta y lo procesa 'procesar_outbox' en segundo plano.
+    """
+    class TipoEvento(models.TextChoices):
+        VENTA_CREADA = 'VENTA_CREADA', 'Venta creada'
+        PAGO_CONFIRMADO = 'PAGO_CONFIRMADO', 'Pago confirmado'
+
+    class EstadoEvento(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        PROCESADO = 'PROCESADO', 'Procesado'
+        FALLIDO = 'FALLIDO', 'Fallido'
+
+    tipo = models.CharField(max_length=30, choices=TipoEvento.choices)
+    datos = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=20, choices=EstadoEvento.choices, default=EstadoEvento.PENDIENTE)
+
+    intentos = models.PositiveSmallIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True, default='')
+    disponible_desde = models.DateTimeField(default=timezone.now)  # Reintentos con espera creciente
+    # Nombres de los manejadores que ya terminaron: un reintento no los repite
+    manejadores_completados = models.JSONField(default=list, blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_procesado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Evento de Outbox'
+        verbose_name_plural = 'Eventos de Outbox'
+        indexes = [
+            # El worker solo recorre los pendientes: índice parcial, pequeño aunque la tabla crezca
+            models.Index(
+                fields=['disponible_desde', 'id'], name='outbox_pendientes_idx',
+                condition=models.Q(estado='PENDIENTE'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.estado})"
+
+
+class VentaDiaria(models.Model):
+    """
+    Resumen diario de ventas (día de La Paz), mantenido en la misma transacción que crea
+    la venta. Cada venta suma en tres niveles, para que 'ventas' cuente ventas distintas:
+      - producto: producto y su categoría;
+      - categoría: producto nulo;
+      - total: producto y categoría nulos.
+    """
+    dia = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, null=True, related_name='+', db_index=False)
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, related_name='+', db_index=False)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, null=True, related_name='+', db_index=False)
+    metodo_entrada = models.CharField(max_length=50)
+
+    cantidad = models.IntegerField(default=0)  # Unidades vendidas
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ventas = models.IntegerField(default=0)  # Ventas distintas
+
+    class Meta:
+        ordering = ['dia']
+        verbose_name = 'Venta Diaria'
+        verbose_name_plural = 'Ventas Diarias'
+        constraints = [
+            # Destino del INSERT ... ON CONFLICT; los NULL (niveles categoría/total) también chocan
+            models.UniqueConstraint(
+                fields=['dia', 'producto', 'categoria', 'cliente', 'metodo_entrada'],
+                name='venta_diaria_clave_uniq', nulls_distinct=False,
+            ),
+        ]
+        # Sin índices sueltos por FK: estos compuestos ya empiezan por cada una
+        indexes = [
+            models.Index(fields=['categoria', 'dia'], name='venta_diaria_categoria_idx'),
+            models.Index(fields=['producto', 'dia'], name='venta_diaria_producto_idx'),
+            models.Index(fields=['cliente', 'dia'], name='venta_diaria_cliente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} - {self.producto_id or self.categoria_id or 'total'}: {self.monto}"
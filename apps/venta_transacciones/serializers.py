@@ -1,5 +1,6 @@
 
 from rest_framework import serializers
+from apps.catalogo.serializers import ListaConStockFranjasSerializer
 from .models import *
 
 class DetalleVentaSerializer(serializers.ModelSerializer):
@@ -13,8 +14,62 @@ class DetalleVentaSerializer(serializers.ModelSerializer):
             'cantidad', 'precio_unitario', 'subtotal'
         ]
 
-class VentaReadSerializer(serializers.ModelSerializer):
+def leer_campos_solicitados(request):
+    """
+    Lee ?fields=id,total y ?expand=detalles,cliente de la petición.
+    Devuelve (campos, expandir): campos es None si no se pidió un subconjunto.
+    """
+    if request is None:
+        return None, set()
+    campos = request.query_params.get('fields')
+    expandir = request.query_params.get('expand')
+    campos = {c.strip() for c in campos.split(',') if c.strip()} if campos else None
+    expandir = {c.strip() for c in expandir.split(',') if c.strip()} if expandir else set()
+    return campos, expandir
+
+
+class CamposDinamicosMixin:
+    """
+    Sparse fieldsets para serializadores de lectura.
+    - ?fields=... deja solo esos campos (los SerializerMethodField no pedidos ni se calculan).
+    - ?expand=... agrega las relaciones declaradas en `campos_expandibles`.
+    Sin parámetros la respuesta conserva la forma de siempre.
+    """
+    campos_expandibles = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        campos, expandir = leer_campos_solicitados(self.context.get('request'))
+
+        for nombre in expandir & set(self.campos_expandibles):
+            fields[nombre] = self.campos_expandibles[nombre]()
+
+        if campos is not None:
+            permitidos = campos | expandir
+            for nombre in list(fields):
+                if nombre not in permitidos:
+                    fields.pop(nombre)
+        return fields
+
+
+class ClienteResumenSerializer(serializers.ModelSerializer):
+    """Datos básicos del cliente para ?expand=cliente"""
+    nombre = serializers.CharField(source='usuario.nombre', read_only=True)
+    apellido = serializers.CharField(source='usuario.apellido', read_only=True)
+    correo = serializers.CharField(source='usuario.correo', read_only=True)
+
+    class Meta:
+        model = Cliente
+        fields = ['id', 'nombre', 'apellido', 'correo', 'ciudad']
+
+
+class VentaReadSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializador para LECTURA de ventas con todos los detalles"""
+    campos_expandibles = {
+        'cliente': lambda: ClienteResumenSerializer(read_only=True),
+        'detalles': lambda: DetalleVentaSerializer(many=True, read_only=True),
+    }
+
     detalles = DetalleVentaSerializer(many=True, read_only=True)
     total_venta = serializers.DecimalField(source='total', max_digits=10, decimal_places=2, read_only=True)
     metodo_pago = serializers.CharField(source='metodo_entrada', read_only=True)
@@ -31,6 +86,9 @@ class VentaReadSerializer(serializers.ModelSerializer):
             'metodo_pago', 'tipo_venta', 'estado', 'descuento', 'notas', 'detalles'
         ]
         read_only_fields = ['fecha_venta']
+
+    # El listado proyectado (config/proyecciones.py) les pasa el dict de la fila: no usan 'obj'
+    metodos_proyectables = ('get_estado', 'get_descuento', 'get_notas')
     
     def get_estado(self, obj):
         """Devuelve 'Completada' por defecto para ventas existentes"""
@@ -65,6 +123,9 @@ class DetalleCarritoSerializer(serializers.ModelSerializer):
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
     producto_imagen = serializers.CharField(source='producto.imagen_url', read_only=True)
     producto_info = serializers.SerializerMethodField(read_only=True)
+
+    # Para ListaConStockFranjasSerializer
+    campo_producto = 'producto'
     
     class Meta:
         model = DetalleCarrito
@@ -73,6 +134,7 @@ class DetalleCarritoSerializer(serializers.ModelSerializer):
             'producto_info', 'cantidad', 'precio_unitario', 'subtotal'
         ]
         read_only_fields = ['carrito', 'precio_unitario', 'subtotal']  # Se calculan automáticamente
+        list_serializer_class = ListaConStockFranjasSerializer
     
     def get_producto_info(self, obj):
         """Devuelve información completa del producto"""
@@ -100,7 +162,7 @@ class PagoSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'venta', 'venta_id', 'monto', 'metodo_pago', 'estado',
             'stripe_payment_intent_id', 'stripe_client_secret',
-            'fecha_creacion', 'fecha_actualizacion', 'referencia_pago', 'notas'
+            'fecha_creacion', 'fecha_actualizacion', 'referencia_pago'
         ]
         read_only_fields = ['stripe_payment_intent_id', 'stripe_client_secret']
 
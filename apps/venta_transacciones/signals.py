@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+from .models import Venta, DetalleVenta
+from .utils import invalidar_historial_compras
+from .utils_resumen import acumular_en_resumen
+
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def invalidar_mis_compras(sender, instance, **kwargs):
+    """
+    Una venta creada, editada o eliminada cambia el historial de su cliente.
+    La caché de 'mis_compras' se invalida al confirmar la transacción.
+    """
+    invalidar_historial_compras(instance.cliente_id)
+
+
+def _detalles_para_resumen(venta_id):
+    return list(DetalleVenta.objects.filter(venta_id=venta_id).select_related('producto').only(
+        'producto', 'cantidad', 'subtotal', 'producto__categoria'
+    ))
+
+
+@receiver(pre_delete, sender=Venta)
+def descontar_del_resumen(sender, instance, **kwargs):
+    """La venta eliminada se resta de VentaDiaria (sus detalles todavía existen)."""
+    acumular_en_resumen([(instance, _detalles_para_resumen(instance.pk))], signo=-1)
+
+
+@receiver(pre_save, sender=Venta)
+def mover_en_resumen(sender, instance, raw=False, **kwargs):
+    """
+    Las ventas nuevas las suma quien crea los detalles; aquí solo se mueve una venta
+    editada cuya fecha, cliente o método de entrada cambió.
+    """
+    if raw or instance.pk is None:
+        return
+    anterior = Venta.objects.filter(pk=instance.pk).only('fecha_venta', 'cliente_id', 'metodo_entrada').first()
+    if anterior is None or (anterior.fecha_venta, anterior.cliente_id, anterior.metodo_entrada) == (
+        instance.fecha_venta, instance.cliente_id, instance.metodo_entrada
+    ):
+        return
+    detalles = _detalles_para_resumen(instance.pk)
+    acumular_en_resumen([(anterior, detalles)], signo=-1)
+    acumular_en_resumen([(instance, detalles)])
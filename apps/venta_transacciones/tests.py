@@ -1,4 +1,41 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import threading
+import time
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.acceso_seguridad.models import Usuario, Bitacora
+from apps.catalogo.models import Categoria, Producto, Cliente, MovimientoStock, Inventario, InventarioProducto
+from apps.catalogo.utils import descontar_stock, activar_modo_hot
+from .management.commands.particionar_ventas import Command as ParticionarVentas
+from .models import Carrito, DetalleCarrito, Venta, DetalleVenta, Pago, VentaDiaria, ClaveIdempotencia, EventoOutbox
+from config.proyecciones import Proyeccion
+from config.renderers import ORJSONRenderer, respuesta_json_streaming
+from .serializers import VentaReadSerializer
+from .utils import registrar_ventas_lote
+from .utils_outbox import MANEJADORES, procesar_lote, registrar_evento
+from .utils_planes import consultas_criticas, seq_scans_grandes
+from .utils_resumen import recalcular_resumen
 
 
 class CarritoTests(TestCase):
@@ -6,3 +43,927 @@ class CarritoTests(TestCase):
 	def test_placeholder(self):
 		self.assertTrue(True)
 
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'El descuento en una sola sentencia requiere PostgreSQL')
+class CheckoutCarritoConsultasTests(TestCase):
+	"""El checkout del carrito debe costar lo mismo con 1, 10 o 100 productos."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='checkout@test.com', password='x', rol='CLIENTE')
+		categoria = Categoria.objects.create(nombre='Checkout')
+		cls.productos = Producto.objects.bulk_create([
+			Producto(codigo_producto=f'CHK-{i}', nombre=f'Producto {i}', precio_venta=10, stock_actual=50, categoria=categoria)
+			for i in range(100)
+		])
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.usuario)
+		self.carrito = Carrito.objects.create(cliente=self.usuario.cliente)
+
+	def _checkout(self, cantidad_lineas):
+		DetalleCarrito.objects.bulk_create([
+			DetalleCarrito(carrito=self.carrito, producto=producto, cantidad=2, precio_unitario=1, subtotal=2)
+			for producto in self.productos[:cantidad_lineas]
+		])
+		with CaptureQueriesContext(connection) as consultas:
+			respuesta = self.client.post('/api/carritos/crear_venta_desde_carrito/', {}, format='json')
+		self.assertEqual(respuesta.status_code, 201, respuesta.content)
+		self.assertEqual(len(respuesta.data['detalles']), cantidad_lineas)
+		return len(consultas)
+
+	def test_cantidad_de_consultas_constante(self):
+		conteos = {n: self._checkout(n) for n in (1, 10, 100)}
+		self.assertEqual(len(set(conteos.values())), 1, conteos)
+
+		# El precio se toma del producto, y el stock queda descontado
+		venta = Venta.objects.latest('id')
+		self.assertEqual(venta.total, 100 * 2 * 10)
+		self.assertEqual(Producto.objects.get(pk=self.productos[0].pk).stock_actual, 50 - 3 * 2)
+		self.assertFalse(DetalleCarrito.objects.filter(carrito=self.carrito).exists())
+
+	def test_stock_insuficiente_no_crea_venta(self):
+		Producto.objects.filter(pk=self.productos[0].pk).update(stock_actual=1)
+		DetalleCarrito.objects.create(carrito=self.carrito, producto=self.productos[0], cantidad=2, precio_unitario=10, subtotal=20)
+
+		respuesta = self.client.post('/api/carritos/crear_venta_desde_carrito/', {}, format='json')
+
+		self.assertEqual(respuesta.status_code, 400)
+		self.assertFalse(Venta.objects.exists())
+		self.assertTrue(DetalleCarrito.objects.filter(carrito=self.carrito).exists())
+
+
+class CarritoStockFranjasTests(TestCase):
+	"""El carrito con productos en modo hot suma las franjas de todos en una sola consulta."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='franjas@test.com', password='x', rol='CLIENTE')
+		categoria = Categoria.objects.create(nombre='Franjas')
+		cls.productos = Producto.objects.bulk_create([
+			Producto(codigo_producto=f'FRJ-{i}', nombre=f'Producto {i}', precio_venta=10, stock_actual=40, categoria=categoria)
+			for i in range(6)
+		])
+		for producto in cls.productos:
+			activar_modo_hot(producto.id, franjas=4)
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.usuario)
+		self.carrito = Carrito.objects.create(cliente=self.usuario.cliente)
+
+	def _llenar(self, cantidad_lineas):
+		DetalleCarrito.objects.filter(carrito=self.carrito).delete()
+		DetalleCarrito.objects.bulk_create([
+			DetalleCarrito(carrito=self.carrito, producto=producto, cantidad=1, precio_unitario=10, subtotal=10)
+			for producto in self.productos[:cantidad_lineas]
+		])
+
+	def test_detalle_del_carrito_sin_consulta_por_producto(self):
+		for cantidad_lineas in (1, 6):
+			with self.subTest(lineas=cantidad_lineas):
+				self._llenar(cantidad_lineas)
+				with self.assertNumQueries(5):
+					respuesta = self.client.get(f'/api/carritos/{self.carrito.id}/')
+				self.assertEqual(respuesta.status_code, 200, respuesta.content)
+				stocks = [detalle['producto_info']['stock_actual'] for detalle in respuesta.data['detalles']]
+				self.assertEqual(stocks, [40] * cantidad_lineas)
+
+	def test_listado_de_detalles_sin_consulta_por_producto(self):
+		for cantidad_lineas in (1, 6):
+			with self.subTest(lineas=cantidad_lineas):
+				self._llenar(cantidad_lineas)
+				with self.assertNumQueries(2):
+					respuesta = self.client.get('/api/detalles-carrito/')
+				self.assertEqual(respuesta.status_code, 200, respuesta.content)
+				filas = respuesta.data['results'] if isinstance(respuesta.data, dict) else respuesta.data
+				self.assertEqual([fila['producto_info']['stock_actual'] for fila in filas], [40] * cantidad_lineas)
+
+
+class CrearVentaTests(TestCase):
+	"""POST /api/ventas/ lee todos los productos del ticket en una sola consulta, sin bloquearlos."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='venta@test.com', password='x', rol='CLIENTE')
+		categoria = Categoria.objects.create(nombre='Venta')
+		cls.agua, cls.jugo = Producto.objects.bulk_create([
+			Producto(codigo_producto='VEN-1', nombre='Agua', precio_venta=5, stock_actual=10, categoria=categoria),
+			Producto(codigo_producto='VEN-2', nombre='Jugo', precio_venta=8, stock_actual=10, categoria=categoria),
+		])
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.usuario)
+
+	def _vender(self, *lineas):
+		cuerpo = {
+			'cliente': self.usuario.cliente.id,
+			'detalles': [{'producto_id': producto_id, 'cantidad': cantidad} for producto_id, cantidad in lineas],
+		}
+		return self.client.post('/api/ventas/', cuerpo, format='json')
+
+	def test_productos_en_una_sola_lectura(self):
+		with CaptureQueriesContext(connection) as consultas:
+			respuesta = self._vender((self.agua.id, 2), (self.jugo.id, 1), (self.agua.id, 1))
+
+		self.assertEqual(respuesta.status_code, 201, respuesta.content)
+		lecturas = [
+			q['sql'] for q in consultas.captured_queries
+			if q['sql'].startswith('SELECT') and 'FROM "catalogo_producto"' in q['sql']
+		]
+		self.assertEqual(len(lecturas), 1, lecturas)
+		self.assertNotIn('FOR UPDATE', lecturas[0])
+		self.assertEqual(respuesta.data['total'], '23.00')
+		self.assertEqual(
+			dict(Producto.objects.filter(pk__in=[self.agua.pk, self.jugo.pk]).values_list('id', 'stock_actual')),
+			{self.agua.id: 7, self.jugo.id: 9},
+		)
+
+	def test_producto_inexistente_responde_404(self):
+		respuesta = self._vender((self.agua.id, 1), (999999, 1))
+
+		self.assertEqual(respuesta.status_code, 404)
+		self.assertEqual(respuesta.json(), {'error': 'Uno de los productos no existe.'})
+		self.assertFalse(Venta.objects.exists())
+		self.assertEqual(Producto.objects.get(pk=self.agua.pk).stock_actual, 10)
+
+
+class CargaMasivaTests(TestCase):
+	"""La carga NDJSON responde por línea y solo aplica (stock y libro) las ventas aceptadas."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='bulk@test.com', password='x', rol='CLIENTE')
+		categoria = Categoria.objects.create(nombre='Bulk')
+		cls.agua, cls.jugo = Producto.objects.bulk_create([
+			Producto(codigo_producto='BULK-1', nombre='Agua', precio_venta=5, stock_actual=10, categoria=categoria),
+			Producto(codigo_producto='BULK-2', nombre='Jugo', precio_venta=8, stock_actual=3, categoria=categoria),
+		])
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.usuario)
+
+	def _cargar(self):
+		lineas = [
+			json.dumps({'cliente': self.usuario.cliente.id, 'detalles': [{'producto_id': self.agua.id, 'cantidad': 2}]}),
+			'{"detalles": [',
+			json.dumps({'detalles': [{'producto_id': 999999, 'cantidad': 1}]}),
+			# El agua alcanza pero el jugo no: la venta entera se rechaza
+			json.dumps({'detalles': [{'producto_id': self.agua.id, 'cantidad': 1}, {'producto_id': self.jugo.id, 'cantidad': 5}]}),
+			'',
+			json.dumps({'detalles': [{'producto_id': self.jugo.id, 'cantidad': 3}, {'producto_id': self.agua.id, 'cantidad': 1}]}),
+		]
+		respuesta = self.client.post(
+			'/api/ventas/bulk/', '\n'.join(lineas).encode('utf-8'), content_type='application/x-ndjson'
+		)
+		self.assertEqual(respuesta.status_code, 200, respuesta.content)
+		return respuesta.json()
+
+	def _stock(self):
+		return dict(Producto.objects.filter(pk__in=[self.agua.pk, self.jugo.pk]).values_list('id', 'stock_actual'))
+
+	def test_resultados_por_linea_y_stock_consistente(self):
+		cuerpo = self._cargar()
+
+		self.assertEqual((cuerpo['creadas'], cuerpo['errores']), (2, 3))
+		estados = {r['linea']: r['estado'] for r in cuerpo['resultados']}
+		self.assertEqual(estados, {1: 'creada', 2: 'error', 3: 'error', 4: 'error', 6: 'creada'})
+		errores = {r['linea']: r['error'] for r in cuerpo['resultados'] if r['estado'] == 'error'}
+		self.assertIn('JSON inválido', errores[2])
+		self.assertIn('999999 no existe', errores[3])
+		self.assertIn("Stock insuficiente para 'Jugo'", errores[4])
+
+		creadas = {r['linea']: r for r in cuerpo['resultados'] if r['estado'] == 'creada'}
+		self.assertEqual(creadas[1]['total'], '10.00')
+		self.assertEqual(creadas[6]['total'], '29.00')
+		self.assertEqual(Venta.objects.count(), 2)
+
+		# La línea 4 no descontó el agua que sí alcanzaba
+		self.assertEqual(self._stock(), {self.agua.id: 7, self.jugo.id: 0})
+
+		# El libro tiene un movimiento por detalle aceptado, con la referencia de su venta
+		movimientos = set(MovimientoStock.objects.filter(tipo=MovimientoStock.TipoMovimiento.VENTA).values_list(
+			'producto_id', 'cantidad', 'referencia'
+		))
+		self.assertEqual(movimientos, {
+			(self.agua.id, -2, f"venta:{creadas[1]['venta_id']}"),
+			(self.jugo.id, -3, f"venta:{creadas[6]['venta_id']}"),
+			(self.agua.id, -1, f"venta:{creadas[6]['venta_id']}"),
+		})
+
+	def test_error_de_bd_revierte_el_lote_completo(self):
+		with mock.patch('apps.venta_transacciones.utils.acumular_en_resumen', side_effect=RuntimeError('sin conexión')):
+			cuerpo = self._cargar()
+
+		self.assertEqual(cuerpo['creadas'], 0)
+		self.assertTrue(all(r['estado'] == 'error' for r in cuerpo['resultados']))
+		self.assertIn('sin conexión', cuerpo['resultados'][0]['error'])
+		self.assertFalse(Venta.objects.exists())
+		self.assertFalse(MovimientoStock.objects.filter(tipo=MovimientoStock.TipoMovimiento.VENTA).exists())
+		self.assertEqual(self._stock(), {self.agua.id: 10, self.jugo.id: 3})
+
+
+class IdempotenciaTests(TestCase):
+	"""Un POST repetido con la misma Idempotency-Key devuelve la primera respuesta sin crear otra venta."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='idem@test.com', password='x', rol='CLIENTE')
+		cls.otro = Usuario.objects.create_user(correo='idem2@test.com', password='x', rol='CLIENTE')
+		categoria = Categoria.objects.create(nombre='Idempotencia')
+		cls.producto = Producto.objects.create(
+			codigo_producto='IDEM-1', nombre='Agua', precio_venta=5, stock_actual=10, categoria=categoria,
+		)
+
+	def setUp(self):
+		cache.clear()
+		self.client = APIClient()
+		self.client.force_authenticate(self.usuario)
+
+	def _vender(self, client, usuario, clave, cantidad=1):
+		cuerpo = {'cliente': usuario.cliente.id, 'detalles': [{'producto_id': self.producto.id, 'cantidad': cantidad}]}
+		return client.post('/api/ventas/', cuerpo, format='json', HTTP_IDEMPOTENCY_KEY=clave)
+
+	def test_reintento_repite_la_respuesta_sin_otra_venta(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			primera = self._vender(self.client, self.usuario, 'pedido-1')
+		self.assertEqual(primera.status_code, 201, primera.content)
+
+		desde_cache = self._vender(self.client, self.usuario, 'pedido-1')
+		cache.clear()
+		desde_bd = self._vender(self.client, self.usuario, 'pedido-1')
+
+		for repetida in (desde_cache, desde_bd):
+			self.assertEqual(repetida.status_code, 201)
+			self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+			self.assertEqual(repetida.json(), primera.json())
+		self.assertEqual(Venta.objects.count(), 1)
+		self.producto.refresh_from_db()
+		self.assertEqual(self.producto.stock_actual, 9)
+
+	def test_misma_clave_con_otro_cuerpo_responde_422(self):
+		self.assertEqual(self._vender(self.client, self.usuario, 'pedido-1').status_code, 201)
+
+		respuesta = self._vender(self.client, self.usuario, 'pedido-1', cantidad=2)
+
+		self.assertEqual(respuesta.status_code, 422)
+		self.assertEqual(Venta.objects.count(), 1)
+
+	def test_clave_por_usuario_y_por_endpoint(self):
+		self.assertEqual(self._vender(self.client, self.usuario, 'pedido-1').status_code, 201)
+
+		otro_client = APIClient()
+		otro_client.force_authenticate(self.otro)
+		respuesta = self._vender(otro_client, self.otro, 'pedido-1')
+		self.assertEqual(respuesta.status_code, 201)
+		self.assertFalse(respuesta.has_header('Idempotent-Replayed'))
+
+		carrito = Carrito.objects.create(cliente=self.usuario.cliente)
+		DetalleCarrito.objects.create(carrito=carrito, producto=self.producto, cantidad=1, precio_unitario=5, subtotal=5)
+		respuesta = self.client.post('/api/carritos/crear_venta_desde_carrito/', {}, format='json', HTTP_IDEMPOTENCY_KEY='pedido-1')
+		self.assertEqual(respuesta.status_code, 201, respuesta.content)
+		self.assertFalse(respuesta.has_header('Idempotent-Replayed'))
+
+		self.assertEqual(Venta.objects.count(), 3)
+		self.assertEqual(ClaveIdempotencia.objects.filter(clave='pedido-1').count(), 3)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Requiere PostgreSQL local')
+class IdempotenciaConcurrenteTests(TransactionTestCase):
+	"""Dos envíos simultáneos de la misma clave se serializan en la restricción única."""
+
+	def setUp(self):
+		cache.clear()
+		self.usuario = Usuario.objects.create_user(correo='idem@test.com', password='x', rol='CLIENTE')
+		categoria = Categoria.objects.create(nombre='Idempotencia')
+		self.producto = Producto.objects.create(
+			codigo_producto='IDEM-1', nombre='Agua', precio_venta=5, stock_actual=10, categoria=categoria,
+		)
+
+	def test_duplicado_concurrente_crea_una_sola_venta(self):
+		respuestas = []
+		barrera = threading.Barrier(2)
+		cuerpo = {'cliente': self.usuario.cliente.id, 'detalles': [{'producto_id': self.producto.id, 'cantidad': 1}]}
+
+		def descontar_lento(*args, **kwargs):
+			# La primera solicitud retiene la clave mientras la segunda llega al INSERT
+			time.sleep(0.3)
+			return descontar_stock(*args, **kwargs)
+
+		def enviar():
+			try:
+				client = APIClient()
+				client.force_authenticate(self.usuario)
+				barrera.wait()
+				respuestas.append(client.post('/api/ventas/', cuerpo, format='json', HTTP_IDEMPOTENCY_KEY='doble-clic'))
+			finally:
+				connection.close()
+
+		# Sin el camino rápido de la caché: las dos solicitudes llegan a la BD
+		with mock.patch.object(cache, 'get', return_value=None), \
+				mock.patch('apps.venta_transacciones.views.descontar_stock', side_effect=descontar_lento):
+			hilos = [threading.Thread(target=enviar) for _ in range(2)]
+			for hilo in hilos:
+				hilo.start()
+			for hilo in hilos:
+				hilo.join()
+
+		self.assertEqual([r.status_code for r in respuestas], [201, 201])
+		self.assertEqual(sum(r.has_header('Idempotent-Replayed') for r in respuestas), 1)
+		self.assertEqual(respuestas[0].json(), respuestas[1].json())
+		self.assertEqual(Venta.objects.count(), 1)
+		self.assertEqual(ClaveIdempotencia.objects.count(), 1)
+		self.producto.refresh_from_db()
+		self.assertEqual(self.producto.stock_actual, 9)
+
+
+class OutboxTests(TestCase):
+	"""Los efectos secundarios de la venta se encolan con ella y se reintentan por manejador."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='outbox@test.com', password='x', rol='CLIENTE')
+		categoria = Categoria.objects.create(nombre='Outbox')
+		cls.producto = Producto.objects.create(
+			codigo_producto='OUT-1', nombre='Agua', precio_venta=5, stock_actual=10, categoria=categoria,
+		)
+
+	def setUp(self):
+		self.enterContext(mock.patch('apps.venta_transacciones.utils_outbox.enviar_notificacion'))
+		self.email = self.enterContext(mock.patch('apps.acceso_seguridad.utils.requests.post'))
+		self.email.return_value.status_code = 201
+
+	def _evento(self):
+		venta = Venta.objects.create(cliente=self.usuario.cliente, total=5)
+		return registrar_evento(EventoOutbox.TipoEvento.VENTA_CREADA, venta_id=venta.id)
+
+	def _liberar(self, evento):
+		EventoOutbox.objects.filter(pk=evento.pk).update(disponible_desde=timezone.now())
+
+	def test_venta_revertida_no_deja_evento(self):
+		client = APIClient()
+		client.force_authenticate(self.usuario)
+		cuerpo = {'cliente': self.usuario.cliente.id, 'detalles': [{'producto_id': self.producto.id, 'cantidad': 1}]}
+
+		# Falla después de encolar el evento: la venta y el evento se revierten juntos
+		with mock.patch('apps.venta_transacciones.views.VentaReadSerializer', side_effect=RuntimeError('falla')):
+			respuesta = client.post('/api/ventas/', cuerpo, format='json')
+		self.assertEqual(respuesta.status_code, 500)
+		self.assertFalse(Venta.objects.exists())
+		self.assertFalse(EventoOutbox.objects.exists())
+
+		respuesta = client.post('/api/ventas/', cuerpo, format='json')
+		self.assertEqual(respuesta.status_code, 201)
+		self.assertEqual(EventoOutbox.objects.get().datos, {'venta_id': respuesta.data['id']})
+
+	def test_email_rechazado_se_reprograma(self):
+		evento = self._evento()
+		self.email.return_value.status_code = 400
+
+		self.assertEqual(procesar_lote(), 1)
+
+		evento.refresh_from_db()
+		self.assertEqual(evento.estado, EventoOutbox.EstadoEvento.PENDIENTE)
+		self.assertEqual(evento.intentos, 1)
+		self.assertIn('Brevo respondió 400', evento.ultimo_error)
+		self.assertGreater(evento.disponible_desde, timezone.now() + timedelta(minutes=1))
+		# Mientras espera el reintento ningún worker lo vuelve a tomar
+		self.assertEqual(procesar_lote(), 0)
+
+	def test_reintento_no_repite_manejadores_completados(self):
+		evento = self._evento()
+		with mock.patch('apps.venta_transacciones.utils_outbox.enviar_notificacion', side_effect=RuntimeError('FCM caído')):
+			procesar_lote()
+		evento.refresh_from_db()
+		self.assertEqual(evento.estado, EventoOutbox.EstadoEvento.PENDIENTE)
+		self.assertEqual(evento.manejadores_completados, ['enviar_comprobante'])
+
+		self._liberar(evento)
+		procesar_lote()
+
+		evento.refresh_from_db()
+		self.assertEqual(evento.estado, EventoOutbox.EstadoEvento.PROCESADO)
+		self.assertEqual(evento.manejadores_completados, ['enviar_comprobante', 'notificar_venta'])
+		self.assertEqual(self.email.call_count, 1)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED requiere PostgreSQL')
+class OutboxConcurrenteTests(TransactionTestCase):
+	"""Dos workers a la vez: cada evento lo procesa uno solo."""
+
+	def test_cada_evento_se_procesa_una_vez(self):
+		for venta_id in range(5):
+			registrar_evento(EventoOutbox.TipoEvento.VENTA_CREADA, venta_id=venta_id)
+		ejecutados = []
+		tomados = []
+		barrera = threading.Barrier(2)
+
+		def manejador_lento(datos):
+			ejecutados.append(datos['venta_id'])
+			time.sleep(0.1)
+
+		def worker():
+			try:
+				barrera.wait()
+				tomados.append(procesar_lote())
+			finally:
+				connection.close()
+
+		with mock.patch.dict(MANEJADORES, {EventoOutbox.TipoEvento.VENTA_CREADA: [manejador_lento]}):
+			hilos = [threading.Thread(target=worker) for _ in range(2)]
+			for hilo in hilos:
+				hilo.start()
+			for hilo in hilos:
+				hilo.join()
+
+		self.assertEqual(sorted(ejecutados), [0, 1, 2, 3, 4])
+		self.assertEqual(sum(tomados), 5)
+		self.assertEqual(EventoOutbox.objects.filter(estado=EventoOutbox.EstadoEvento.PROCESADO).count(), 5)
+
+
+class CamposDinamicosVentaTests(TestCase):
+	"""Una página de ventas con ?fields= o ?expand=cliente cuesta una sola consulta."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='campos@test.com', password='x', rol='CLIENTE', nombre='Ana')
+		Venta.objects.bulk_create([Venta(cliente=cls.usuario.cliente, total=i) for i in range(1000)], batch_size=1000)
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.usuario)
+
+	def test_fields_en_una_consulta(self):
+		with CaptureQueriesContext(connection) as consultas:
+			respuesta = self.client.get('/api/ventas/', {'fields': 'id,total', 'page_size': 200})
+
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertEqual(len(consultas), 1, [c['sql'] for c in consultas])
+		self.assertNotIn('metodo_entrada', consultas[0]['sql'])
+		self.assertEqual(len(respuesta.data['results']), 200)
+		self.assertEqual({tuple(fila) for fila in respuesta.data['results']}, {('id', 'total')})
+
+	def test_expand_cliente_en_una_consulta(self):
+		with self.assertNumQueries(1):
+			respuesta = self.client.get('/api/ventas/', {'fields': 'id', 'expand': 'cliente', 'page_size': 200})
+
+		fila = respuesta.data['results'][0]
+		self.assertEqual(set(fila), {'id', 'cliente'})
+		self.assertEqual((fila['cliente']['nombre'], fila['cliente']['correo']), ('Ana', 'campos@test.com'))
+
+	def test_campos_desconocidos_se_ignoran(self):
+		respuesta = self.client.get('/api/ventas/', {'fields': 'id,no_existe', 'expand': 'tampoco'})
+
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertEqual({tuple(fila) for fila in respuesta.data['results']}, {('id',)})
+
+
+class MisComprasEtagTests(TestCase):
+	"""El historial responde 304 mientras el cliente no registre ventas nuevas."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='historial@test.com', password='x', rol='CLIENTE')
+		cls.otro = Usuario.objects.create_user(correo='historial2@test.com', password='x', rol='CLIENTE')
+		Venta.objects.create(cliente=cls.usuario.cliente, total=10)
+
+	def setUp(self):
+		cache.clear()
+		self.client = APIClient()
+		self.client.force_authenticate(self.usuario)
+
+	def _get(self, etag=None):
+		cabeceras = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+		return self.client.get('/api/ventas/mis_compras/', **cabeceras)
+
+	def test_if_none_match_responde_304_sin_cuerpo(self):
+		primera = self._get()
+		self.assertEqual(primera.status_code, 200)
+		self.assertTrue(primera['ETag'])
+
+		repetida = self._get(primera['ETag'])
+
+		self.assertEqual(repetida.status_code, 304)
+		self.assertEqual(repetida.content, b'')
+		self.assertEqual(repetida['ETag'], primera['ETag'])
+
+	def test_venta_nueva_cambia_el_etag_al_confirmar(self):
+		etag = self._get()['ETag']
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Venta.objects.create(cliente=self.usuario.cliente, total=20)
+			# Antes del COMMIT la versión no cambia (otra conexión todavía no ve la venta)
+			self.assertEqual(self._get(etag).status_code, 304)
+
+		respuesta = self._get(etag)
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertNotEqual(respuesta['ETag'], etag)
+		self.assertEqual(len(respuesta.data['results']), 2)
+
+	def test_venta_de_otro_cliente_no_cambia_el_etag(self):
+		etag = self._get()['ETag']
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Venta.objects.create(cliente=self.otro.cliente, total=20)
+
+		self.assertEqual(self._get(etag).status_code, 304)
+
+
+class ListadoProyectadoVentaTests(TestCase):
+	"""El listado proyectado desde .values() produce el mismo JSON que VentaReadSerializer."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='proy@test.com', password='x', rol='CLIENTE', nombre='Ana')
+		categoria = Categoria.objects.create(nombre='Proyección')
+		agua, jugo = Producto.objects.bulk_create([
+			Producto(codigo_producto='PROY-1', nombre='Agua', precio_venta='5.50', categoria=categoria),
+			Producto(codigo_producto='PROY-2', nombre='Jugo', precio_venta=8, categoria=categoria, imagen_url='https://x.test/jugo.png'),
+		])
+		ventas = Venta.objects.bulk_create([
+			Venta(cliente=cls.usuario.cliente, total='19.00', metodo_entrada=Venta.MetodoEntrada.MOVIL),
+			Venta(total='5.50'),  # mostrador, sin cliente
+			Venta(cliente=cls.usuario.cliente, total=0),
+		])
+		DetalleVenta.objects.bulk_create([
+			DetalleVenta(venta=ventas[0], producto=agua, cantidad=2, precio_unitario='5.50', subtotal=11),
+			DetalleVenta(venta=ventas[0], producto=jugo, cantidad=1, precio_unitario=8, subtotal=8),
+			DetalleVenta(venta=ventas[1], producto=agua, cantidad=1, precio_unitario='5.50', subtotal='5.50'),
+		])
+
+	def _json(self, filas):
+		return json.dumps(sorted(filas, key=lambda fila: fila['id']))
+
+	def test_mismo_json_que_el_serializador(self):
+		client = APIClient()
+		client.force_authenticate(self.usuario)
+		for parametros in ({}, {'expand': 'cliente'}, {'fields': 'id,total,estado,notas', 'expand': 'detalles'}):
+			with self.subTest(**parametros):
+				proyectado = client.get('/api/ventas/', parametros).json()['results']
+
+				request = Request(APIRequestFactory().get('/api/ventas/', parametros))
+				serializer = VentaReadSerializer(
+					Venta.objects.select_related('cliente__usuario').prefetch_related('detalles__producto'),
+					many=True, context={'request': request},
+				)
+				esperado = json.loads(JSONRenderer().render(serializer.data))
+
+				self.assertEqual(len(proyectado), 3)
+				self.assertEqual(self._json(proyectado), self._json(esperado))
+
+	def test_metodo_no_declarado_falla_al_construir(self):
+		class VentaConCorreoSerializer(VentaReadSerializer):
+			correo = serializers.SerializerMethodField()
+
+			class Meta(VentaReadSerializer.Meta):
+				fields = VentaReadSerializer.Meta.fields + ['correo']
+
+			def get_correo(self, obj):
+				return obj.cliente.usuario.correo
+
+		with self.assertRaisesMessage(ValueError, 'get_correo'):
+			Proyeccion(VentaConCorreoSerializer())
+
+
+class PaginacionCursorTests(TestCase):
+	"""El keyset de PaginacionCursor no salta ni repite filas con valores empatados, hacia adelante ni hacia atrás."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.admin = Usuario.objects.create_user(correo='pag@test.com', password='x', rol='ADMIN')
+		cliente = Usuario.objects.create_user(correo='pag2@test.com', password='x', rol='CLIENTE').cliente
+		categoria = Categoria.objects.create(nombre='Paginación')
+		producto = Producto.objects.create(codigo_producto='PAG-1', nombre='Agua', precio_venta=5, categoria=categoria)
+		inventario = Inventario.objects.create(codigo='PAG')
+
+		# 11 filas por modelo con solo 3 fechas distintas: varios empates caen en el borde de una página de 3
+		base = timezone.now().replace(microsecond=0)
+		fechas = [base] * 4 + [base - timedelta(hours=1)] * 3 + [base - timedelta(days=1)] * 4
+		totales = [5, 5, 5, 8, 8, 13, 13, 13, 13, 2, 2]
+		cls.ventas = Venta.objects.bulk_create([
+			Venta(cliente=cliente, fecha_venta=fecha, total=total) for fecha, total in zip(fechas, totales)
+		])
+		InventarioProducto.objects.bulk_create([
+			InventarioProducto(inventario=inventario, producto=producto, cantidad=1, fecha_ingreso=fecha) for fecha in fechas
+		])
+		Bitacora.objects.bulk_create([Bitacora(usuario=cls.admin, accion='PRUEBA') for _ in fechas])
+		Pago.objects.bulk_create([Pago(monto=1, metodo_pago='efectivo') for _ in fechas])
+		# fecha y fecha_creacion son auto_now_add: se fijan después del alta
+		for modelo, campo in ((Bitacora, 'fecha'), (Pago, 'fecha_creacion')):
+			for pk, fecha in zip(modelo.objects.order_by('id').values_list('id', flat=True), fechas):
+				modelo.objects.filter(pk=pk).update(**{campo: fecha})
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.admin)
+
+	def _recorrer(self, url, **parametros):
+		"""Sigue los enlaces 'next' hasta el final y luego los 'previous' hasta el principio."""
+		pagina = self.client.get(url, {**parametros, 'page_size': 3}).json()
+		adelante = [fila['id'] for fila in pagina['results']]
+		while pagina['next']:
+			pagina = self.client.get(pagina['next']).json()
+			adelante += [fila['id'] for fila in pagina['results']]
+
+		atras = [fila['id'] for fila in pagina['results']]
+		while pagina['previous']:
+			pagina = self.client.get(pagina['previous']).json()
+			atras = [fila['id'] for fila in pagina['results']] + atras
+		return adelante, atras
+
+	def _esperado(self, modelo, *orden):
+		return list(modelo.objects.order_by(*orden).values_list('id', flat=True))
+
+	def test_recorrido_con_fechas_empatadas(self):
+		casos = (
+			('/api/ventas/', Venta, ('-fecha_venta', '-id')),
+			('/api/acceso_seguridad/bitacora/', Bitacora, ('-fecha', '-id')),
+			('/api/inventario-productos/', InventarioProducto, ('-fecha_ingreso', '-id')),
+			('/api/pagos/', Pago, ('-fecha_creacion', '-id')),
+		)
+		for url, modelo, orden in casos:
+			with self.subTest(url=url):
+				adelante, atras = self._recorrer(url)
+				esperado = self._esperado(modelo, *orden)
+				self.assertEqual(len(esperado), 11)
+				self.assertEqual(adelante, esperado)
+				self.assertEqual(atras, esperado)
+
+	def test_recorrido_con_ordering_por_total(self):
+		for ordering, orden in (('total', ('total', 'id')), ('-total', ('-total', '-id'))):
+			with self.subTest(ordering=ordering):
+				adelante, atras = self._recorrer('/api/ventas/', ordering=ordering)
+				esperado = self._esperado(Venta, *orden)
+				self.assertEqual(adelante, esperado)
+				self.assertEqual(atras, esperado)
+
+	def test_cursor_malformado_responde_404(self):
+		def cursor(posicion):
+			return base64.b64encode(urlencode({'p': posicion}).encode('ascii')).decode('ascii')
+
+		for valor in ('no-es-base64', cursor('no-es-fecha|3'), cursor('2024-01-01T00:00:00+00:00'), cursor('2024-01-01T00:00:00+00:00|x')):
+			with self.subTest(cursor=valor):
+				respuesta = self.client.get('/api/ventas/', {'cursor': valor})
+				self.assertEqual(respuesta.status_code, 404, respuesta.content)
+
+
+class RenderizadorJSONTests(TestCase):
+	"""ORJSONRenderer (renderer por defecto) produce lo mismo que el JSONRenderer de DRF, y la exportación es JSON válido."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.admin = Usuario.objects.create_user(correo='render@test.com', password='x', rol='ADMIN')
+		cliente = Usuario.objects.create_user(correo='render2@test.com', password='x', rol='CLIENTE', nombre='Ñandú').cliente
+		categoria = Categoria.objects.create(nombre='Render')
+		agua = Producto.objects.create(codigo_producto='REN-1', nombre='Agua «fría»', precio_venta='5.50', categoria=categoria)
+		ventas = Venta.objects.bulk_create([
+			Venta(cliente=cliente if i % 2 else None, total=f'{i}.25', metodo_entrada=Venta.MetodoEntrada.MOVIL)
+			for i in range(7)
+		])
+		DetalleVenta.objects.bulk_create([
+			DetalleVenta(venta=venta, producto=agua, cantidad=1, precio_unitario='5.50', subtotal='5.50') for venta in ventas[::2]
+		])
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.admin)
+
+	def test_misma_salida_que_json_renderer(self):
+		venta = Venta.objects.select_related('cliente__usuario').prefetch_related('detalles__producto').filter(detalles__isnull=False).first()
+		momento = datetime(2024, 5, 1, 10, 30, 15, 123456, tzinfo=dt_timezone.utc)
+		datos = {
+			'decimal': Decimal('12.50'),
+			'decimal_largo': Decimal('0.1000000000000000055511151231257827'),
+			'fecha_utc': momento,
+			'fecha_la_paz': momento.astimezone(ZoneInfo('America/La_Paz')),
+			'fecha_sin_zona': momento.replace(tzinfo=None),
+			'dia': date(2024, 5, 1),
+			'hora': momento.replace(tzinfo=None).time(),
+			'duracion': timedelta(hours=1, milliseconds=5),
+			'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+			'perezoso': gettext_lazy('Venta'),
+			'claves_no_texto': {1: 'uno', 2: ['dos']},
+			'separadores': 'a\u2028b\u2029c',
+			'anidado': VentaReadSerializer(venta).data,
+			'lista': VentaReadSerializer(Venta.objects.prefetch_related('detalles__producto'), many=True).data,
+		}
+
+		esperado = JSONRenderer().render(datos)
+		self.assertEqual(ORJSONRenderer().render(datos), esperado)
+		with mock.patch('config.renderers.orjson', None):
+			self.assertEqual(ORJSONRenderer().render(datos), esperado)
+
+		# orjson no acepta enteros de más de 64 bits: esa respuesta se codifica con json
+		datos['entero_grande'] = 2 ** 70
+		self.assertEqual(ORJSONRenderer().render(datos), JSONRenderer().render(datos))
+
+	def test_floats_se_leen_igual(self):
+		# El texto puede diferir ("1e16" frente a "1e+16"), el número leído no
+		datos = [0.1, 1e16, 1e-7, 123456789.123, -0.0, 2.5e-308]
+		self.assertEqual(json.loads(ORJSONRenderer().render(datos)), json.loads(JSONRenderer().render(datos)))
+
+	def test_nan_e_infinity_como_null_en_todos_los_caminos(self):
+		datos = {'a': float('nan'), 'b': Decimal('Infinity'), 'c': [float('-inf'), 1.5], 'd': (Decimal('NaN'),)}
+		esperado = {'a': None, 'b': None, 'c': [None, 1.5], 'd': [None]}
+
+		self.assertEqual(json.loads(ORJSONRenderer().render(datos)), esperado)
+		# API navegable (con indentación) y sin orjson delegan en json: tampoco fallan ni emiten "NaN"
+		self.assertEqual(json.loads(ORJSONRenderer().render(datos, renderer_context={'indent': 2})), esperado)
+		with mock.patch('config.renderers.orjson', None):
+			self.assertEqual(json.loads(ORJSONRenderer().render(datos)), esperado)
+		# DRF los rechaza: la diferencia es deliberada
+		with self.assertRaises(ValueError):
+			JSONRenderer().render(datos)
+
+	def test_exportacion_es_el_listado_completo(self):
+		respuesta = self.client.get('/api/ventas/exportar/')
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertEqual(respuesta['Content-Type'], 'application/json')
+		exportado = json.loads(b''.join(respuesta.streaming_content))
+
+		listado = self.client.get('/api/ventas/', {'page_size': 200}).json()
+		self.assertIsNone(listado['next'])
+		self.assertEqual(len(exportado), 7)
+		self.assertEqual(exportado, listado['results'])
+
+		# Los filtros se aplican igual; sin filas la exportación es un arreglo vacío válido
+		vacio = self.client.get('/api/ventas/exportar/', {'fecha_max': '2000-01-01'})
+		self.assertEqual(json.loads(b''.join(vacio.streaming_content)), [])
+
+	def test_streaming_por_bloques(self):
+		respuesta = respuesta_json_streaming(iter([[], [{'a': 1}], [], [{'a': Decimal('2.5')}, {'a': None}]]))
+		self.assertEqual(b''.join(respuesta.streaming_content), b'[{"a":1},{"a":2.5},{"a":null}]')
+		self.assertEqual(b''.join(respuesta_json_streaming(iter([])).streaming_content), b'[]')
+
+
+class FiltroFechasVentaTests(TestCase):
+	"""fecha_min/fecha_max son días completos de La Paz: [fecha_min 00:00, fecha_max + 1 00:00)."""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.admin = Usuario.objects.create_user(correo='fechas@test.com', password='x', rol='ADMIN')
+		la_paz = ZoneInfo('America/La_Paz')
+		cls.momentos = {
+			'antes_del_minimo': datetime(2024, 5, 9, 23, 59, 59, tzinfo=la_paz),
+			'inicio_del_minimo': datetime(2024, 5, 10, 0, 0, tzinfo=la_paz),
+			'fin_del_maximo': datetime(2024, 5, 12, 23, 59, 59, tzinfo=la_paz),
+			'despues_del_maximo': datetime(2024, 5, 13, 0, 0, tzinfo=la_paz),
+		}
+		cls.ventas = dict(zip(cls.momentos, Venta.objects.bulk_create([
+			Venta(fecha_venta=momento, total=1) for momento in cls.momentos.values()
+		])))
+
+	def _filtrar(self, **parametros):
+		client = APIClient()
+		client.force_authenticate(self.admin)
+		respuesta = client.get('/api/ventas/', parametros)
+		self.assertEqual(respuesta.status_code, 200, respuesta.content)
+		ids = {fila['id'] for fila in respuesta.json()['results']}
+		return {nombre for nombre, venta in self.ventas.items() if venta.id in ids}
+
+	def test_bordes_del_dia_en_hora_de_la_paz(self):
+		# 23:59:59 de La Paz ya es el día siguiente en UTC, y 00:00 aún es el día anterior
+		self.assertEqual(self._filtrar(fecha_max='2024-05-12'), {'antes_del_minimo', 'inicio_del_minimo', 'fin_del_maximo'})
+		self.assertEqual(self._filtrar(fecha_min='2024-05-10'), {'inicio_del_minimo', 'fin_del_maximo', 'despues_del_maximo'})
+		self.assertEqual(self._filtrar(fecha_min='2024-05-10', fecha_max='2024-05-12'), {'inicio_del_minimo', 'fin_del_maximo'})
+		self.assertEqual(self._filtrar(fecha_min='2024-05-13', fecha_max='2024-05-13'), {'despues_del_maximo'})
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'El particionado declarativo requiere PostgreSQL')
+class ParticionarVentasTests(TestCase):
+	"""particionar_ventas solo mantiene particiones: nunca convierte las tablas."""
+
+	def test_tablas_sin_particionar_no_se_tocan(self):
+		salida = io.StringIO()
+		call_command('particionar_ventas', stdout=salida)
+
+		self.assertIn('venta: no está particionada', salida.getvalue())
+		with connection.cursor() as cursor:
+			cursor.execute("SELECT count(*) FROM pg_partitioned_table")
+			self.assertEqual(cursor.fetchone()[0], 0)
+		with self.assertRaises(CommandError):
+			call_command('particionar_ventas', '--convertir', stdout=io.StringIO())
+
+	def test_particiones_mensuales_en_hora_de_la_paz(self):
+		with connection.cursor() as cursor:
+			cursor.execute('CREATE TABLE prueba_particiones (id int, fecha timestamptz) PARTITION BY RANGE (fecha)')
+			comando = ParticionarVentas()
+			self.assertEqual(comando._crear_particiones('prueba_particiones', date(2024, 1, 15), date(2024, 4, 1)), 3)
+			self.assertEqual(comando._crear_particiones('prueba_particiones', date(2024, 1, 1), date(2024, 4, 1)), 0)
+
+			la_paz = ZoneInfo('America/La_Paz')
+			for momento in (datetime(2024, 1, 31, 23, 59, 59, tzinfo=la_paz), datetime(2024, 2, 1, 0, 0, tzinfo=la_paz)):
+				cursor.execute('INSERT INTO prueba_particiones VALUES (1, %s)', [momento])
+			cursor.execute('SELECT tableoid::regclass::text FROM prueba_particiones ORDER BY fecha')
+			self.assertEqual([fila[0] for fila in cursor.fetchall()], ['prueba_particiones_p2024_01', 'prueba_particiones_p2024_02'])
+
+
+class VentaDiariaTests(TestCase):
+	"""El resumen que mantienen las ventas coincide con el reconstruido desde DetalleVenta."""
+	# analisis_tendencias lee de la réplica, salvo para quien acaba de escribir (este cliente)
+	databases = {'default', 'replica'}
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.usuario = Usuario.objects.create_user(correo='resumen@test.com', password='x', rol='CLIENTE')
+		cls.bebidas = Categoria.objects.create(nombre='Bebidas')
+		snacks = Categoria.objects.create(nombre='Snacks')
+		cls.agua, cls.jugo, cls.papas = Producto.objects.bulk_create([
+			Producto(codigo_producto='RES-1', nombre='Agua', precio_venta=5, stock_actual=50, categoria=cls.bebidas),
+			Producto(codigo_producto='RES-2', nombre='Jugo', precio_venta=8, stock_actual=50, categoria=cls.bebidas),
+			Producto(codigo_producto='RES-3', nombre='Papas', precio_venta=6, stock_actual=50, categoria=snacks),
+		])
+
+	def _resumen(self):
+		return set(VentaDiaria.objects.exclude(ventas=0).values_list(
+			'dia', 'producto_id', 'categoria_id', 'cliente_id', 'metodo_entrada', 'cantidad', 'monto', 'ventas'
+		))
+
+	def _igual_a_reconstruido(self):
+		incremental = self._resumen()
+		recalcular_resumen(date(2026, 1, 1), timezone.localdate())
+		self.assertEqual(incremental, self._resumen())
+
+	def test_checkout_y_carga_masiva_mantienen_el_resumen(self):
+		client = APIClient()
+		client.force_authenticate(self.usuario)
+		carrito = Carrito.objects.create(cliente=self.usuario.cliente)
+		DetalleCarrito.objects.bulk_create([
+			DetalleCarrito(carrito=carrito, producto=producto, cantidad=cantidad, precio_unitario=1, subtotal=1)
+			for producto, cantidad in ((self.agua, 2), (self.jugo, 1), (self.papas, 1))
+		])
+		respuesta = client.post('/api/carritos/crear_venta_desde_carrito/', {}, format='json')
+		self.assertEqual(respuesta.status_code, 201, respuesta.content)
+
+		registrar_ventas_lote([
+			(1, {'cliente': self.usuario.cliente.id, 'detalles': [{'producto_id': self.agua.id, 'cantidad': 3}]}),
+			# 23:30 en La Paz ya es el día siguiente en UTC: cuenta para el 15
+			(2, {'fecha_venta': '2026-01-15T23:30:00-04:00', 'detalles': [{'producto_id': self.papas.id, 'cantidad': 1}]}),
+		])
+		self._igual_a_reconstruido()
+		self.assertTrue(VentaDiaria.objects.filter(dia=date(2026, 1, 15), producto=self.papas).exists())
+
+		# Dos bebidas en la misma venta cuentan como una venta de la categoría
+		respuesta = client.get('/api/ventas/analisis-tendencias/', {'categoria_id': self.bebidas.id})
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertEqual(respuesta.json()[-1]['cantidad_ventas'], 2)
+
+		respuesta = client.get('/api/ventas/analisis-tendencias/', {'granularidad': 'dia', 'desde': '2026-01-01', 'hasta': '2026-01-31'})
+		self.assertEqual(respuesta.json(), [{'periodo': '2026-01-15', 'cantidad_ventas': 1, 'monto_total': 6.0}])
+
+		# Eliminar la venta del checkout la resta del resumen
+		Venta.objects.filter(metodo_entrada='carrito').delete()
+		self._igual_a_reconstruido()
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN en formato JSON requiere PostgreSQL')
+class PlanesConsultasCriticasTests(TestCase):
+	"""Con tablas de varios miles de filas, ninguna consulta crítica debe volver a un Seq Scan."""
+	USUARIOS = 2000
+	CLIENTES = 200
+	PRODUCTOS = 200
+	VENTAS = 6000
+	DETALLES_POR_VENTA = 3
+
+	@classmethod
+	def setUpTestData(cls):
+		usuarios = Usuario.objects.bulk_create([
+			Usuario(correo=f'plan{i}@test.com', password='!', rol='CLIENTE') for i in range(cls.USUARIOS)
+		], batch_size=1000)
+		clientes = Cliente.objects.bulk_create([Cliente(usuario=usuario) for usuario in usuarios[:cls.CLIENTES]])
+		categoria = Categoria.objects.create(nombre='Planes')
+		productos = Producto.objects.bulk_create([
+			Producto(codigo_producto=f'PLAN-{i}', nombre=f'Producto {i}', precio_venta=10, categoria=categoria)
+			for i in range(cls.PRODUCTOS)
+		])
+		ventas = Venta.objects.bulk_create([
+			Venta(cliente=clientes[i % cls.CLIENTES], total=30) for i in range(cls.VENTAS)
+		], batch_size=2000)
+		DetalleVenta.objects.bulk_create([
+			DetalleVenta(venta=venta, producto=productos[(i * cls.DETALLES_POR_VENTA + j) % cls.PRODUCTOS],
+						 cantidad=1, precio_unitario=10, subtotal=10)
+			for i, venta in enumerate(ventas) for j in range(cls.DETALLES_POR_VENTA)
+		], batch_size=2000)
+		Pago.objects.bulk_create([
+			Pago(venta=venta, monto=30, metodo_pago='stripe', stripe_payment_intent_id=f'pi_{venta.id}')
+			for venta in ventas
+		], batch_size=2000)
+		Bitacora.objects.bulk_create([
+			Bitacora(usuario=usuarios[i % cls.USUARIOS], accion='LOGIN') for i in range(cls.VENTAS)
+		], batch_size=2000)
+		Carrito.objects.bulk_create([
+			Carrito(cliente=clientes[i % cls.CLIENTES], estado=Carrito.EstadoCarrito.CONVERTIDO) for i in range(cls.VENTAS)
+		], batch_size=2000)
+
+		# Sin estadísticas el planificador no sabe que las tablas ya no son pequeñas
+		with connection.cursor() as cursor:
+			for modelo in (Usuario, Venta, DetalleVenta, Pago, Bitacora, Carrito):
+				cursor.execute(f'ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}')
+
+	def test_consultas_criticas_sin_seq_scan(self):
+		for nombre, queryset in consultas_criticas().items():
+			with self.subTest(consulta=nombre):
+				self.assertEqual(seq_scans_grandes(queryset), [], f'{nombre} recorre secuencialmente una tabla grande')
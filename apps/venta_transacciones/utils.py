@@ -0,0 +1,407 @@
+import json
+import hashlib
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from functools import wraps
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.catalogo.models import Producto, Cliente, MovimientoStock
+from apps.catalogo.utils import stock_en_franjas, descontar_franjas
+from .models import Venta, DetalleVenta, ClaveIdempotencia, EventoOutbox
+from .utils_resumen import acumular_en_resumen
+
+# Cantidad de ventas que se validan e insertan juntas en la carga masiva
+TAMANO_LOTE_VENTAS = 500
+
+
+class FilaInvalida(Exception):
+    """Error de validación de una fila de la carga masiva (no aborta el lote)."""
+
+
+def _a_entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+# --- 1. LECTURA INCREMENTAL DE NDJSON ---
+def leer_ndjson(stream):
+    """
+    Lee un cuerpo NDJSON línea por línea sin cargarlo entero en memoria.
+    Devuelve tuplas (numero_linea, dict | FilaInvalida).
+    """
+    for numero, linea in enumerate(stream, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as e:
+            yield numero, FilaInvalida(f"JSON inválido: {e}")
+            continue
+        if not isinstance(fila, dict):
+            yield numero, FilaInvalida("Cada línea debe ser un objeto JSON.")
+            continue
+        yield numero, fila
+
+
+def _normalizar_fila(fila, clientes_validos):
+    """Valida la estructura de una venta y devuelve sus datos listos para insertar."""
+    detalles = fila.get('detalles') or []
+    if not isinstance(detalles, list) or not detalles:
+        raise FilaInvalida("La venta debe tener al menos un producto.")
+
+    try:
+        pedidos = [(int(item['producto_id']), int(item['cantidad'])) for item in detalles]
+    except (KeyError, TypeError, ValueError):
+        raise FilaInvalida("Cada detalle requiere 'producto_id' y 'cantidad' enteros.")
+
+    if any(cantidad <= 0 for _, cantidad in pedidos):
+        raise FilaInvalida("Las cantidades deben ser mayores a 0.")
+
+    cliente_id = fila.get('cliente')
+    if cliente_id is not None:
+        if _a_entero(cliente_id) not in clientes_validos:
+            raise FilaInvalida(f"El cliente {cliente_id} no existe.")
+        cliente_id = _a_entero(cliente_id)
+
+    fecha_venta = timezone.now()
+    if fila.get('fecha_venta'):
+        fecha_venta = parse_datetime(str(fila['fecha_venta']))
+        if fecha_venta is None:
+            raise FilaInvalida("'fecha_venta' no tiene un formato válido.")
+        if timezone.is_naive(fecha_venta):
+            fecha_venta = timezone.make_aware(fecha_venta)
+
+    metodo_entrada = fila.get('metodo_entrada') or Venta.MetodoEntrada.MOSTRADOR
+    if metodo_entrada not in Venta.MetodoEntrada.values:
+        raise FilaInvalida(f"Método de entrada inválido: {metodo_entrada}")
+
+    tipo_venta = fila.get('tipo_venta') or Venta.TipoVenta.CONTADO
+    if tipo_venta not in Venta.TipoVenta.values:
+        raise FilaInvalida(f"Tipo de venta inválido: {tipo_venta}")
+
+    return {
+        'cliente_id': cliente_id,
+        'fecha_venta': fecha_venta,
+        'metodo_entrada': metodo_entrada,
+        'tipo_venta': tipo_venta,
+        'pedidos': pedidos,
+    }
+
+
+# --- 2. REGISTRO MASIVO DE VENTAS ---
+def registrar_ventas_lote(filas):
+    """
+    Registra un lote de ventas (tuplas (numero_linea, fila) de 'leer_ndjson').
+    Valida el stock de todo el lote a la vez y devuelve un resultado por fila;
+    una fila inválida no hace fallar al resto.
+    """
+    resultados = []
+    normalizadas = []
+
+    clientes_pedidos = {
+        _a_entero(fila.get('cliente')) for _, fila in filas
+        if isinstance(fila, dict) and fila.get('cliente') is not None
+    }
+    clientes_pedidos.discard(None)
+    clientes_validos = set(
+        Cliente.objects.filter(id__in=clientes_pedidos).values_list('id', flat=True)
+    ) if clientes_pedidos else set()
+
+    for numero, fila in filas:
+        try:
+            if isinstance(fila, FilaInvalida):
+                raise fila
+            normalizadas.append((numero, _normalizar_fila(fila, clientes_validos)))
+        except FilaInvalida as e:
+            resultados.append({'linea': numero, 'estado': 'error', 'error': str(e)})
+
+    if not normalizadas:
+        return resultados
+
+    try:
+        with transaction.atomic():
+            # Un único SELECT ... FOR UPDATE (ordenado por PK) para todo el lote
+            ids_pedidos = sorted({pid for _, datos in normalizadas for pid, _ in datos['pedidos']})
+            productos = {
+                producto.id: producto
+                for producto in Producto.objects.select_for_update().filter(id__in=ids_pedidos).order_by('id')
+            }
+            # En modo hot el stock disponible es la suma de las franjas (también bloqueadas)
+            stock_franjas = stock_en_franjas(
+                [pid for pid, producto in productos.items() if producto.stock_fraccionado], bloquear=True
+            )
+            for producto_id, total in stock_franjas.items():
+                productos[producto_id].stock_actual = total
+
+            ventas_a_crear = []
+            detalles_por_venta = []
+            aceptadas = []
+            for numero, datos in normalizadas:
+                try:
+                    cantidades = {}
+                    for producto_id, cantidad in datos['pedidos']:
+                        producto = productos.get(producto_id)
+                        if producto is None:
+                            raise FilaInvalida(f"El producto {producto_id} no existe.")
+                        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+                        if producto.stock_actual < cantidades[producto_id]:
+                            raise FilaInvalida(
+                                f"Stock insuficiente para '{producto.nombre}'. "
+                                f"Disponible: {producto.stock_actual}, Pedido: {cantidades[producto_id]}"
+                            )
+                except FilaInvalida as e:
+                    resultados.append({'linea': numero, 'estado': 'error', 'error': str(e)})
+                    continue
+
+                # La fila es válida: reservamos el stock en memoria para las siguientes
+                for producto_id, cantidad in cantidades.items():
+                    productos[producto_id].stock_actual -= cantidad
+
+                total = Decimal('0.00')
+                detalles = []
+                for producto_id, cantidad in datos['pedidos']:
+                    producto = productos[producto_id]
+                    subtotal = producto.precio_venta * cantidad
+                    total += subtotal
+                    detalles.append(DetalleVenta(
+                        producto=producto,
+                        cantidad=cantidad,
+                        precio_unitario=producto.precio_venta,
+                        subtotal=subtotal,
+                        fecha_creacion=datos['fecha_venta'],
+                    ))
+
+                ventas_a_crear.append(Venta(
+                    cliente_id=datos['cliente_id'],
+                    fecha_venta=datos['fecha_venta'],
+                    metodo_entrada=datos['metodo_entrada'],
+                    tipo_venta=datos['tipo_venta'],
+                    total=total,
+                ))
+                detalles_por_venta.append(detalles)
+                aceptadas.append(numero)
+
+            Venta.objects.bulk_create(ventas_a_crear)
+            # bulk_create no emite post_save: el historial de estos clientes se invalida aquí
+            invalidar_historial_compras(*{venta.cliente_id for venta in ventas_a_crear})
+
+            detalles_a_crear = []
+            for venta, detalles in zip(ventas_a_crear, detalles_por_venta):
+                for detalle in detalles:
+                    detalle.venta = venta
+                detalles_a_crear.extend(detalles)
+            DetalleVenta.objects.bulk_create(detalles_a_crear, batch_size=2000)
+            acumular_en_resumen(zip(ventas_a_crear, detalles_por_venta))
+
+            EventoOutbox.objects.bulk_create([
+                EventoOutbox(tipo=EventoOutbox.TipoEvento.VENTA_CREADA, datos={'venta_id': venta.id})
+                for venta in ventas_a_crear
+            ], batch_size=2000)
+
+            MovimientoStock.objects.bulk_create([
+                MovimientoStock(
+                    producto_id=detalle.producto_id, tipo=MovimientoStock.TipoMovimiento.VENTA,
+                    cantidad=-detalle.cantidad, referencia=f'venta:{detalle.venta.id}', fecha=detalle.fecha_creacion,
+                )
+                for detalle in detalles_a_crear
+            ], batch_size=2000)
+
+            Producto.objects.bulk_update(
+                [producto for producto in productos.values() if not producto.stock_fraccionado], ['stock_actual']
+            )
+            for producto_id, total in stock_franjas.items():
+                vendido = total - productos[producto_id].stock_actual
+                if vendido:
+                    descontar_franjas(producto_id, vendido)
+
+    except Exception as e:
+        # Un error de BD revierte solo este lote
+        lineas_con_error = {r['linea'] for r in resultados}
+        return resultados + [
+            {'linea': numero, 'estado': 'error', 'error': f"Error inesperado: {str(e)}"}
+            for numero, _ in normalizadas
+            if numero not in lineas_con_error
+        ]
+
+    resultados.extend(
+        {'linea': numero, 'estado': 'creada', 'venta_id': venta.id, 'total': str(venta.total)}
+        for numero, venta in zip(aceptadas, ventas_a_crear)
+    )
+    return resultados
+
+
+def procesar_carga_masiva(stream, tamano_lote=TAMANO_LOTE_VENTAS):
+    """
+    Consume un stream NDJSON por lotes de 'tamano_lote' ventas y devuelve
+    los resultados por fila ordenados por número de línea.
+    """
+    filas = leer_ndjson(stream)
+    resultados = []
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            break
+        resultados.extend(registrar_ventas_lote(lote))
+    resultados.sort(key=lambda r: r['linea'])
+    return resultados
+
+
+# --- 3. IDEMPOTENCIA (Idempotency-Key) ---
+def _clave_cache_idempotencia(endpoint, usuario_id, clave):
+    resumen = hashlib.sha256(clave.encode('utf-8')).hexdigest()
+    return f'idempotencia:{endpoint}:{usuario_id}:{resumen}'
+
+
+def _huella_solicitud(request):
+    """SHA-256 del cuerpo ya interpretado (JSON canónico): el orden de las claves y los espacios no cuentan."""
+    cuerpo = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(cuerpo.encode('utf-8')).hexdigest()
+
+
+def _respuesta_repetida(codigo_estado, datos, huella_guardada, huella):
+    # Las claves guardadas antes de registrar la huella no la tienen: se repiten como antes
+    if huella_guardada and huella_guardada != huella:
+        return Response(
+            {'error': 'Esta Idempotency-Key ya se usó con un cuerpo de solicitud distinto.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    respuesta = Response(datos, status=codigo_estado)
+    respuesta['Idempotent-Replayed'] = 'true'
+    return respuesta
+
+
+def idempotente(endpoint):
+    """
+    Decorador para acciones POST que aceptan el header 'Idempotency-Key'.
+
+    La primera respuesta exitosa (2xx) se guarda en ClaveIdempotencia y en la caché
+    durante IDEMPOTENCY_TTL segundos; los reintentos con la misma clave la repiten
+    sin volver a ejecutar la vista. Dos reintentos concurrentes se serializan en el
+    índice único de la tabla: el segundo INSERT espera a que el primero confirme.
+    Reusar la clave con otro cuerpo responde 422 en lugar de repetir la primera respuesta.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(self, request, *args, **kwargs):
+            clave = request.headers.get('Idempotency-Key')
+            if not clave:
+                return vista(self, request, *args, **kwargs)
+            if len(clave) > 255:
+                return Response({'error': 'Idempotency-Key no puede superar 255 caracteres.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            ttl = getattr(settings, 'IDEMPOTENCY_TTL', 60 * 60 * 24)
+            clave_cache = _clave_cache_idempotencia(endpoint, request.user.pk, clave)
+            # Antes de la vista: algunas vistas modifican request.data
+            huella = _huella_solicitud(request)
+
+            # Camino rápido: la respuesta ya está en caché, no tocamos la BD
+            guardada = cache.get(clave_cache)
+            if guardada is not None:
+                return _respuesta_repetida(*guardada, huella)
+
+            with transaction.atomic():
+                registro = None
+                for _ in range(2):
+                    try:
+                        with transaction.atomic():
+                            registro = ClaveIdempotencia.objects.create(
+                                clave=clave, usuario=request.user, endpoint=endpoint, huella_solicitud=huella,
+                                expira=timezone.now() + timedelta(seconds=ttl),
+                            )
+                        break
+                    except IntegrityError:
+                        existente = ClaveIdempotencia.objects.filter(
+                            usuario=request.user, endpoint=endpoint, clave=clave
+                        ).first()
+                        if existente is None:
+                            continue
+                        if existente.expira <= timezone.now():
+                            # Clave vencida: se libera y se vuelve a intentar
+                            existente.delete()
+                            continue
+                        guardada = (existente.codigo_estado, existente.respuesta, existente.huella_solicitud)
+                        cache.set(clave_cache, guardada, ttl)
+                        return _respuesta_repetida(*guardada, huella)
+
+                if registro is None:
+                    return Response({'error': 'La solicitud con esta Idempotency-Key se está procesando.'}, status=status.HTTP_409_CONFLICT)
+
+                respuesta = vista(self, request, *args, **kwargs)
+
+                if not 200 <= respuesta.status_code < 300:
+                    # Solo se recuerdan las respuestas exitosas: un error se puede reintentar
+                    transaction.set_rollback(True)
+                    return respuesta
+
+                registro.codigo_estado = respuesta.status_code
+                registro.respuesta = json.loads(json.dumps(respuesta.data, cls=DjangoJSONEncoder))
+                registro.save(update_fields=['codigo_estado', 'respuesta'])
+
+                transaction.on_commit(
+                    lambda: cache.set(clave_cache, (registro.codigo_estado, registro.respuesta, huella), ttl)
+                )
+            return respuesta
+        return envoltura
+    return decorador
+
+
+# --- 4. HISTORIAL DE COMPRAS EN CACHÉ (mis_compras) ---
+def _clave_version_historial(cliente_id):
+    return f'mis-compras:version:{cliente_id}'
+
+
+def version_historial_compras(cliente_id):
+    """Versión vigente del historial del cliente; cambia cada vez que registra una venta."""
+    clave = _clave_version_historial(cliente_id)
+    version = cache.get(clave)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(clave, version, None):
+            version = cache.get(clave) or version
+    return version
+
+
+def invalidar_historial_compras(*cliente_ids):
+    """
+    Cambia la versión del historial de esos clientes cuando la transacción confirma:
+    las páginas guardadas con la versión anterior dejan de usarse (y expiran solas).
+    """
+    ids = {cliente_id for cliente_id in cliente_ids if cliente_id is not None}
+    if ids:
+        transaction.on_commit(lambda: cache.set_many(
+            {_clave_version_historial(cliente_id): uuid.uuid4().hex for cliente_id in ids}, None
+        ))
+
+
+def historial_compras_en_cache(cliente_id, request, generar):
+    """
+    Devuelve (datos, etag) de una página del historial.
+    La entrada depende de la versión del cliente y de la URL completa (cursor, page_size, fields...);
+    'generar' solo se llama si no está en caché.
+    """
+    ttl = getattr(settings, 'HISTORIAL_COMPRAS_TTL', 60 * 10)
+    url = hashlib.sha256(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    clave = f'mis-compras:{cliente_id}:{version_historial_compras(cliente_id)}:{url}'
+
+    guardada = cache.get(clave)
+    if guardada is None:
+        datos = json.loads(json.dumps(generar(), cls=DjangoJSONEncoder))
+        contenido = json.dumps(datos, sort_keys=True, separators=(',', ':'))
+        etag = quote_etag(hashlib.sha256(contenido.encode('utf-8')).hexdigest())
+        guardada = (datos, etag)
+        cache.set(clave, guardada, ttl)
+    return guardada
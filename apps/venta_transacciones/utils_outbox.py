@@ -0,0 +1,157 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.acceso_seguridad.utils import enviar_email_brevo, enviar_notificacion
+from .models import EventoOutbox, Venta, Pago, Carrito, DetalleCarrito
+
+# Reintentos antes de marcar un evento como FALLIDO (espera de 2, 4, 8... minutos)
+MAXIMO_INTENTOS = 5
+
+# Un evento tomado queda reservado para su worker este tiempo; si el worker muere, vuelve a la cola
+TIEMPO_RESERVA = timedelta(minutes=10)
+
+# tipo de evento -> lista de manejadores
+MANEJADORES = {}
+
+
+def registrar_evento(tipo, **datos):
+    """
+    Encola un efecto secundario. Debe llamarse dentro de la transacción de la venta/pago:
+    si esa transacción se revierte, el evento desaparece con ella.
+    """
+    return EventoOutbox.objects.create(tipo=tipo, datos=datos)
+
+
+def manejador(tipo):
+    """
+    Registra una función como manejador de un tipo de evento.
+    Su nombre se guarda en 'manejadores_completados': renombrarla hace que los eventos
+    pendientes la vuelvan a ejecutar.
+    """
+    def decorador(funcion):
+        MANEJADORES.setdefault(tipo, []).append(funcion)
+        return funcion
+    return decorador
+
+
+# --- 1. PROCESAMIENTO POR LOTES ---
+def tomar_eventos(tamano_lote):
+    """
+    Reserva hasta 'tamano_lote' eventos pendientes con SELECT ... FOR UPDATE SKIP LOCKED
+    (varios workers pueden correr a la vez sin tomar los mismos) corriendo su 'disponible_desde'
+    hasta el fin de la reserva. El bloqueo dura solo hasta reservarlos: los manejadores
+    (emails, notificaciones) corren después, fuera de la transacción.
+    Devuelve (eventos, fin_de_la_reserva).
+    """
+    ahora = timezone.now()
+    reserva_hasta = ahora + TIEMPO_RESERVA
+    with transaction.atomic():
+        eventos = list(
+            EventoOutbox.objects.select_for_update(skip_locked=True)
+            .filter(estado=EventoOutbox.EstadoEvento.PENDIENTE, disponible_desde__lte=ahora)
+            .order_by('disponible_desde', 'id')[:tamano_lote]
+        )
+        EventoOutbox.objects.filter(pk__in=[evento.pk for evento in eventos]).update(disponible_desde=reserva_hasta)
+    return eventos, reserva_hasta
+
+
+def procesar_evento(evento):
+    """
+    Ejecuta los manejadores del evento que todavía no terminaron, cada uno en su transacción
+    junto con la marca de completado. Si uno falla, el evento se reprograma con espera
+    creciente y el reintento empieza por ese manejador.
+    """
+    try:
+        for funcion in MANEJADORES.get(evento.tipo, []):
+            if funcion.__name__ in evento.manejadores_completados:
+                continue
+            with transaction.atomic():
+                funcion(evento.datos)
+                evento.manejadores_completados = evento.manejadores_completados + [funcion.__name__]
+                evento.save(update_fields=['manejadores_completados'])
+    except Exception as e:
+        evento.intentos += 1
+        evento.ultimo_error = str(e)[:2000]
+        if evento.intentos >= MAXIMO_INTENTOS:
+            evento.estado = EventoOutbox.EstadoEvento.FALLIDO
+        else:
+            evento.disponible_desde = timezone.now() + timedelta(minutes=2 ** evento.intentos)
+    else:
+        evento.estado = EventoOutbox.EstadoEvento.PROCESADO
+        evento.fecha_procesado = timezone.now()
+
+    evento.save(update_fields=['estado', 'intentos', 'ultimo_error', 'disponible_desde', 'fecha_procesado'])
+
+
+def procesar_lote(tamano_lote=100):
+    """
+    Reserva un lote de eventos y ejecuta sus manejadores. Devuelve la cantidad de eventos tomados.
+    Si la reserva llega a la mitad, los eventos que faltan vuelven a la cola para otro worker.
+
+    La entrega es "al menos una vez": un manejador puede repetirse si el worker muere
+    entre ejecutarlo y guardar su marca de completado.
+    """
+    eventos, reserva_hasta = tomar_eventos(tamano_lote)
+    for posicion, evento in enumerate(eventos):
+        if timezone.now() >= reserva_hasta - TIEMPO_RESERVA / 2:
+            EventoOutbox.objects.filter(pk__in=[e.pk for e in eventos[posicion:]]).update(disponible_desde=timezone.now())
+            break
+        procesar_evento(evento)
+    return len(eventos)
+
+
+# --- 2. MANEJADORES ---
+@manejador(EventoOutbox.TipoEvento.VENTA_CREADA)
+def enviar_comprobante(datos):
+    """Envía por email el resumen de la compra al cliente (las ventas de mostrador sin cliente se omiten)."""
+    venta = Venta.objects.select_related('cliente__usuario').prefetch_related('detalles__producto') \
+                         .filter(pk=datos['venta_id']).first()
+    if venta is None or venta.cliente is None:
+        return
+
+    filas = ''.join(
+        f"<tr><td>{d.producto.nombre}</td><td>{d.cantidad}</td><td>Bs {d.subtotal}</td></tr>"
+        for d in venta.detalles.all()
+    )
+    html = (
+        f"<h2>Gracias por tu compra</h2>"
+        f"<p>Venta #{venta.id} - {timezone.localtime(venta.fecha_venta).strftime('%d/%m/%Y %H:%M')}</p>"
+        f"<table><tr><th>Producto</th><th>Cantidad</th><th>Subtotal</th></tr>{filas}</table>"
+        f"<p><strong>Total: Bs {venta.total}</strong></p>"
+    )
+    enviar_email_brevo(venta.cliente.usuario.correo, f"Comprobante de tu compra #{venta.id}", html, lanzar_error=True)
+
+
+@manejador(EventoOutbox.TipoEvento.VENTA_CREADA)
+def notificar_venta(datos):
+    venta = Venta.objects.select_related('cliente').filter(pk=datos['venta_id']).first()
+    if venta is None or venta.cliente is None:
+        return
+    enviar_notificacion(
+        asunto='¡Compra registrada!',
+        mensaje=f'Tu compra #{venta.id} por Bs {venta.total} fue registrada.',
+        usuarios=[venta.cliente.usuario_id],
+    )
+
+
+@manejador(EventoOutbox.TipoEvento.PAGO_CONFIRMADO)
+def vaciar_carrito_pagado(datos):
+    """Vacía el carrito del cliente una vez confirmado el pago (antes se hacía dentro de 'confirmar_pago')."""
+    venta = Venta.objects.filter(pk=datos['venta_id']).only('cliente_id').first()
+    if venta is None or venta.cliente_id is None:
+        return
+    DetalleCarrito.objects.filter(carrito__in=Carrito.objects.filter(cliente_id=venta.cliente_id)).delete()
+
+
+@manejador(EventoOutbox.TipoEvento.PAGO_CONFIRMADO)
+def notificar_pago(datos):
+    pago = Pago.objects.select_related('venta__cliente').filter(pk=datos['pago_id']).first()
+    if pago is None or pago.venta is None or pago.venta.cliente is None:
+        return
+    enviar_notificacion(
+        asunto='Pago confirmado',
+        mensaje=f'Recibimos tu pago de Bs {pago.monto} para la compra #{pago.venta_id}.',
+        usuarios=[pago.venta.cliente.usuario_id],
+    )
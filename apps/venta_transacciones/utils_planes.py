@@ -0,0 +1,72 @@
+import json
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from apps.acceso_seguridad.models import Usuario, Bitacora
+from .models import Venta, DetalleVenta, Carrito, Pago
+
+# Un Seq Scan sobre una tabla con más filas que esto se considera una regresión
+UMBRAL_FILAS_SEQ_SCAN = 1000
+
+
+def _primer_valor(queryset, campo, por_defecto=0):
+    valor = queryset.exclude(**{f'{campo}__isnull': True}).values_list(campo, flat=True).first()
+    return por_defecto if valor is None else valor
+
+
+def consultas_criticas():
+    """
+    Consultas frecuentes de la aplicación (nombre -> queryset), cada una con un valor
+    real de la base para sus filtros. Deben resolverse con un índice.
+    """
+    cliente_id = _primer_valor(Venta.objects.all(), 'cliente_id')
+    producto_id = _primer_valor(DetalleVenta.objects.all(), 'producto_id')
+    intent_id = _primer_valor(Pago.objects.all(), 'stripe_payment_intent_id', 'pi_inexistente')
+    usuario_id = _primer_valor(Bitacora.objects.all(), 'usuario_id')
+    carrito_cliente_id = _primer_valor(Carrito.objects.all(), 'cliente_id')
+
+    return {
+        # VentaViewSet.mis_compras: primera página del historial del cliente
+        'mis_compras': Venta.objects.filter(cliente_id=cliente_id).order_by('-fecha_venta', '-id')[:51],
+        # Serie diaria de un producto para entrenar predicciones
+        'serie_producto': DetalleVenta.objects.filter(
+            producto_id=producto_id, fecha_creacion__gte=timezone.now() - timedelta(days=365)
+        ).values('fecha_creacion', 'subtotal'),
+        # confirmar_pago / webhook de Stripe
+        'pago_por_intent': Pago.objects.filter(stripe_payment_intent_id=intent_id),
+        # ConfirmarRecuperacionView
+        'usuario_por_token': Usuario.objects.filter(
+            token_recuperacion='token-inexistente', token_expira__gt=timezone.now(), is_active=True
+        ),
+        # Actividad reciente de un usuario en la bitácora
+        'bitacora_usuario': Bitacora.objects.filter(usuario_id=usuario_id).order_by('-fecha')[:50],
+        # Carrito activo del cliente (agregar al carrito)
+        'carrito_activo': Carrito.objects.filter(cliente_id=carrito_cliente_id, estado=Carrito.EstadoCarrito.ACTIVO),
+    }
+
+
+def _nodos(plan):
+    yield plan
+    for hijo in plan.get('Plans', []):
+        yield from _nodos(hijo)
+
+
+def seq_scans_grandes(queryset, umbral=UMBRAL_FILAS_SEQ_SCAN):
+    """
+    Ejecuta EXPLAIN sobre la consulta y devuelve [(tabla, filas_de_la_tabla)] de cada
+    Seq Scan sobre una tabla con más de 'umbral' filas (según las estadísticas de PostgreSQL).
+    """
+    plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+    tablas = {nodo['Relation Name'] for nodo in _nodos(plan) if nodo['Node Type'] == 'Seq Scan'}
+    if not tablas:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r' AND relname = ANY(%s)",
+            [list(tablas)],
+        )
+        filas = dict(cursor.fetchall())
+    return sorted((tabla, filas.get(tabla, 0)) for tabla in tablas if filas.get(tabla, 0) > umbral)
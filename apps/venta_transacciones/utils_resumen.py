@@ -0,0 +1,112 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from config.cache_respuestas import invalidar_datos
+from config.fechas import ZONA_NEGOCIO, dia_de_negocio, rango_de_fechas
+from .models import DetalleVenta, VentaDiaria
+
+COLUMNAS_CLAVE = ('dia', 'producto_id', 'categoria_id', 'cliente_id', 'metodo_entrada')
+COLUMNAS_VALOR = ('cantidad', 'monto', 'ventas')
+
+# Filas por INSERT ... ON CONFLICT (y por bulk_create en la reconstrucción)
+FILAS_POR_SENTENCIA = 1000
+
+
+# --- 1. ACTUALIZACIÓN INCREMENTAL (misma transacción que la venta) ---
+def _filas_resumen(ventas_con_detalles, signo):
+    """
+    Agrega en memoria (venta, detalles) -> {clave: [cantidad, monto, ventas]} en los tres
+    niveles de VentaDiaria. Cada detalle necesita su producto con 'categoria_id' cargado.
+    """
+    filas = defaultdict(lambda: [0, Decimal('0'), 0])
+    for venta, detalles in ventas_con_detalles:
+        dia = dia_de_negocio(venta.fecha_venta)
+        claves_de_la_venta = set()
+        for detalle in detalles:
+            categoria_id = detalle.producto.categoria_id
+            for producto_id, categoria in ((detalle.producto_id, categoria_id), (None, categoria_id), (None, None)):
+                clave = (dia, producto_id, categoria, venta.cliente_id, venta.metodo_entrada)
+                fila = filas[clave]
+                fila[0] += signo * detalle.cantidad
+                fila[1] += signo * detalle.subtotal
+                claves_de_la_venta.add(clave)
+        for clave in claves_de_la_venta:
+            filas[clave][2] += signo
+    return filas
+
+
+def acumular_en_resumen(ventas_con_detalles, signo=1):
+    """
+    Suma (o resta, con signo=-1) las ventas en VentaDiaria con INSERT ... ON CONFLICT DO UPDATE.
+    Debe llamarse dentro de la transacción que crea (o elimina) las ventas.
+    """
+    filas = _filas_resumen(ventas_con_detalles, signo)
+    if not filas:
+        return
+    # Cambian las ventas: las respuestas de analítica en caché dejan de valer al confirmar
+    invalidar_datos('ventas')
+    # Orden fijo: dos transacciones que tocan las mismas filas las bloquean en el mismo orden
+    ordenadas = sorted(filas.items(), key=lambda item: tuple('' if valor is None else str(valor) for valor in item[0]))
+
+    tabla = connection.ops.quote_name(VentaDiaria._meta.db_table)
+    columnas = ', '.join(COLUMNAS_CLAVE + COLUMNAS_VALOR)
+    actualizar = ', '.join(f'{columna} = t.{columna} + EXCLUDED.{columna}' for columna in COLUMNAS_VALOR)
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(ordenadas), FILAS_POR_SENTENCIA):
+            bloque = ordenadas[inicio:inicio + FILAS_POR_SENTENCIA]
+            marcadores = ', '.join(['(' + ', '.join(['%s'] * 8) + ')'] * len(bloque))
+            cursor.execute(
+                f'INSERT INTO {tabla} AS t ({columnas}) VALUES {marcadores} '
+                f'ON CONFLICT ({", ".join(COLUMNAS_CLAVE)}) DO UPDATE SET {actualizar}',
+                [valor for clave, valores in bloque for valor in (*clave, *valores)],
+            )
+
+
+# --- 2. RECONSTRUCCIÓN DESDE LAS VENTAS ---
+def recalcular_resumen(desde, hasta):
+    """
+    Reconstruye VentaDiaria para los días [desde, hasta] (fechas de La Paz) desde DetalleVenta.
+    Devuelve la cantidad de filas creadas.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Bloquea los upserts del checkout hasta el COMMIT: ninguna venta queda fuera
+            # de la foto ni se suma dos veces
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(VentaDiaria._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE')
+        VentaDiaria.objects.filter(dia__gte=desde, dia__lte=hasta).delete()
+
+        detalles = (
+            DetalleVenta.objects.filter(**rango_de_fechas('venta__fecha_venta', desde, hasta))
+            .annotate(dia=TruncDate('venta__fecha_venta', tzinfo=ZONA_NEGOCIO))
+            .order_by()
+        )
+        niveles = (
+            ('producto_id', 'producto__categoria_id'),  # producto
+            ('producto__categoria_id',),                # categoría
+            (),                                         # total
+        )
+        nuevas = []
+        for columnas in niveles:
+            agregado = detalles.values('dia', 'venta__cliente_id', 'venta__metodo_entrada', *columnas).annotate(
+                suma_cantidad=Sum('cantidad'), suma_monto=Sum('subtotal'), total_ventas=Count('venta_id', distinct=True),
+            )
+            nuevas.extend(
+                VentaDiaria(
+                    dia=fila['dia'],
+                    producto_id=fila.get('producto_id'),
+                    categoria_id=fila.get('producto__categoria_id'),
+                    cliente_id=fila['venta__cliente_id'],
+                    metodo_entrada=fila['venta__metodo_entrada'],
+                    cantidad=fila['suma_cantidad'],
+                    monto=fila['suma_monto'],
+                    ventas=fila['total_ventas'],
+                )
+                for fila in agregado.iterator(chunk_size=FILAS_POR_SENTENCIA)
+            )
+        VentaDiaria.objects.bulk_create(nuevas, batch_size=FILAS_POR_SENTENCIA)
+        invalidar_datos('ventas')
+    return len(nuevas)
@@ -17,27 +17,78 @@ from rest_framework import viewsets, permissions, status, filters
 
 from .models import *
 from .serializers import *
+from .utils import procesar_carga_masiva, idempotente, historial_compras_en_cache
+from .utils_outbox import registrar_evento
+from .utils_resumen import acumular_en_resumen
 from apps.catalogo.models import Producto
-from django.db.models.functions import TruncMonth
-from django.db.models import Count, Sum
+from apps.catalogo.filters import BusquedaClienteFilter
+from config.pagination import VentaPaginacion, PagoPaginacion
+from config.proyecciones import ListadoProyectadoMixin, ExportacionJSONMixin
+from config.routers import en_replica
+from config.cache_respuestas import respuesta_en_cache
+from apps.catalogo.utils import descontar_stock, StockInsuficiente, CAMPOS_PRODUCTO_VENTA
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.db.models import Count, Sum, Prefetch
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 
+# ?granularidad= de analisis_tendencias -> (truncado de VentaDiaria.dia, formato del periodo)
+GRANULARIDADES_TENDENCIA = {
+    'dia': (TruncDay, '%Y-%m-%d'),
+    'semana': (TruncWeek, '%Y-%m-%d'),  # lunes de la semana
+    'mes': (TruncMonth, '%Y-%m'),
+}
+
 # ViewSet para Venta
-class VentaViewSet(viewsets.ModelViewSet):
+class VentaViewSet(ListadoProyectadoMixin, ExportacionJSONMixin, viewsets.ModelViewSet):
     queryset = Venta.objects.select_related('cliente__usuario').prefetch_related('detalles__producto').all().order_by('-fecha_venta')
     permission_classes = [permissions.IsAuthenticated] 
+    pagination_class = VentaPaginacion
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaClienteFilter, filters.OrderingFilter]
     filterset_class = VentaFilter
-    search_fields = ['cliente__usuario__nombre', 'cliente__usuario__apellido', 'cliente__usuario__correo']
+    # ?search= por datos del cliente: ventas de los clientes más parecidos (máximo busqueda_limite)
+    busqueda_campo_cliente = 'cliente'
     ordering_fields = ['fecha_venta', 'total']
 
     def get_serializer_class(self):
-        if self.action == 'list' or self.action == 'retrieve' or self.action == 'mis_compras':
+        if self.action in ('list', 'retrieve', 'mis_compras', 'exportar'):
             return VentaReadSerializer
         return VentaSerializer
 
+    # Campo del serializador de lectura -> columna de Venta (para .only())
+    COLUMNAS_POR_CAMPO = {
+        'id': 'id', 'cliente': 'cliente', 'fecha_venta': 'fecha_venta', 'total': 'total',
+        'total_venta': 'total', 'metodo_entrada': 'metodo_entrada', 'metodo_pago': 'metodo_entrada',
+        'tipo_venta': 'tipo_venta',
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve', 'mis_compras', 'exportar'):
+            # El comprobante y las escrituras usan cliente__usuario y detalles completos
+            return queryset
+
+        # Solo se cargan las relaciones que la respuesta va a mostrar (?fields= / ?expand=)
+        campos, expandir = leer_campos_solicitados(self.request)
+        queryset = Venta.objects.all().order_by('-fecha_venta')
+
+        if campos is None or 'detalles' in campos or 'detalles' in expandir:
+            queryset = queryset.prefetch_related(
+                Prefetch('detalles', queryset=DetalleVenta.objects.select_related('producto'))
+            )
+        if 'cliente' in expandir:
+            queryset = queryset.select_related('cliente__usuario')
+
+        if campos is not None and 'cliente' not in expandir:
+            # id, fecha y total siempre: el cursor y el ?ordering= los leen de cada fila
+            columnas = {'id', 'fecha_venta', 'total'}
+            columnas.update(self.COLUMNAS_POR_CAMPO[c] for c in campos if c in self.COLUMNAS_POR_CAMPO)
+            queryset = queryset.only(*columnas)
+        return queryset
+
     @action(detail=True, methods=['get'], url_path='comprobante')
     def generar_comprobante(self, request, pk=None):
         """
@@ -102,58 +153,88 @@ class VentaViewSet(viewsets.ModelViewSet):
             return Response({'error': f'Error al generar PDF: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['get'], url_path='analisis-tendencias')
+    @respuesta_en_cache('ventas')
+    @en_replica
     def analisis_tendencias(self, request):
         """
-        Devuelve el historial de ventas (Monto y Cantidad)
-        agrupado por mes, CON FILTROS dinámicos.
+        Devuelve el historial de ventas (Monto y Cantidad) por día, semana o mes
+        (?granularidad=, por defecto mes) entre ?desde= y ?hasta= (AAAA-MM-DD,
+        por defecto los últimos 12 meses), CON FILTROS dinámicos.
+        Se lee del resumen VentaDiaria, no de cada línea de venta: una sola consulta
+        sin JOIN, y los montos son la suma de las líneas que cumplen el filtro.
         """
+        granularidad = request.query_params.get('granularidad', 'mes')
+        if granularidad not in GRANULARIDADES_TENDENCIA:
+            return Response(
+                {'error': f"granularidad debe ser una de: {', '.join(GRANULARIDADES_TENDENCIA)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        truncar, formato = GRANULARIDADES_TENDENCIA[granularidad]
+
+        # 1. Definir el rango de fechas (días de La Paz)
+        texto_desde = request.query_params.get('desde')
+        texto_hasta = request.query_params.get('hasta')
+        try:
+            hasta = parse_date(texto_hasta) if texto_hasta else timezone.localdate()
+            desde = parse_date(texto_desde) if texto_desde else (hasta and hasta - timedelta(days=365))
+        except ValueError:
+            desde = hasta = None
+        if desde is None or hasta is None:
+            return Response({'error': 'desde y hasta deben tener el formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if desde > hasta:
+            return Response({'error': 'desde no puede ser posterior a hasta.'}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            # 1. Definir el rango de fechas (últimos 12 meses)
-            hace_un_ano = timezone.now() - timedelta(days=365)
-            
             # 2. Obtener filtros opcionales del query string
             cliente_id = request.query_params.get('cliente_id', None)
             producto_id = request.query_params.get('producto_id', None)
             categoria_id = request.query_params.get('categoria_id', None)
 
             # 3. Construir la Consulta Base
-            query = Venta.objects.filter(fecha_venta__gte=hace_un_ano)
+            query = VentaDiaria.objects.filter(dia__gte=desde, dia__lte=hasta)
 
             # 4. Aplicar filtros dinámicos
             if cliente_id:
                 query = query.filter(cliente_id=cliente_id)
             
+            # Cada filtro elige su nivel del resumen, así 'ventas' cuenta ventas distintas.
             # Si se filtra por producto, la categoría se ignora
             if producto_id:
-                query = query.filter(detalles__producto_id=producto_id)
+                query = query.filter(producto_id=producto_id)
             elif categoria_id:
-                # Si no hay producto, filtramos por categoría
-                query = query.filter(detalles__producto__categoria_id=categoria_id)
+                query = query.filter(producto__isnull=True, categoria_id=categoria_id)
+            else:
+                query = query.filter(producto__isnull=True, categoria__isnull=True)
 
-            # 5. Anotar, agrupar y ordenar
-            tendencias = query.annotate(mes=TruncMonth('fecha_venta')) \
-                                .values('mes') \
+            # 5. Agrupar por periodo y ordenar
+            tendencias = query.annotate(periodo=truncar('dia')) \
+                                .values('periodo') \
                                 .annotate(
-                                    cantidad_ventas=Count('id', distinct=True), # Contar ventas únicas
-                                    monto_total=Sum('total')
+                                    cantidad_ventas=Sum('ventas'),
+                                    monto_total=Sum('monto')
                                 ) \
-                                .order_by('mes')
+                                .order_by('periodo')
             
-            # 6. Formatear la salida
-            data_formateada = [
-                {
-                    "mes": item['mes'].strftime('%Y-%m'),
+            # 6. Formatear la salida ('mes' se mantiene para los clientes existentes)
+            data_formateada = []
+            for item in tendencias:
+                if item['monto_total'] is None:
+                    continue
+                fila = {
+                    "periodo": item['periodo'].strftime(formato),
                     "cantidad_ventas": item['cantidad_ventas'],
                     "monto_total": item['monto_total']
                 }
-                for item in tendencias if item['monto_total'] is not None
-            ]
+                if granularidad == 'mes':
+                    fila["mes"] = fila["periodo"]
+                data_formateada.append(fila)
             
             return Response(data_formateada, status=status.HTTP_200_OK)
             
         except Exception as e:
             return Response({'error': f'Error al generar tendencias: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @idempotente('ventas')
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         
@@ -162,26 +243,31 @@ class VentaViewSet(viewsets.ModelViewSet):
             return Response({"error": "La venta debe tener al menos un producto."}, status=status.HTTP_400_BAD_REQUEST)
 
         total_calculado = 0
-        productos_a_actualizar = []
         detalles_a_crear = []
 
         try:
-            for item in detalles_data:
-                producto = Producto.objects.select_for_update().get(id=item['producto_id'])
-                cantidad_pedida = int(item['cantidad'])
+            pedidos = [(int(item['producto_id']), int(item['cantidad'])) for item in detalles_data]
 
+            cantidades = {}
+            for producto_id, cantidad_pedida in pedidos:
                 if cantidad_pedida <= 0:
-                    raise ValidationError(f"La cantidad para {producto.nombre} debe ser mayor a 0.")
-                
-                if producto.stock_actual < cantidad_pedida:
-                    raise ValidationError(f"Stock insuficiente para '{producto.nombre}'. Disponible: {producto.stock_actual}, Pedido: {cantidad_pedida}")
+                    raise ValidationError(f"La cantidad para el producto {producto_id} debe ser mayor a 0.")
+                cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad_pedida
 
-                producto.stock_actual -= cantidad_pedida
-                productos_a_actualizar.append(producto)
+            # Validamos la cabecera antes de escribir nada
+            venta_serializer = VentaSerializer(data=request.data)
+            venta_serializer.is_valid(raise_exception=True)
+
+            # Precios vigentes (lectura simple, sin bloquear filas)
+            productos = Producto.objects.filter(id__in=cantidades.keys()).only(*CAMPOS_PRODUCTO_VENTA).in_bulk()
+            if len(productos) != len(cantidades):
+                raise Producto.DoesNotExist
 
+            for producto_id, cantidad_pedida in pedidos:
+                producto = productos[producto_id]
                 subtotal = producto.precio_venta * cantidad_pedida
                 total_calculado += subtotal
-                
+
                 detalles_a_crear.append(
                     DetalleVenta(
                         producto=producto, 
@@ -191,8 +277,6 @@ class VentaViewSet(viewsets.ModelViewSet):
                     )
                 )
 
-            venta_serializer = VentaSerializer(data=request.data)
-            venta_serializer.is_valid(raise_exception=True)
             # Guardamos la venta con el total calculado
             venta = venta_serializer.save(total=total_calculado)
 
@@ -200,22 +284,58 @@ class VentaViewSet(viewsets.ModelViewSet):
                 detalle.venta = venta
             
             DetalleVenta.objects.bulk_create(detalles_a_crear)
-            
-            Producto.objects.bulk_update(productos_a_actualizar, ['stock_actual'])
+            acumular_en_resumen([(venta, detalles_a_crear)])
+
+            # El descuento condicional va al final: las filas de Producto quedan
+            # bloqueadas solo desde este UPDATE hasta el COMMIT
+            fraccionados = {pid for pid, producto in productos.items() if producto.stock_fraccionado}
+            descontar_stock(cantidades, referencia=f'venta:{venta.id}', fraccionados=fraccionados)
 
+            # Comprobante, notificaciones, etc. se procesan después del COMMIT (procesar_outbox)
+            registrar_evento(EventoOutbox.TipoEvento.VENTA_CREADA, venta_id=venta.id)
+
+            # Evitamos recargar los detalles desde la BD para la respuesta
+            venta._prefetched_objects_cache = {'detalles': detalles_a_crear}
             read_serializer = VentaReadSerializer(venta)
             return Response(read_serializer.data, status=status.HTTP_201_CREATED)
 
         except Producto.DoesNotExist:
             return Response({"error": "Uno de los productos no existe."}, status=status.HTTP_404_NOT_FOUND)
+        except StockInsuficiente as e:
+            # Se revierte la venta y sus detalles ya insertados
+            transaction.set_rollback(True)
+            return Response([str(e)], status=status.HTTP_400_BAD_REQUEST)
         except ValidationError as e:
             return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
+            # No dejamos que se confirme una venta a medias
+            transaction.set_rollback(True)
             return Response({"error": f"Error inesperado: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def carga_masiva(self, request):
+        """
+        Carga masiva de ventas de mostrador (terminales offline).
+        Recibe un cuerpo NDJSON (una venta con sus 'detalles' por línea), lo procesa
+        por lotes sin cargarlo entero en memoria y devuelve un resultado por línea.
+        """
+        # Leemos el stream crudo de Django: no tocamos request.data para no parsear todo el cuerpo
+        resultados = procesar_carga_masiva(request._request)
+
+        creadas = sum(1 for r in resultados if r['estado'] == 'creada')
+        return Response({
+            'creadas': creadas,
+            'errores': len(resultados) - creadas,
+            'resultados': resultados,
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
     def mis_compras(self, request):
-        """Obtiene el historial de compras del cliente autenticado"""
+        """
+        Obtiene el historial de compras del cliente autenticado (paginado por cursor).
+        Cada página se guarda en caché por cliente y se envía con ETag: si el cliente
+        manda If-None-Match y no registró ventas nuevas, responde 304 sin consultar la BD.
+        """
         user = request.user
         
         if not hasattr(user, 'cliente'):
@@ -223,28 +343,23 @@ class VentaViewSet(viewsets.ModelViewSet):
                 {'detail': 'El usuario no tiene un perfil de cliente asociado.'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Obtener ventas del cliente con sus detalles
-        ventas = Venta.objects.filter(
-            cliente=user.cliente
-        ).select_related(
-            'cliente__usuario'
-        ).prefetch_related(
-            'detalles__producto'
-        ).order_by('-fecha_venta')
-        
-        print(f"🔍 Ventas encontradas: {ventas.count()}")
-        for venta in ventas:
-            print(f"📦 Venta {venta.id}: {venta.detalles.count()} detalles")
-        
-        # Serializar las ventas
-        serializer = self.get_serializer(ventas, many=True)
-        print(f"📋 Datos serializados: {serializer.data}")
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        cliente_id = user.cliente.id
+
+        def generar_pagina():
+            # Mismo queryset y proyección que el listado (?fields= / ?expand=), filtrado al cliente
+            return self.respuesta_proyectada(self.get_queryset().filter(cliente_id=cliente_id)).data
+
+        datos, etag = historial_compras_en_cache(cliente_id, request, generar_pagina)
+
+        cabeceras = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        etags_cliente = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags_cliente or '*' in etags_cliente:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+        return Response(datos, status=status.HTTP_200_OK, headers=cabeceras)
 
 
 # --- ViewSet para DetalleVenta (Solo Lectura) ---
-class DetalleVentaViewSet(viewsets.ReadOnlyModelViewSet):
+class DetalleVentaViewSet(ListadoProyectadoMixin, viewsets.ReadOnlyModelViewSet):
     # --- Tomado de 'Incoming' (versión mía) ---
     queryset = DetalleVenta.objects.all().order_by('id')
     serializer_class = DetalleVentaSerializer
@@ -265,7 +380,7 @@ class CarritoViewSet(viewsets.ModelViewSet):
             return Carrito.objects.filter(cliente=user.cliente).select_related(
                 'cliente', 'cliente__usuario'
             ).prefetch_related(
-                'detalles__producto'
+                'detalles__producto__categoria'
             ).order_by('id')
         return Carrito.objects.none()
     
@@ -300,9 +415,13 @@ class CarritoViewSet(viewsets.ModelViewSet):
         )
     
     @action(detail=False, methods=['post'])
+    @idempotente('carrito-checkout')
     @transaction.atomic
     def crear_venta_desde_carrito(self, request):
-        """Crea una venta a partir del carrito actual del usuario"""
+        """
+        Crea una venta a partir del carrito actual del usuario.
+        Hace el mismo número de consultas sin importar cuántos productos tenga el carrito.
+        """
         user = request.user
 
         if not hasattr(user, 'cliente'):
@@ -317,42 +436,74 @@ class CarritoViewSet(viewsets.ModelViewSet):
         if not carrito:
             return Response({"detail": "No hay carrito disponible"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Verificar que el carrito tenga productos
-        detalles_carrito = DetalleCarrito.objects.filter(carrito=carrito)
+        # 1. Líneas del carrito con su producto en una sola consulta
+        lineas = list(
+            DetalleCarrito.objects.filter(carrito=carrito)
+            .select_related('producto')
+            .only('id', 'cantidad', 'producto_id', *(f'producto__{campo}' for campo in CAMPOS_PRODUCTO_VENTA))
+        )
         
-        if not detalles_carrito.exists():
+        if not lineas:
             return Response({"detail": "El carrito está vacío"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Calcular el total desde los detalles del carrito
-        total_calculado = sum(detalle.subtotal for detalle in detalles_carrito)
-        
-        # Crear la venta
+
+        # 2. Revalidamos en memoria con el precio y stock vigentes del producto
+        cantidades = {}
+        productos = {}
+        for linea in lineas:
+            cantidades[linea.producto_id] = cantidades.get(linea.producto_id, 0) + linea.cantidad
+            productos[linea.producto_id] = linea.producto
+
+        for producto_id, cantidad in cantidades.items():
+            producto = productos[producto_id]
+            # En modo hot 'stock_actual' es solo un reflejo: decide el descuento en franjas
+            if not producto.stock_fraccionado and producto.stock_actual < cantidad:
+                return Response(
+                    {"detail": f"Stock insuficiente para '{producto.nombre}'. Disponible: {producto.stock_actual}, Pedido: {cantidad}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        ahora = timezone.now()
+        detalles = [
+            DetalleVenta(
+                producto=linea.producto,
+                cantidad=linea.cantidad,
+                precio_unitario=linea.producto.precio_venta,
+                subtotal=linea.producto.precio_venta * linea.cantidad,
+                fecha_creacion=ahora,
+            )
+            for linea in lineas
+        ]
+
+        # 3. Venta y detalles (un INSERT cada uno)
         venta = Venta.objects.create(
             cliente=user.cliente,
-            total=total_calculado,
+            fecha_venta=ahora,
+            total=sum(detalle.subtotal for detalle in detalles),
             metodo_entrada='carrito',
             tipo_venta='online'
         )
+        for detalle in detalles:
+            detalle.venta = venta
+        DetalleVenta.objects.bulk_create(detalles)
+        acumular_en_resumen([(venta, detalles)])
+
+        # 4. Descuento de stock en una sola sentencia (la verificación de arriba puede haber quedado vieja)
+        try:
+            fraccionados = {pid for pid, producto in productos.items() if producto.stock_fraccionado}
+            descontar_stock(cantidades, referencia=f'venta:{venta.id}', fraccionados=fraccionados)
+        except (StockInsuficiente, Producto.DoesNotExist) as e:
+            transaction.set_rollback(True)
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        registrar_evento(EventoOutbox.TipoEvento.VENTA_CREADA, venta_id=venta.id)
         
-        # Crear los detalles de la venta desde el carrito
-        for detalle_carrito in detalles_carrito:
-            DetalleVenta.objects.create(
-                venta=venta,
-                producto=detalle_carrito.producto,
-                cantidad=detalle_carrito.cantidad,
-                precio_unitario=detalle_carrito.precio_unitario,
-                subtotal=detalle_carrito.subtotal
-            )
-        
-        # Recargar la venta con sus detalles y productos relacionados
-        venta = Venta.objects.prefetch_related('detalles__producto').get(id=venta.id)
-        
-        # Vaciar el carrito después de crear la venta
-        detalles_carrito.delete()
+        # 5. Vaciar el carrito después de crear la venta
+        DetalleCarrito.objects.filter(carrito=carrito).delete()
         carrito.estado = 'Convertido'
-        carrito.save()
+        carrito.save(update_fields=['estado', 'fecha_actualizacion'])
         
-        # Serializar la venta con VentaReadSerializer para incluir todos los detalles
+        # Serializamos sin recargar: los detalles ya tienen su producto
+        venta._prefetched_objects_cache = {'detalles': detalles}
         serializer = VentaReadSerializer(venta)
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -388,7 +539,7 @@ class DetalleCarritoViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if hasattr(user, 'cliente'):
             # CORREGIDO: 'carrito__cliente'
-            return DetalleCarrito.objects.filter(carrito__cliente=user.cliente).order_by('id')
+            return DetalleCarrito.objects.filter(carrito__cliente=user.cliente).select_related('producto__categoria').order_by('id')
         return DetalleCarrito.objects.none()
     
     def perform_create(self, serializer):
@@ -489,6 +640,7 @@ class PagoViewSet(viewsets.ModelViewSet):
     queryset = Pago.objects.all()
     serializer_class = PagoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PagoPaginacion
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -559,18 +711,13 @@ class PagoViewSet(viewsets.ModelViewSet):
             if not pago:
                 return Response({'error': 'Pago no encontrado'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Actualizar el estado del pago
-            pago.estado = 'completado'
-            pago.save()
-            
-            # Vaciar el carrito del cliente
+            # Actualizar el estado del pago y encolar lo demás (vaciar el carrito, notificar)
+            # en la misma transacción: la respuesta no espera a esos efectos secundarios
             venta = pago.venta
-            if hasattr(venta, 'cliente'):
-                carrito = Carrito.objects.filter(cliente=venta.cliente).first()
-                if carrito:
-                    DetalleCarrito.objects.filter(carrito=carrito).delete()
-                    carrito.total = 0
-                    carrito.save()
+            with transaction.atomic():
+                pago.estado = 'completado'
+                pago.save()
+                registrar_evento(EventoOutbox.TipoEvento.PAGO_CONFIRMADO, pago_id=pago.id, venta_id=venta.id)
 
             return Response({
                 'message': 'Pago confirmado exitosamente',
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+# Las claves llevan la versión de los datos: el TTL solo acota cuánto ocupa una entrada vieja
+TTL_RESPUESTAS = getattr(settings, 'RESPUESTAS_ANALITICA_TTL', 60 * 10)
+
+# Segundos que una petición espera a que otra termine de calcular la misma respuesta
+ESPERA_CALCULO = 10
+INTERVALO_ESPERA = 0.05
+
+
+# --- 1. VERSIONES DE LOS DATOS ---
+def _clave_version(nombre):
+    return f'version-datos:{nombre}'
+
+
+def version_datos(nombre):
+    """Versión vigente de un conjunto de datos ('ventas', 'predicciones')."""
+    clave = _clave_version(nombre)
+    version = cache.get(clave)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(clave, version, None):
+            version = cache.get(clave) or version
+    return version
+
+
+def invalidar_datos(*nombres):
+    """
+    Cambia la versión de esos datos cuando la transacción confirma: las respuestas
+    guardadas con la versión anterior dejan de usarse (y expiran solas). La versión está
+    en la caché compartida (settings.CACHES), así que el cambio vale para todos los procesos.
+    """
+    transaction.on_commit(lambda: cache.set_many({_clave_version(nombre): uuid.uuid4().hex for nombre in nombres}, None))
+
+
+# --- 2. RESPUESTAS EN CACHÉ ---
+def _parametros_normalizados(query_params):
+    """?b=2&a=1&a=0&c= y ?a=0&a=1&b=2 dan la misma clave."""
+    return sorted(
+        (clave, sorted(valor for valor in query_params.getlist(clave) if valor))
+        for clave in query_params
+        if any(query_params.getlist(clave))
+    )
+
+
+def _esperar_calculo(clave, clave_calculo):
+    """Espera a que quien está calculando guarde la respuesta; None si terminó sin guardarla."""
+    limite = time.monotonic() + ESPERA_CALCULO
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        datos = cache.get(clave)
+        if datos is not None:
+            return datos
+        if cache.get(clave_calculo) is None:
+            return None
+    return None
+
+
+def respuesta_en_cache(*versiones):
+    """
+    Decorador para acciones GET que devuelven lo mismo a todos los usuarios (analítica).
+    La clave es la ruta, los parámetros normalizados y la versión de cada conjunto de datos
+    en 'versiones'. Si varias peticiones fallan a la vez, solo una calcula: las demás esperan
+    su resultado. Vale entre workers porque la marca de "calculando" se toma con cache.add
+    sobre la caché compartida. Se guardan solo las respuestas 200 (los datos, no el render).
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            partes = [request.path, _parametros_normalizados(request.query_params), [version_datos(v) for v in versiones]]
+            huella = hashlib.sha256(json.dumps(partes, separators=(',', ':')).encode('utf-8')).hexdigest()
+            clave = f'respuesta:{huella}'
+            clave_calculo = f'{clave}:calculando'
+
+            datos = cache.get(clave)
+            calculando = False
+            if datos is None:
+                calculando = cache.add(clave_calculo, True, ESPERA_CALCULO)
+                if not calculando:
+                    datos = _esperar_calculo(clave, clave_calculo)
+            if datos is not None:
+                return Response(datos, status=status.HTTP_200_OK)
+
+            # Sin caché, o quien calculaba falló: se calcula aquí
+            try:
+                respuesta = metodo(self, request, *args, **kwargs)
+                if respuesta.status_code == status.HTTP_200_OK:
+                    cache.set(clave, respuesta.data, TTL_RESPUESTAS)
+                return respuesta
+            finally:
+                if calculando:
+                    cache.delete(clave_calculo)
+        return envoltura
+    return decorador
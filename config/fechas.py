@@ -0,0 +1,36 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+# Zona del negocio: un "día" de ventas empieza a las 00:00 de La Paz
+ZONA_NEGOCIO = ZoneInfo(getattr(settings, 'ZONA_HORARIA_NEGOCIO', 'America/La_Paz'))
+
+
+def inicio_del_dia(fecha):
+    """00:00 de 'fecha' en la zona del negocio, como datetime con zona horaria."""
+    return datetime.combine(fecha, time.min, tzinfo=ZONA_NEGOCIO)
+
+
+def dia_de_negocio(momento):
+    """Fecha de La Paz a la que pertenece un datetime (con zona horaria)."""
+    return timezone.localtime(momento, ZONA_NEGOCIO).date()
+
+
+def inicio_del_mes(fecha):
+    return inicio_del_dia(fecha.replace(day=1))
+
+
+def rango_de_fechas(campo, desde=None, hasta=None):
+    """
+    Filtro semiabierto [desde 00:00, hasta+1 00:00) sobre un DateTimeField.
+    A diferencia de 'campo__date__range', no envuelve la columna en un cast, así que
+    usa el índice (y la poda de particiones) sobre 'campo'.
+    """
+    filtro = {}
+    if desde:
+        filtro[f'{campo}__gte'] = inicio_del_dia(desde)
+    if hasta:
+        filtro[f'{campo}__lt'] = inicio_del_dia(hasta + timedelta(days=1))
+    return filtro
@@ -0,0 +1,23 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from .routers import marcar_escritura
+
+
+class LecturaPropiasEscriturasMiddleware:
+    """
+    Tras una escritura exitosa (POST/PUT/PATCH/DELETE) marca al usuario para que sus
+    próximas lecturas, durante unos segundos, vayan a la primaria y no a la réplica.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and not getattr(request, 'solo_lectura', False)):
+            # DRF deja en la request de Django el usuario autenticado por token
+            usuario = getattr(request, 'user', None)
+            if usuario is not None and usuario.is_authenticated:
+                marcar_escritura(usuario)
+        return response
@@ -0,0 +1,129 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class PaginacionCursor(CursorPagination):
+    """
+    Paginación por keyset sobre (campo_de_orden, id).
+
+    El cursor opaco guarda el valor del campo y el id de la última fila, y la
+    siguiente página se pide con "campo <= valor AND (campo < valor OR id < ultimo_id)":
+    un rango sobre el índice (campo, id), con el mismo costo en la página 1 o en la 1000.
+    Si la vista tiene OrderingFilter (?ordering=total) se respeta, agregando el id como desempate.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-id',)
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        campo = ordering[0]
+        desempate = '-id' if campo.startswith('-') else 'id'
+        if campo.lstrip('-') in ('id', 'pk'):
+            return (campo,)
+        return (campo, desempate)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self._filtro_posicion(current_position, reverse))
+            except (ValidationError, ValueError):
+                # Cursor manipulado con un valor que no corresponde al tipo del campo
+                raise NotFound(self.invalid_cursor_message)
+
+        # Como (campo, id) es único el offset siempre es 0; se conserva por compatibilidad con DRF
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _filtro_posicion(self, posicion, reverse):
+        """Traduce la posición 'valor|id' del cursor a la condición de keyset."""
+        campo = self.ordering[0]
+        descendente = campo.startswith('-') != reverse
+        operador = 'lt' if descendente else 'gt'
+        nombre = campo.lstrip('-')
+
+        if len(self.ordering) == 1:
+            return Q(**{f'{nombre}__{operador}': posicion})
+
+        valor, separador, ultimo_id = posicion.rpartition('|')
+        if not separador or not ultimo_id.isdigit():
+            raise NotFound(self.invalid_cursor_message)
+
+        # El "<=" acota el rango del índice; el OR solo desempata dentro del mismo valor
+        return Q(**{f'{nombre}__{operador}e': valor}) & (
+            Q(**{f'{nombre}__{operador}': valor}) | Q(**{f'id__{operador}': int(ultimo_id)})
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        posicion = super()._get_position_from_instance(instance, ordering)
+        if len(ordering) == 1:
+            return posicion
+        ultimo_id = instance['id'] if isinstance(instance, dict) else instance.pk
+        return f'{posicion}|{ultimo_id}'
+
+
+class VentaPaginacion(PaginacionCursor):
+    ordering = ('-fecha_venta', '-id')
+
+
+class BitacoraPaginacion(PaginacionCursor):
+    ordering = ('-fecha', '-id')
+
+
+class IngresoInventarioPaginacion(PaginacionCursor):
+    ordering = ('-fecha_ingreso', '-id')
+
+
+class PagoPaginacion(PaginacionCursor):
+    ordering = ('-fecha_creacion', '-id')
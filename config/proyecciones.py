@@ -0,0 +1,209 @@
+from itertools import islice
+
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.fields import empty
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .renderers import respuesta_json_streaming, FILAS_POR_BLOQUE
+
+# Marca de "el campo no va en la respuesta" (equivale al SkipField de DRF)
+_OMITIR = object()
+
+
+def _convertidor(campo):
+    """
+    Función que convierte el valor de la BD al de la respuesta, elegida una sola vez por campo.
+    Los tipos simples usan el builtin equivalente a su to_representation; el resto
+    (Decimal, fechas, choices...) usa el to_representation del propio campo.
+    """
+    metodo = type(campo).to_representation
+    if metodo is serializers.CharField.to_representation:
+        return str
+    if metodo is serializers.IntegerField.to_representation:
+        return int
+    if metodo is serializers.BooleanField.to_representation:
+        return bool
+    if isinstance(campo, serializers.PrimaryKeyRelatedField) and campo.pk_field is None:
+        return None  # .values() ya devuelve el id
+    return campo.to_representation
+
+
+def _valor_si_padre_nulo(campo):
+    """Lo que DRF devuelve para source='a.b' cuando 'a' es NULL."""
+    if campo.default is not empty:
+        return campo.get_default()
+    if campo.allow_null:
+        return None
+    return _OMITIR
+
+
+class Proyeccion:
+    """
+    Modo de solo lectura de un ModelSerializer: arma las filas directamente desde
+    .values(), sin instanciar modelos ni recorrer los campos de DRF por cada fila.
+
+    Los accesores se precalculan una vez a partir de los campos del serializador
+    (respetando ?fields= / ?expand=), así que el JSON es idéntico al de serializer.data.
+    - Los anidados simples (FK) se leen con JOIN en la misma consulta.
+    - Los anidados many=True (FK inversa) se cargan con una consulta por lote.
+    - Los SerializerMethodField reciben el dict de la fila en lugar de la instancia, así que
+      el serializador debe nombrarlos en 'metodos_proyectables' (solo pueden leer fila['columna']);
+      un método no declarado hace fallar la construcción en lugar de romper en la primera fila.
+      Las columnas que lean y no sean campos del serializador van en 'columnas_proyeccion'.
+    - Si el serializador redefine to_representation debe ofrecer 'ajustar_proyeccion(fila, datos)'
+      y, si necesita columnas extra, 'columnas_proyeccion'.
+    """
+
+    def __init__(self, serializer, prefijo=''):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        modelo = serializer.Meta.model
+        self.columnas = []
+        self.accesores = []
+        self.relaciones = []
+        self._lote = {}
+
+        sobrescribe = type(serializer).to_representation is not serializers.Serializer.to_representation
+        self.ajustar = getattr(serializer, 'ajustar_proyeccion', None)
+        if sobrescribe and self.ajustar is None:
+            raise ValueError(f"{type(serializer).__name__} redefine to_representation y no define ajustar_proyeccion.")
+
+        for nombre, campo in serializer.fields.items():
+            if campo.write_only:
+                continue
+            self.accesores.append((nombre, self._accesor(modelo, campo, prefijo)))
+
+        self.columnas.extend(prefijo + columna for columna in getattr(serializer, 'columnas_proyeccion', ()))
+        self.columnas = list(dict.fromkeys(self.columnas))
+
+    def _accesor(self, modelo, campo, prefijo):
+        if isinstance(campo, serializers.SerializerMethodField):
+            serializer = campo.parent
+            if campo.method_name not in getattr(serializer, 'metodos_proyectables', ()):
+                raise ValueError(
+                    f"{type(serializer).__name__}.{campo.method_name} recibiría la fila de .values() y no la "
+                    f"instancia: declárelo en 'metodos_proyectables' si solo lee fila['columna']."
+                )
+            return getattr(serializer, campo.method_name)
+
+        if campo.source == '*' or isinstance(campo, serializers.ManyRelatedField) or (
+            isinstance(campo, serializers.RelatedField) and not isinstance(campo, serializers.PrimaryKeyRelatedField)
+        ):
+            raise ValueError(f"El campo '{campo.field_name}' no se puede proyectar desde .values().")
+
+        ruta = prefijo + campo.source.replace('.', '__')
+
+        # Anidado many=True: FK inversa, se carga aparte por lote de filas
+        if isinstance(campo, serializers.ListSerializer):
+            if prefijo:
+                raise ValueError(f"El anidado '{campo.field_name}' solo se admite en el primer nivel.")
+            relacion = modelo._meta.get_field(campo.source)
+            hija = Proyeccion(campo.child)
+            columna_pk = modelo._meta.pk.attname
+            self.columnas.append(columna_pk)
+            self.relaciones.append((campo.field_name, relacion, columna_pk, hija))
+            lote = self._lote
+            nombre = campo.field_name
+            return lambda fila: lote[nombre].get(fila[columna_pk], [])
+
+        # Anidado simple: sus columnas viajan en la misma fila con el prefijo 'fk__'
+        if isinstance(campo, serializers.BaseSerializer):
+            hija = Proyeccion(campo, prefijo=ruta + '__')
+            self.columnas.append(ruta)
+            self.columnas.extend(hija.columnas)
+            return lambda fila: None if fila[ruta] is None else hija.representar(fila)
+
+        self.columnas.append(ruta)
+        convertir = _convertidor(campo)
+        partes = campo.source.split('.')
+        padres = [prefijo + '__'.join(partes[:i]) for i in range(1, len(partes))]
+        if not padres:
+            if convertir is None:
+                return lambda fila: fila[ruta]
+            return lambda fila: None if fila[ruta] is None else convertir(fila[ruta])
+
+        self.columnas.extend(padres)
+        nulo = _valor_si_padre_nulo(campo)
+
+        def accesor(fila):
+            if any(fila[padre] is None for padre in padres):
+                return nulo
+            valor = fila[ruta]
+            if valor is None or convertir is None:
+                return valor
+            return convertir(valor)
+        return accesor
+
+    def preparar(self, queryset, extra=()):
+        """Convierte el queryset del listado en uno de .values() con las columnas necesarias."""
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*self.columnas, *extra]))
+
+    def representar(self, fila):
+        datos = {}
+        for nombre, accesor in self.accesores:
+            valor = accesor(fila)
+            if valor is not _OMITIR:
+                datos[nombre] = valor
+        if self.ajustar is not None:
+            self.ajustar(fila, datos)
+        return datos
+
+    def serializar(self, filas):
+        filas = list(filas)
+        for nombre, relacion, columna_pk, hija in self.relaciones:
+            # Una consulta por relación para todo el lote, con el mismo orden que el prefetch
+            columna_fk = relacion.field.name
+            ids = {fila[columna_pk] for fila in filas}
+            agrupadas = {}
+            if ids:
+                hijas = relacion.related_model._default_manager.filter(**{f'{columna_fk}__in': ids})
+                filas_hijas = list(hija.preparar(hijas, extra=(columna_fk,)))
+                for fila_hija, datos in zip(filas_hijas, hija.serializar(filas_hijas)):
+                    agrupadas.setdefault(fila_hija[columna_fk], []).append(datos)
+            self._lote[nombre] = agrupadas
+        return [self.representar(fila) for fila in filas]
+
+
+class ListadoProyectadoMixin:
+    """
+    Para ViewSets de solo lectura: el listado se sirve con Proyeccion en lugar de
+    instanciar el serializador por fila. La respuesta (y la paginación) no cambia.
+    """
+
+    def respuesta_proyectada(self, queryset):
+        proyeccion = Proyeccion(self.get_serializer())
+
+        # La paginación por cursor lee los campos de orden de cada fila
+        extra = ()
+        if isinstance(self.paginator, CursorPagination):
+            extra = [campo.lstrip('-') for campo in self.paginator.get_ordering(self.request, queryset, self)]
+
+        filas = proyeccion.preparar(queryset, extra)
+        pagina = self.paginate_queryset(filas)
+        if pagina is not None:
+            return self.get_paginated_response(proyeccion.serializar(pagina))
+        return Response(proyeccion.serializar(filas))
+
+    def list(self, request, *args, **kwargs):
+        return self.respuesta_proyectada(self.filter_queryset(self.get_queryset()))
+
+
+class ExportacionJSONMixin:
+    """
+    Agrega GET .../exportar/: el listado filtrado completo (sin paginar) como arreglo JSON.
+    Las filas se leen con .iterator() y se proyectan y envían por bloques, así que la
+    memoria no crece con la cantidad de registros.
+    """
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        proyeccion = Proyeccion(self.get_serializer())
+        filas = proyeccion.preparar(self.filter_queryset(self.get_queryset())).iterator(chunk_size=FILAS_POR_BLOQUE)
+
+        def bloques():
+            while bloque := list(islice(filas, FILAS_POR_BLOQUE)):
+                yield proyeccion.serializar(bloque)
+
+        return respuesta_json_streaming(bloques())
@@ -0,0 +1,107 @@
+import datetime
+import decimal
+import json
+import math
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Sin orjson se usa el encoder de DRF (misma salida, más lento)
+    orjson = None
+
+# Filas que se codifican y envían juntas en las exportaciones en streaming
+FILAS_POR_BLOQUE = 500
+
+
+def _por_defecto(obj):
+    """Tipos que orjson no codifica solo; mismo resultado que el JSONEncoder de DRF."""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return JSONEncoder().default(obj)
+
+
+def no_finitos_a_null(datos):
+    """
+    Copia de 'datos' con NaN e Infinity (float o Decimal) reemplazados por None.
+    orjson ya los escribe como null; los caminos que usan json (sin orjson, API navegable)
+    pasan por aquí para responder lo mismo en lugar de fallar (DRF) o emitir un NaN inválido.
+    """
+    if isinstance(datos, float):
+        return datos if math.isfinite(datos) else None
+    if isinstance(datos, decimal.Decimal):
+        return datos if datos.is_finite() else None
+    if isinstance(datos, dict):
+        return {clave: no_finitos_a_null(valor) for clave, valor in datos.items()}
+    if isinstance(datos, (list, tuple)):
+        return [no_finitos_a_null(valor) for valor in datos]
+    return datos
+
+
+def _codificar_con_json(datos):
+    contenido = json.dumps(no_finitos_a_null(datos), cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return contenido.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
+
+
+def codificar_json(datos):
+    """
+    Codifica a bytes UTF-8 compactos, con la misma forma que el JSONRenderer de DRF, salvo:
+    - NaN e Infinity se escriben como null (DRF lanza ValueError);
+    - los float usan la representación más corta, que puede diferir en el texto ("1e16" y
+      no "1e+16") pero se lee como el mismo número.
+    """
+    if orjson is None:
+        return _codificar_con_json(datos)
+
+    try:
+        # OPT_UTC_Z: "...Z" en lugar de "+00:00"; OPT_NON_STR_KEYS: claves int/fecha como en json.dumps
+        contenido = orjson.dumps(datos, default=_por_defecto, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        # orjson no acepta enteros de más de 64 bits; json sí (un tipo desconocido falla igual que en DRF)
+        return _codificar_con_json(datos)
+    if b'\xe2\x80\xa8' in contenido or b'\xe2\x80\xa9' in contenido:
+        # DRF escapa los separadores de línea/párrafo de Unicode (rompen el JavaScript embebido)
+        contenido = contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return contenido
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer con orjson: fechas y UUID se codifican en C y los Decimal con un solo
+    hook. Con indentación (API navegable) o sin orjson instalado se delega en DRF.
+    En todos los casos NaN e Infinity salen como null (ver codificar_json).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(no_finitos_a_null(data), accepted_media_type, renderer_context)
+        return codificar_json(data)
+
+
+def respuesta_json_streaming(bloques):
+    """
+    Respuesta con un arreglo JSON que se escribe bloque a bloque.
+    'bloques' produce listas de filas ya representadas; nunca se arma el arreglo completo en memoria.
+    """
+    def generar():
+        yield b'['
+        primero = True
+        for bloque in bloques:
+            if not bloque:
+                continue
+            filas = b','.join(codificar_json(fila) for fila in bloque)
+            yield filas if primero else b',' + filas
+            primero = False
+        yield b']'
+
+    return StreamingHttpResponse(generar(), content_type='application/json')
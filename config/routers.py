@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Alias de la réplica de solo lectura (settings.DATABASES)
+ALIAS_REPLICA = 'replica'
+
+# Segundos en los que un usuario que acaba de escribir lee de la primaria (lee lo que escribió)
+VENTANA_LECTURA_PROPIA = getattr(settings, 'REPLICA_VENTANA_LECTURA', 5)
+
+_leer_de_replica = ContextVar('leer_de_replica', default=False)
+
+
+# --- 1. LEER LO QUE UNO ESCRIBIÓ ---
+def _clave_escritura(usuario_id):
+    return f'escritura-reciente:{usuario_id}'
+
+
+def marcar_escritura(usuario):
+    """
+    Durante la ventana, las lecturas de este usuario no van a la réplica (puede ir atrasada).
+    La marca vive en la caché compartida (settings.CACHES): vale aunque otro worker atienda la siguiente petición.
+    """
+    cache.set(_clave_escritura(usuario.pk), True, VENTANA_LECTURA_PROPIA)
+
+
+def escritura_reciente(usuario):
+    return bool(usuario is not None and usuario.is_authenticated and cache.get(_clave_escritura(usuario.pk)))
+
+
+# --- 2. OPT-IN DE LECTURAS EN RÉPLICA ---
+@contextmanager
+def lecturas_en_replica(usuario=None):
+    """
+    Las lecturas dentro del bloque van a la réplica, salvo que no esté configurada
+    o que 'usuario' haya escrito hace poco. Las escrituras siempre van a la primaria.
+    """
+    if ALIAS_REPLICA not in settings.DATABASES or escritura_reciente(usuario):
+        yield
+        return
+    token = _leer_de_replica.set(True)
+    try:
+        yield
+    finally:
+        _leer_de_replica.reset(token)
+
+
+def en_replica(metodo):
+    """Decorador para acciones de un ViewSet de solo lectura (analítica, reportes)."""
+    @wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        # Aunque llegue por POST (p. ej. generar_reporte), no cuenta como escritura
+        request._request.solo_lectura = True
+        with lecturas_en_replica(request.user):
+            return metodo(self, request, *args, **kwargs)
+    return envoltura
+
+
+class LecturaEnReplicaMixin:
+    """
+    Opt-in por vista: los GET de la vista (o solo los de 'acciones_en_replica') leen de la réplica.
+    Se activa después de autenticar, para que el usuario se resuelva contra la primaria.
+    """
+    acciones_en_replica = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and (
+            self.acciones_en_replica is None or getattr(self, 'action', None) in self.acciones_en_replica
+        ):
+            self._contexto_replica = lecturas_en_replica(request.user)
+            self._contexto_replica.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        contexto = getattr(self, '_contexto_replica', None)
+        if contexto is not None:
+            self._contexto_replica = None
+            contexto.__exit__(None, None, None)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# --- 3. ROUTER ---
+class RouterReplica:
+    """Primaria para todo; réplica solo para las lecturas dentro de lecturas_en_replica()."""
+
+    def db_for_read(self, model, **hints):
+        # La caché compartida (DatabaseCache) se lee de la primaria: en la réplica iría atrasada
+        if _leer_de_replica.get() and model._meta.app_label != 'django_cache':
+            return ALIAS_REPLICA
+        # Explícito: si no, Django lee las relaciones de un objeto traído de la réplica en la réplica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las dos bases tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        return db != ALIAS_REPLICA
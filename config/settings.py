@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import timedelta
 from decouple import config
 import os
+import tempfile
 import cloudinary
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -77,6 +78,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',  
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON con orjson (ver config/renderers.py); la API navegable se mantiene
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # CORS (simple dev)
@@ -98,6 +104,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.middleware.LecturaPropiasEscriturasMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -161,7 +168,35 @@ DATABASES = {
             # Solo agrega sslmode si no es localhost
         **({'OPTIONS': {'sslmode': 'require'}} if config('DB_HOST') != 'localhost' else {}),
         'CONN_MAX_AGE': 60,  
-    }
+    },
+    # Réplica de solo lectura para analítica y reportes (ver config/routers.py).
+    # Sin DB_REPLICA_HOST apunta al mismo servidor; en los tests es un espejo de 'default'.
+    'replica': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_REPLICA_NAME', default=config('DB_NAME')),
+        'USER': config('DB_REPLICA_USER', default=config('DB_USER')),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=config('DB_PASSWORD')),
+        'HOST': config('DB_REPLICA_HOST', default=config('DB_HOST')),
+        'PORT': config('DB_REPLICA_PORT', default=config('DB_PORT'), cast=int),
+        **({'OPTIONS': {'sslmode': 'require'}} if config('DB_REPLICA_HOST', default=config('DB_HOST')) != 'localhost' else {}),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['config.routers.RouterReplica']
+# Segundos que un usuario lee de la primaria después de escribir
+REPLICA_VENTANA_LECTURA = config('REPLICA_VENTANA_LECTURA', default=5, cast=int)
+
+# Caché compartida por todos los procesos (workers de gunicorn, procesar_reportes, procesar_outbox):
+# versiones de datos, marca de "leer lo que uno escribió", claves de idempotencia y respuestas de
+# analítica. Con la LocMem por defecto cada proceso tendría las suyas. La tabla vive en la primaria
+# (RouterReplica) y se crea con 'python manage.py createcachetable' (release del Procfile).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_compartida',
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int)},
+    },
 }
 
 
@@ -191,6 +226,21 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Archivos de los reportes asíncronos (TrabajoReporte): cualquier backend de Storage de Django
+REPORTES_STORAGE = {
+    'BACKEND': config('REPORTES_STORAGE_BACKEND', default='django.core.files.storage.FileSystemStorage'),
+    'OPTIONS': {'location': config('REPORTES_STORAGE_DIR', default=os.path.join(MEDIA_ROOT, 'reportes'))},
+}
+# Días que se conservan los reportes terminados antes de que el worker los borre
+REPORTES_DIAS_CONSERVAR = config('REPORTES_DIAS_CONSERVAR', default=7, cast=int)
+
+# Caché en disco local de los reportes ya generados (LRU por tamaño). La clave lleva la versión
+# de las ventas, guardada en la caché compartida (CACHES): una venta nueva invalida los archivos
+# en todos los procesos. El TTL solo limpia archivos que nadie volvió a pedir
+REPORTES_CACHE_DIR = config('REPORTES_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'smartsales-reportes'))
+REPORTES_CACHE_MAX_BYTES = config('REPORTES_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+REPORTES_CACHE_TTL = config('REPORTES_CACHE_TTL', default=60 * 30, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 